@@ -0,0 +1,912 @@
+# @version ^0.2.0
+# (c) Copyright Origin Protocol, Inc, 2021
+
+"""
+@title NFT Swap contract for LetMeGet.io
+@license MIT
+@author Mike Shultz <mike@originprotocol.com>
+
+CHANGELOG
+=========
+
+V3
+--
+
+- Add offer_batch to make up to MAX_BATCH (20) offers in one transaction.
+- Fold the offer token owner's epoch into offer hashes.  bump_epoch
+     invalidates all of the caller's outstanding offers in one transaction.
+- Add revoke_batch for offer makers to revoke up to MAX_BATCH offers at once.
+- Pack each offer's signer, expiry and revoked flag into one storage slot and
+     keep only the keccak256 of the offer signature, 2 slots instead of 7.
+     offers() returns the signature hash in place of the signature, and
+     expires must fit in 64 bits.
+- Offers are signed as EIP-712 typed data instead of with personal_sign,
+     see OFFER_TYPE.  Revocations are still personal_sign messages.
+
+V2
+--
+
+- Add offer expires to act as a validity window to reduce the likelyhood of a
+     replay attack.
+
+"""
+
+from vyper.interfaces import ERC721
+
+
+###
+## Events
+###
+
+
+event Offer:
+    wanted_owner: indexed(address)
+    wanted_contract: indexed(address)
+    offer_contract: indexed(address)
+    wanted_token_id: uint256
+    offer_token_id: uint256
+    expires: uint256
+
+event OfferRevoked:
+    wanted_owner: indexed(address)
+    wanted_contract: indexed(address)
+    offer_contract: indexed(address)
+    wanted_token_id: uint256
+    offer_token_id: uint256
+    expires: uint256
+
+event EpochBumped:
+    owner: indexed(address)
+    epoch: uint256
+
+event Accept:
+    offer_owner: indexed(address)
+    wanted_contract: indexed(address)
+    offer_contract: indexed(address)
+    wanted_token_id: uint256
+    offer_token_id: uint256
+    expires: uint256
+
+
+###
+## Structs
+###
+
+
+struct OfferDetails:
+    revoked: bool
+    signer: address
+    signature_hash: bytes32
+    expires: uint256
+
+
+###
+## Constants and storage
+###
+
+
+VERSION: constant(uint256) = 3
+PREFIX: constant(Bytes[28]) = b"\x19Ethereum Signed Message:\n32"
+# 1000 blocks, roughly 4 hours
+DEFAULT_BLOCK_WINDOW: constant(uint256) = 1000
+# Most offers offer_batch takes at once
+MAX_BATCH: constant(uint256) = 20
+SIGNATURE_LENGTH: constant(uint256) = 65
+
+# EIP-712 type hashes, precomputed from their preimages:
+# keccak256("EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+DOMAIN_TYPEHASH: constant(bytes32) = 0x8b73c3c69bb8fe3d512ecc4cf759cc79239f7b179b0ffacaa9a75d522b39400f
+# keccak256("LetMeGet")
+DOMAIN_NAME_HASH: constant(bytes32) = 0x396f6549eddb66f9a70ad56ec0dfd61bec5c6512f0febafa0f9c6189c1bd7950
+# keccak256("3")
+DOMAIN_VERSION_HASH: constant(bytes32) = 0x2a80e1ef1d7842f27f2e6be0972bb708b9a135c38860dbe73c27c3486c34f4de
+# OFFER_TYPE: "Offer(address offerContract,uint256 offerTokenId,address wantedContract,uint256 wantedTokenId,uint256 expires,uint256 epoch)"
+OFFER_TYPEHASH: constant(bytes32) = 0xa6aeed3c97f7c09054253ce59fc3cd5de2441631a7aaf9bc24b654c4ae4cbb5d
+
+# Packed offer layout: signer in bits 0-159, expires in bits 160-223 and the
+# revoked flag in bit 224
+SIGNER_MASK: constant(uint256) = 2**160 - 1
+EXPIRES_MASK: constant(uint256) = 2**64 - 1
+REVOKED_FLAG: constant(uint256) = 2**224
+
+# Holds details about offers, packed into one slot each
+packed_offers: HashMap[bytes32, uint256]
+# keccak256 of each offer's signature, which revoke signatures are made over
+signature_hashes: HashMap[bytes32, bytes32]
+# Part of every offer hash, bumping it orphans all of an owner's offers
+epochs: public(HashMap[address, uint256])
+
+
+###
+## Utilities
+###
+
+
+@internal
+@pure
+def _prefix_hash(hash: bytes32) -> Bytes[65]:
+    """
+    @dev Prefix a hash with the "standard" Ethereum Signed Message prefix
+    @param hash to prefix
+    @return Byte array of prefixed hash
+    """
+    return concat(PREFIX, hash)
+
+
+@internal
+@pure
+def _recover(prefixed_hash: bytes32, signature: Bytes[65]) -> address:
+    """
+    @dev Recover signing account address, given data and signature
+    @param prefixed_hash is hash of prefixed data
+    @param signature to recover
+    @return address of signer (or random-ish address)
+    """
+    r: uint256 = convert(slice(signature, 0, 32), uint256)
+    s: uint256 = convert(slice(signature, 32, 32), uint256)
+    v: uint256 = convert(slice(signature, 64, 1), uint256)
+
+    return ecrecover(prefixed_hash, v, r, s)
+
+
+@internal
+@view
+def _domain_separator() -> bytes32:
+    """
+    @dev EIP-712 domain separator.  Hashing the five precomputed words costs
+        less than reading a cached copy from storage, and stays correct if
+        the chain forks to a new chain ID.
+    @return Domain separator for this contract on this chain
+    """
+    return keccak256(
+        concat(
+            DOMAIN_TYPEHASH,
+            DOMAIN_NAME_HASH,
+            DOMAIN_VERSION_HASH,
+            convert(chain.id, bytes32),
+            convert(self, bytes32)
+        )
+    )
+
+
+@internal
+@pure
+def _hash_params(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256,
+    epoch: uint256,
+) -> bytes32:
+    """
+    @dev EIP-712 struct hash of the given offer paramters
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @param epoch Epoch of the offered token's owner
+    @return Hash of the given params
+    """
+    return keccak256(
+        concat(
+            OFFER_TYPEHASH,
+            convert(offer_contract, bytes32),
+            convert(offer_token_id, bytes32),
+            convert(wanted_contract, bytes32),
+            convert(wanted_token_id, bytes32),
+            convert(expires, bytes32),
+            convert(epoch, bytes32)
+        )
+    )
+
+
+@internal
+@pure
+def _pack_offer(signer: address, expires: uint256, revoked: bool) -> uint256:
+    """
+    @dev Pack offer details into one storage word
+    @param signer Offer maker
+    @param expires Block number when the offer expires, at most 64 bits
+    @param revoked True if the offer has been revoked
+    @return Packed offer details
+    """
+    packed: uint256 = bitwise_or(convert(signer, uint256), shift(expires, 160))
+
+    if revoked:
+        packed = bitwise_or(packed, REVOKED_FLAG)
+
+    return packed
+
+
+@internal
+@pure
+def _unpack_offer(packed: uint256) -> (address, uint256, bool):
+    """
+    @dev Unpack offer details packed by _pack_offer
+    @param packed Packed offer details
+    @return Offer signer, expires and whether it has been revoked
+    """
+    return (
+        convert(convert(bitwise_and(packed, SIGNER_MASK), bytes32), address),
+        bitwise_and(shift(packed, -160), EXPIRES_MASK),
+        bitwise_and(packed, REVOKED_FLAG) != 0
+    )
+
+
+###
+## Internals
+###
+
+
+@internal
+@view
+def _offer_hash(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256
+) -> bytes32:
+    """
+    @dev EIP-712 digest of offer params with the current epoch of the offered
+        token's owner.  It is the epoch, not the owner, that is hashed, so
+        offers stop being found once the owner bumps their epoch.  A new
+        owner at the same epoch as the previous one (both 0, say) finds
+        the previous owner's offers.
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @return Hash of the given params
+    """
+    offer_owner: address = ERC721(offer_contract).ownerOf(offer_token_id)
+
+    return keccak256(
+        concat(
+            b"\x19\x01",
+            self._domain_separator(),
+            self._hash_params(
+                offer_contract,
+                offer_token_id,
+                wanted_contract,
+                wanted_token_id,
+                expires,
+                self.epochs[offer_owner]
+            )
+        )
+    )
+
+
+@internal
+@view
+def _offer_exists(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256
+) -> bool:
+    """
+    @dev Check if an offer has been made and is alive
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @return True if the offer exists
+    """
+    param_hash: bytes32 = self._offer_hash(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires
+    )
+    return bitwise_and(self.packed_offers[param_hash], SIGNER_MASK) != 0
+
+
+@internal
+@view
+def _offer_revoked(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256
+) -> bool:
+    """
+    @dev Check if an offer has been revoked
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @return True if the offer has been revoked
+    """
+    param_hash: bytes32 = self._offer_hash(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires
+    )
+    return bitwise_and(self.packed_offers[param_hash], REVOKED_FLAG) != 0
+
+
+@internal
+@view
+def _signer(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256,
+    signature: Bytes[65]
+) -> (address, bytes32):
+    """
+    @dev Get signing account for signature given offer params
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @param signature to recover
+    @return address of the signer
+    """
+    param_hash: bytes32 = self._offer_hash(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires
+    )
+    # Typed data digests are signed as they are, without a prefix
+    return self._recover(param_hash, signature), param_hash
+
+
+@internal
+@view
+def _data_signer(
+    data: bytes32,
+    signature: Bytes[65]
+) -> address:
+    """
+    @dev Get signing account for signature given bytes32 data
+    @param data that was signed
+    @param signature to recover
+    @return address of the signer
+    """
+    p_hash: bytes32 = keccak256(self._prefix_hash(data))
+    return self._recover(p_hash, signature)
+
+
+@internal
+def _make_offer(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256,
+    signature: Bytes[65],
+):
+    """
+    @dev Offer a token for a wanted token
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @param expires Block number when the offer expires
+    @param signature Offerer's signature of the offer data
+    """
+    signer: address = empty(address)
+    param_hash: bytes32 = empty(bytes32)
+
+    signer, param_hash = self._signer(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires,
+        signature
+    )
+
+    assert wanted_contract != empty(address), "no-wanted-contract"
+    assert expires > block.number, "expires-too-low"
+    assert expires <= EXPIRES_MASK, "expires-too-high"
+
+    wanted_owner: address = ERC721(wanted_contract).ownerOf(wanted_token_id)
+    packed: uint256 = self.packed_offers[param_hash]
+
+    assert wanted_owner != empty(address), "no-wanted-owner"
+    assert bitwise_and(packed, SIGNER_MASK) == 0, "offer-exists"
+    assert bitwise_and(packed, REVOKED_FLAG) == 0, "offer-revoked"
+    assert signer == ERC721(offer_contract).ownerOf(offer_token_id), "signer-not-owner"
+    assert self == ERC721(offer_contract).getApproved(offer_token_id), "contract-not-approved"
+
+    self.packed_offers[param_hash] = self._pack_offer(signer, expires, False)
+    self.signature_hashes[param_hash] = keccak256(signature)
+
+    log Offer(
+        wanted_owner,
+        wanted_contract,
+        offer_contract,
+        wanted_token_id,
+        offer_token_id,
+        expires,
+    )
+
+
+###
+## Externals
+###
+
+
+@external
+@view
+def version() -> uint256:
+    """
+    @dev Version getter
+    @return Version of the LMG contract
+    """
+    return VERSION
+
+
+@external
+@view
+def DOMAIN_SEPARATOR() -> bytes32:
+    """
+    @dev EIP-712 domain separator getter
+    @return Domain separator for this contract on this chain
+    """
+    return self._domain_separator()
+
+
+@external
+@view
+def prefix_hash(hash: bytes32) -> Bytes[65]:
+    """
+    @dev Prefix a hash with the "standard" Ethereum signed message prefix
+    @param hash to prefix
+    @return Prefixed bytes ready to be hashed
+    """
+    return self._prefix_hash(hash)
+
+
+@external
+@view
+def hash_params(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256,
+) -> bytes32:
+    """
+    @dev Hash given parameters, with the offered token owner's current epoch.
+        This is the hash offers are signed over.
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @return keccak hash of packed parameters
+    """
+    return self._offer_hash(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires
+    )
+
+
+@external
+@view
+def offers(param_hash: bytes32) -> OfferDetails:
+    """
+    @dev Offer details getter
+    @param param_hash Offer hash, see hash_params
+    @return Details of the offer, empty if there is none
+    """
+    signer: address = empty(address)
+    expires: uint256 = 0
+    revoked: bool = False
+
+    signer, expires, revoked = self._unpack_offer(self.packed_offers[param_hash])
+
+    return OfferDetails({
+        revoked: revoked,
+        signer: signer,
+        signature_hash: self.signature_hashes[param_hash],
+        expires: expires
+    })
+
+
+@external
+@view
+def offer_can_complete(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256,
+) -> bool:
+    """
+    @dev Check if an offer should complete if accepted
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @return True if the offer can complete
+    """
+    param_hash: bytes32 = self._offer_hash(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires
+    )
+
+    signer: address = empty(address)
+    offer_expires: uint256 = 0
+    revoked: bool = False
+
+    signer, offer_expires, revoked = self._unpack_offer(
+        self.packed_offers[param_hash]
+    )
+
+    return (
+        offer_expires > block.number and
+        not revoked and
+        ERC721(offer_contract).getApproved(offer_token_id) == self and
+        ERC721(wanted_contract).getApproved(wanted_token_id) == self
+    )
+
+
+@external
+@view
+def offer_exists(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256,
+) -> bool:
+    """
+    @dev Check if an offer has been made and is alive
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @return True if the offer exists
+    """
+    return self._offer_exists(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires
+    )
+
+
+@external
+@view
+def offer_revoked(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256,
+) -> bool:
+    """
+    @dev Check if an offer has been revoked
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @return True if the offer has been revoked
+    """
+    return self._offer_revoked(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires
+    )
+
+
+@external
+@view
+def offer_signer(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256,
+    signature: Bytes[65]
+) -> (address, bytes32):
+    """
+    @dev Get the signing account for the given offer params and signature
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @param signature Signature of the offer data
+    """
+    return self._signer(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires,
+        signature
+    )
+
+
+@external
+@nonreentrant('offer')
+def offer(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256,
+    signature: Bytes[65],
+):
+    """
+    @dev Offer a token for a wanted token
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @param expires Block number when the offer expires
+    @param signature Offerer's signature of the offer data
+    """
+    self._make_offer(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires,
+        signature
+    )
+
+
+@external
+@nonreentrant('offer')
+def offer_batch(
+    offer_contracts: address[MAX_BATCH],
+    offer_token_ids: uint256[MAX_BATCH],
+    wanted_contracts: address[MAX_BATCH],
+    wanted_token_ids: uint256[MAX_BATCH],
+    expires: uint256[MAX_BATCH],
+    signatures: Bytes[1300],
+):
+    """
+    @dev Make several offers at once.  The number of offers is given by the
+        number of signatures, unused array slots are ignored.  If any offer
+        fails the whole batch reverts.
+    @param offer_contracts Contract addresses for the offered tokens
+    @param offer_token_ids Token IDs for the offered tokens
+    @param wanted_contracts Contract addresses for the wanted tokens
+    @param wanted_token_ids Token IDs for the wanted tokens
+    @param expires Block numbers when the offers expire
+    @param signatures Offerer's 65 byte signatures of each offer, concatenated
+        (MAX_BATCH * 65 bytes at most)
+    """
+    count: uint256 = len(signatures) / SIGNATURE_LENGTH
+
+    assert count > 0, "no-offers"
+    assert count * SIGNATURE_LENGTH == len(signatures), "bad-signatures"
+
+    for i in range(MAX_BATCH):
+        if i >= count:
+            break
+
+        self._make_offer(
+            offer_contracts[i],
+            offer_token_ids[i],
+            wanted_contracts[i],
+            wanted_token_ids[i],
+            expires[i],
+            slice(signatures, i * SIGNATURE_LENGTH, SIGNATURE_LENGTH)
+        )
+
+
+@external
+@nonreentrant('revoke')
+def revoke(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256,
+    signature: Bytes[65],
+):
+    """
+    @notice This can not be undone!
+    @dev Revoke a previous offer preventing it from being executed.
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @param signature Offerer's signature of the offer signature
+    """
+    signer: address = empty(address)
+    param_hash: bytes32 = self._offer_hash(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires
+    )
+
+    packed: uint256 = self.packed_offers[param_hash]
+    offer_signer: address = convert(
+        convert(bitwise_and(packed, SIGNER_MASK), bytes32),
+        address
+    )
+
+    assert offer_signer != empty(address), "offer-does-not-exist"
+
+    # To revoke an offer, signer must sign the hash of the original signature
+    signer = self._data_signer(self.signature_hashes[param_hash], signature)
+
+    assert offer_signer == signer, "not-maker"
+
+    wanted_owner: address = ERC721(wanted_contract).ownerOf(wanted_token_id)
+
+    self.packed_offers[param_hash] = bitwise_or(packed, REVOKED_FLAG)
+
+    log OfferRevoked(
+        wanted_owner,
+        wanted_contract,
+        offer_contract,
+        wanted_token_id,
+        offer_token_id,
+        expires,
+    )
+
+
+@external
+@nonreentrant('revoke')
+def revoke_batch(
+    offer_contracts: address[MAX_BATCH],
+    offer_token_ids: uint256[MAX_BATCH],
+    wanted_contracts: address[MAX_BATCH],
+    wanted_token_ids: uint256[MAX_BATCH],
+    expires: uint256[MAX_BATCH],
+    count: uint256,
+):
+    """
+    @notice This can not be undone!
+    @dev Revoke several of the sender's offers at once.  Only the first count
+        array slots are used.  If any offer can not be revoked the whole
+        batch reverts.
+    @param offer_contracts Contract addresses for the offered tokens
+    @param offer_token_ids Token IDs for the offered tokens
+    @param wanted_contracts Contract addresses for the wanted tokens
+    @param wanted_token_ids Token IDs for the wanted tokens
+    @param expires Block numbers when the offers expire
+    @param count Number of offers to revoke
+    """
+    assert count > 0 and count <= MAX_BATCH, "bad-count"
+
+    for i in range(MAX_BATCH):
+        if i >= count:
+            break
+
+        param_hash: bytes32 = self._offer_hash(
+            offer_contracts[i],
+            offer_token_ids[i],
+            wanted_contracts[i],
+            wanted_token_ids[i],
+            expires[i]
+        )
+
+        packed: uint256 = self.packed_offers[param_hash]
+        offer_signer: address = convert(
+            convert(bitwise_and(packed, SIGNER_MASK), bytes32),
+            address
+        )
+
+        assert offer_signer != empty(address), "offer-does-not-exist"
+        assert offer_signer == msg.sender, "not-maker"
+
+        self.packed_offers[param_hash] = bitwise_or(packed, REVOKED_FLAG)
+
+        log OfferRevoked(
+            ERC721(wanted_contracts[i]).ownerOf(wanted_token_ids[i]),
+            wanted_contracts[i],
+            offer_contracts[i],
+            wanted_token_ids[i],
+            offer_token_ids[i],
+            expires[i],
+        )
+
+
+@external
+def bump_epoch() -> uint256:
+    """
+    @notice This can not be undone!
+    @dev Invalidate every outstanding offer made by the sender
+    @return The sender's new epoch
+    """
+    epoch: uint256 = self.epochs[msg.sender] + 1
+
+    self.epochs[msg.sender] = epoch
+
+    log EpochBumped(msg.sender, epoch)
+
+    return epoch
+
+
+@external
+@nonreentrant('accept')
+def accept(
+    offer_contract: address,
+    offer_token_id: uint256,
+    wanted_contract: address,
+    wanted_token_id: uint256,
+    expires: uint256,
+    signature: Bytes[65],
+):
+    """
+    @dev Accept an offer to trade the offered token for a wanted token
+    @param offer_contract Contract address for the offered token
+    @param offer_token_id Token ID for the offered token
+    @param wanted_contract Contract address for the wanted token
+    @param wanted_token_id Token ID for the wanted token
+    @param signature Wanted token owner's signature of the offer data
+    """
+    signer: address = empty(address)
+    param_hash: bytes32 = empty(bytes32)
+
+    signer, param_hash = self._signer(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires,
+        signature
+    )
+
+    offer_owner: address = empty(address)
+    offer_expires: uint256 = 0
+    revoked: bool = False
+
+    offer_owner, offer_expires, revoked = self._unpack_offer(
+        self.packed_offers[param_hash]
+    )
+
+    assert offer_owner != empty(address), "offer-does-not-exist"
+    assert not revoked, "offer-revoked"
+    assert offer_expires > block.number, "offer-expired"
+    assert signer == ERC721(wanted_contract).ownerOf(wanted_token_id), "signer-not-owner"
+    assert self == ERC721(wanted_contract).getApproved(wanted_token_id), "contract-not-approved"
+
+    # Remove the offer record
+    self.packed_offers[param_hash] = 0
+    self.signature_hashes[param_hash] = empty(bytes32)
+
+    # Transfer the offered token
+    ERC721(offer_contract).safeTransferFrom(
+        offer_owner,
+        signer,
+        offer_token_id,
+        empty(Bytes[1])
+    )
+
+    # Transfer the wanted token
+    ERC721(wanted_contract).safeTransferFrom(
+        signer,
+        offer_owner,
+        wanted_token_id,
+        empty(Bytes[1])
+    )
+
+    log Accept(
+        offer_owner,
+        wanted_contract,
+        offer_contract,
+        wanted_token_id,
+        offer_token_id,
+        expires,
+    )
@@ -0,0 +1,29 @@
+// SPDX-License-Identifier: MIT
+
+pragma solidity ^0.8.0;
+
+import "OpenZeppelin/openzeppelin-contracts@4.2.0/contracts/token/ERC721/ERC721.sol";
+
+/// @title CollectionMock - ERC-721 mock its deployer can bulk mint
+/// @notice For seeding dev chains and benchmarks with large collections
+contract CollectionMock is ERC721 {
+    address public immutable minter;
+
+    constructor(string memory name_, string memory symbol_)
+        ERC721(name_, symbol_)
+    {
+        minter = msg.sender;
+    }
+
+    /// @notice Mint token IDs firstId..firstId + count - 1 to `to`
+    function mintBatch(
+        address to,
+        uint256 firstId,
+        uint256 count
+    ) external {
+        require(msg.sender == minter, "not-minter");
+        for (uint256 i = 0; i < count; i++) {
+            _mint(to, firstId + i);
+        }
+    }
+}
@@ -0,0 +1,140 @@
+""" Adaptive, parallel eth_getLogs backfill for the offer indexer """
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from letmeget.events import decode_log
+
+# Fragments of the errors nodes return when a getLogs range is too wide or
+# matches too many logs (geth, Infura, Alchemy, QuickNode, Erigon, ...)
+RANGE_ERROR_MESSAGES = (
+    "more than",
+    "too many",
+    "too large",
+    "too wide",
+    "block range",
+    "range is too",
+    "limit exceeded",
+    "size exceeded",
+    "response size",
+    "query timeout",
+    "timed out",
+)
+
+
+def is_range_error(err):
+    """ Whether err means the getLogs query should be split and retried """
+    message = err.args[0] if err.args else err
+    if isinstance(message, dict):
+        message = message.get("message", "")
+    message = str(message).lower()
+    return any(fragment in message for fragment in RANGE_ERROR_MESSAGES)
+
+
+class ChunkSizer:
+    """
+    Block range size shared by all workers: halved when a node rejects a
+    range, doubled after ranges that came back sparse
+    """
+
+    def __init__(self, size, min_size=1, max_size=100000, target_results=2000):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_results = target_results
+        self.size = max(min_size, min(size, max_size))
+        self._lock = threading.Lock()
+
+    def shrink(self, failed_size):
+        with self._lock:
+            self.size = max(
+                self.min_size, min(self.size, max(1, failed_size // 2))
+            )
+        return self.size
+
+    def observe(self, range_size, results):
+        """ Grow after a range that came back well under target """
+        with self._lock:
+            if results < self.target_results // 2 and range_size >= self.size:
+                self.size = min(self.max_size, self.size * 2)
+        return self.size
+
+
+class Backfill:
+    """
+    Fetches an indexer's logs for a block range using `workers` concurrent
+    getLogs calls on disjoint sub-ranges, and applies them to the store
+    strictly in block order so every checkpoint covers a complete prefix
+    """
+
+    def __init__(
+        self,
+        indexer,
+        workers=4,
+        min_chunk_size=1,
+        max_chunk_size=100000,
+        target_results=2000,
+    ):
+        self.indexer = indexer
+        self.workers = max(1, workers)
+        self.sizer = ChunkSizer(
+            indexer.chunk_size, min_chunk_size, max_chunk_size, target_results
+        )
+
+    def fetch_logs(self, from_block, to_block):
+        """ Logs for an inclusive range, splitting it until the node copes """
+        try:
+            logs = self.indexer.get_logs(from_block, to_block)
+        except Exception as err:
+            if from_block == to_block or not is_range_error(err):
+                raise
+            size = to_block - from_block + 1
+            self.sizer.shrink(size)
+            middle = from_block + size // 2 - 1
+            return self.fetch_logs(from_block, middle) + self.fetch_logs(
+                middle + 1, to_block
+            )
+
+        self.sizer.observe(to_block - from_block + 1, len(logs))
+        return logs
+
+    def fetch_range(self, from_block, to_block):
+        """ Worker task: decoded events and the checkpoint hash for a range """
+        events = [
+            event
+            for event in map(decode_log, self.fetch_logs(from_block, to_block))
+            if event is not None
+        ]
+        # Transaction fetches and signature recovery overlap other ranges
+        events = self.indexer.verify_events(events)
+        return events, to_block, self.indexer.block_hash(to_block)
+
+    def run(self, from_block, to_block):
+        """ Index from_block..to_block inclusive, returns events stored """
+        cursor = from_block
+        next_apply = from_block
+        done = {}
+        pending = set()
+        indexed = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while next_apply <= to_block:
+                while cursor <= to_block and len(pending) < self.workers:
+                    end = min(cursor + self.sizer.size - 1, to_block)
+                    future = executor.submit(self.fetch_range, cursor, end)
+                    future.start_block = cursor
+                    pending.add(future)
+                    cursor = end + 1
+
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    # Raises, and leaves the store at the last good prefix,
+                    # if any range failed
+                    done[future.start_block] = future.result()
+
+                # Only ever checkpoint a contiguous prefix of the range
+                while next_apply in done:
+                    events, end, block_hash = done.pop(next_apply)
+                    self.indexer.apply(events, end, block_hash)
+                    indexed += len(events)
+                    next_apply = end + 1
+
+        return indexed
@@ -0,0 +1,207 @@
+""" Bulk offer hashing, signing and signer recovery
+
+Offers are packed into one preallocated buffer of fixed size records, so
+hashing N offers is N keccaks over slices of it with no per-field
+encoding.  Signing and recovery are CPU bound (eth_keys' native backend
+is pure Python), so large batches are fanned out over a process pool in
+contiguous chunks.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from eth_hash.auto import keccak
+from eth_keys import keys
+from eth_utils import to_bytes, to_checksum_address
+
+from letmeget.offers import Offer
+
+WORD = 32
+SIGNATURE_LENGTH = 65
+PERSONAL_PREFIX = b"\x19Ethereum Signed Message:\n32"
+# Below this many items a process pool costs more than it saves
+DEFAULT_CHUNK_SIZE = 1024
+
+
+def pack_offers(offers, prefix=b"", suffix=b""):
+    """
+    Pack offers into one buffer of (prefix, five offer words, suffix)
+    records, returning (buffer, record_size)
+    """
+    offers = offers if isinstance(offers, list) else list(offers)
+    record_size = len(prefix) + 5 * WORD + len(suffix)
+    buffer = bytearray(record_size * len(offers))
+
+    # Offers tend to share a handful of contracts
+    addresses = {}
+
+    def address_word(address):
+        word = addresses.get(address)
+        if word is None:
+            word = addresses[address] = to_bytes(hexstr=address).rjust(
+                WORD, b"\0"
+            )
+        return word
+
+    for i, offer in enumerate(offers):
+        offer = Offer(*offer)
+        pos = i * record_size
+
+        if prefix:
+            buffer[pos : pos + len(prefix)] = prefix
+            pos += len(prefix)
+
+        for word in (
+            address_word(offer.offer_contract),
+            offer.offer_token_id.to_bytes(WORD, "big"),
+            address_word(offer.wanted_contract),
+            offer.wanted_token_id.to_bytes(WORD, "big"),
+            offer.expires.to_bytes(WORD, "big"),
+        ):
+            buffer[pos : pos + WORD] = word
+            pos += WORD
+
+        if suffix:
+            buffer[pos : pos + len(suffix)] = suffix
+
+    return buffer, record_size
+
+
+def hash_records(buffer, record_size):
+    """ keccak256 of each record in a packed buffer """
+    return [
+        keccak(buffer[pos : pos + record_size])
+        for pos in range(0, len(buffer), record_size)
+    ]
+
+
+def hash_offers(offers):
+    """ Bit identical to LetMeGet_v2._hash_params for each offer """
+    return hash_records(*pack_offers(offers))
+
+
+def personal_hashes(hashes):
+    """ The personal_sign digests LetMeGet_v2 offer signatures are over """
+    return [keccak(PERSONAL_PREFIX + h) for h in hashes]
+
+
+def _chunks(items, size):
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def _pool_map(fn, chunks, workers, executor=None):
+    """
+    Run fn over chunks, in a pool if there is more than one.  A long lived
+    executor can be passed in to save starting processes on every call.
+    """
+    if len(chunks) <= 1 or workers == 1:
+        return [fn(chunk) for chunk in chunks]
+    if executor is not None:
+        return list(executor.map(fn, chunks))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fn, chunks))
+
+
+def _sign_chunk(args):
+    private_key, hashes = args
+    key = keys.PrivateKey(private_key)
+    signatures = bytearray()
+    for i in range(0, len(hashes), WORD):
+        signature = key.sign_msg_hash(hashes[i : i + WORD])
+        signatures += signature.r.to_bytes(WORD, "big")
+        signatures += signature.s.to_bytes(WORD, "big")
+        signatures.append(signature.v + 27)
+    return bytes(signatures)
+
+
+def _recover_chunk(args):
+    hashes, signatures = args
+    signers = []
+    for i in range(len(hashes) // WORD):
+        signature = signatures[
+            i * SIGNATURE_LENGTH : (i + 1) * SIGNATURE_LENGTH
+        ]
+        v = signature[64]
+        try:
+            public_key = keys.Signature(
+                vrs=(
+                    v - 27 if v >= 27 else v,
+                    int.from_bytes(signature[:32], "big"),
+                    int.from_bytes(signature[32:64], "big"),
+                )
+            ).recover_public_key_from_msg_hash(
+                hashes[i * WORD : (i + 1) * WORD]
+            )
+            signers.append(public_key.to_canonical_address())
+        except Exception:
+            # Malformed, like ecrecover returning the zero address
+            signers.append(None)
+    return signers
+
+
+def sign_hashes(
+    private_key,
+    hashes,
+    workers=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    executor=None,
+):
+    """ 65 byte r, s, v signatures of 32 byte hashes, as signed on-chain """
+    if isinstance(private_key, keys.PrivateKey):
+        private_key = private_key.to_bytes()
+    elif isinstance(private_key, str):
+        private_key = to_bytes(hexstr=private_key)
+
+    # Workers get one contiguous bytes object per chunk, cheap to pickle
+    chunks = [
+        (private_key, b"".join(chunk))
+        for chunk in _chunks(list(hashes), chunk_size)
+    ]
+    signed = b"".join(
+        _pool_map(_sign_chunk, chunks, workers or os.cpu_count(), executor)
+    )
+    return [
+        signed[i : i + SIGNATURE_LENGTH]
+        for i in range(0, len(signed), SIGNATURE_LENGTH)
+    ]
+
+
+def recover_signers(
+    hashes,
+    signatures,
+    workers=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    executor=None,
+):
+    """
+    The address that signed each hash, like ecrecover, or None where a
+    signature is invalid
+    """
+    hashes = list(hashes)
+    signatures = [
+        to_bytes(hexstr=s) if isinstance(s, str) else bytes(s)
+        for s in signatures
+    ]
+    if len(hashes) != len(signatures):
+        raise ValueError("Need one signature per hash")
+
+    # Chunks are sliced in fixed size records, so a signature of any other
+    # length would shift every one after it.  It can't be valid anyway.
+    valid = [
+        i
+        for i, signature in enumerate(signatures)
+        if len(signature) == SIGNATURE_LENGTH
+    ]
+    chunks = [
+        (
+            b"".join(hashes[i] for i in index_chunk),
+            b"".join(signatures[i] for i in index_chunk),
+        )
+        for index_chunk in _chunks(valid, chunk_size)
+    ]
+    recovered = _pool_map(
+        _recover_chunk, chunks, workers or os.cpu_count(), executor
+    )
+
+    signers = [None] * len(signatures)
+    for i, signer in zip(valid, (s for chunk in recovered for s in chunk)):
+        signers[i] = to_checksum_address(signer) if signer else None
+    return signers
@@ -0,0 +1,84 @@
+""" LetMeGet_v2 event topics and log decoding """
+from collections import namedtuple
+from eth_utils import keccak, to_bytes, to_checksum_address
+
+from letmeget.offers import hash_params
+
+# Every v2 event shares the same layout, only the first indexed address
+# differs: wanted_owner for Offer/OfferRevoked, offer_owner for Accept
+EVENT_SIGNATURE = "{}(address,address,address,uint256,uint256,uint256)"
+EVENT_NAMES = ("Offer", "OfferRevoked", "Accept")
+EVENT_TOPICS = {
+    "0x" + keccak(text=EVENT_SIGNATURE.format(name)).hex(): name
+    for name in EVENT_NAMES
+}
+
+OfferEvent = namedtuple(
+    "OfferEvent",
+    [
+        "name",
+        "offer_hash",
+        "owner",
+        "wanted_contract",
+        "offer_contract",
+        "wanted_token_id",
+        "offer_token_id",
+        "expires",
+        "block_number",
+        "log_index",
+        "tx_hash",
+        # Offer maker recovered from the offer() signature, if verified
+        "signer",
+    ],
+    defaults=(None,),
+)
+
+
+def _bytes(value):
+    """ web3 returns HexBytes or hex strings depending on version """
+    if isinstance(value, str):
+        return to_bytes(hexstr=value)
+    return bytes(value)
+
+
+def _hex(value):
+    return "0x" + _bytes(value).hex()
+
+
+def decode_log(log):
+    """ Decode a raw log into an OfferEvent, or None if it is not one """
+    topics = [_bytes(topic) for topic in log["topics"]]
+    if len(topics) != 4:
+        return None
+
+    name = EVENT_TOPICS.get("0x" + topics[0].hex())
+    if name is None:
+        return None
+
+    owner, wanted_contract, offer_contract = [
+        to_checksum_address(topic[-20:]) for topic in topics[1:]
+    ]
+    data = _bytes(log["data"])
+    wanted_token_id, offer_token_id, expires = [
+        int.from_bytes(data[i : i + 32], "big") for i in range(0, 96, 32)
+    ]
+
+    return OfferEvent(
+        name,
+        hash_params(
+            offer_contract,
+            offer_token_id,
+            wanted_contract,
+            wanted_token_id,
+            expires,
+        ),
+        owner,
+        wanted_contract,
+        offer_contract,
+        wanted_token_id,
+        offer_token_id,
+        expires,
+        log["blockNumber"],
+        log["logIndex"],
+        _hex(log["transactionHash"]),
+    )
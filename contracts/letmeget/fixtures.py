@@ -0,0 +1,163 @@
+""" Seed a dev chain with large collections, many accounts and offers """
+import random
+from eth_account import Account
+from eth_utils import keccak, to_checksum_address
+
+try:
+    from eth_abi import encode as encode_abi
+except ImportError:  # eth-abi < 4
+    from eth_abi import encode_abi
+
+from letmeget.bulk import hash_offers, personal_hashes, sign_hashes
+from letmeget.multicall import selector
+from letmeget.offers import Offer
+
+MINT_BATCH = selector("mintBatch(address,uint256,uint256)")
+APPROVE = selector("approve(address,uint256)")
+OFFER = selector("offer(address,uint256,address,uint256,uint256,bytes)")
+
+# Tokens per mintBatch transaction, comfortably inside a ganache block
+MINT_BATCH_SIZE = 80
+MINT_GAS_PER_TOKEN = 50000
+APPROVE_GAS = 60000
+OFFER_GAS = 300000
+
+
+def fixture_accounts(count, seed=0):
+    """ count LocalAccounts, always the same ones for the same seed """
+    return [
+        Account.from_key(keccak(text="letmeget-fixture-{}-{}".format(seed, i)))
+        for i in range(count)
+    ]
+
+
+class Fixture:
+    """
+    N collections x M tokens x K accounts: account k owns token IDs
+    k * M + 1 to (k + 1) * M of every collection, so ownership is known
+    without asking the chain.
+
+    Everything is sent through a TxPipeline and offers are signed in bulk,
+    so seeding is bound by how fast the node mines, not by round trips.
+    """
+
+    def __init__(self, collections, accounts, tokens_per_account, seed=0):
+        self.collections = [to_checksum_address(c) for c in collections]
+        self.accounts = accounts
+        self.tokens_per_account = tokens_per_account
+        self.random = random.Random(seed)
+
+    def owner(self, token_id):
+        """ Account owning token_id, in every collection """
+        return self.accounts[(token_id - 1) // self.tokens_per_account]
+
+    def token_ids(self, account_index):
+        first = account_index * self.tokens_per_account + 1
+        return range(first, first + self.tokens_per_account)
+
+    def fund(self, pipeline, sender, value=int(1e18)):
+        """ Give every account gas money """
+        for account in self.accounts:
+            pipeline.send(sender, account.address, value=value, gas=21000)
+        return pipeline.wait()
+
+    def mint(self, pipeline, sender, batch_size=MINT_BATCH_SIZE):
+        """ Mint every account its tokens of every collection """
+        for collection in self.collections:
+            for k, account in enumerate(self.accounts):
+                ids = self.token_ids(k)
+                for first in range(ids.start, ids.stop, batch_size):
+                    count = min(batch_size, ids.stop - first)
+                    pipeline.send(
+                        sender,
+                        collection,
+                        MINT_BATCH
+                        + encode_abi(
+                            ["address", "uint256", "uint256"],
+                            [account.address, first, count],
+                        ),
+                        gas=MINT_GAS_PER_TOKEN * (count + 1),
+                    )
+        return pipeline.wait()
+
+    def random_offers(self, count, expires):
+        """
+        count distinct (maker, Offer) of one account's token for another
+        account's token, in random collections
+        """
+        if len(self.accounts) < 2:
+            raise ValueError("Offers need at least two accounts")
+        # Any token of one account for any token of another, in any collection
+        tokens = len(self.collections) * self.tokens_per_account
+        possible = tokens ** 2 * len(self.accounts) * (len(self.accounts) - 1)
+        if count > possible:
+            raise ValueError(
+                "Only {} distinct offers are possible, not {}".format(
+                    possible, count
+                )
+            )
+
+        offers = {}
+        while len(offers) < count:
+            maker, taker = self.random.sample(range(len(self.accounts)), 2)
+            offer = Offer(
+                self.random.choice(self.collections),
+                self.random.choice(self.token_ids(maker)),
+                self.random.choice(self.collections),
+                self.random.choice(self.token_ids(taker)),
+                expires,
+            )
+            offers.setdefault(offer, self.accounts[maker])
+        return [(maker, offer) for offer, maker in offers.items()]
+
+    def make_offers(self, pipeline, letmeget, offers, workers=None):
+        """ Approve and offer every (maker, Offer) on a LetMeGet_v2 """
+        letmeget = to_checksum_address(letmeget)
+        by_maker = {}
+        for maker, offer in offers:
+            by_maker.setdefault(maker.address, (maker, []))[1].append(offer)
+
+        for maker, maker_offers in by_maker.values():
+            signatures = sign_hashes(
+                maker.key,
+                personal_hashes(hash_offers(maker_offers)),
+                workers=workers,
+            )
+
+            # Sent before the offers, so nonce order mines them first
+            approved = set()
+            for offer in maker_offers:
+                token = (offer.offer_contract, offer.offer_token_id)
+                if token in approved:
+                    continue
+                approved.add(token)
+                pipeline.send(
+                    maker,
+                    offer.offer_contract,
+                    APPROVE
+                    + encode_abi(
+                        ["address", "uint256"], [letmeget, offer.offer_token_id]
+                    ),
+                    gas=APPROVE_GAS,
+                )
+
+            for offer, signature in zip(maker_offers, signatures):
+                pipeline.send(
+                    maker,
+                    letmeget,
+                    OFFER
+                    + encode_abi(
+                        [
+                            "address",
+                            "uint256",
+                            "address",
+                            "uint256",
+                            "uint256",
+                            "bytes",
+                        ],
+                        list(offer) + [signature],
+                    ),
+                    gas=OFFER_GAS,
+                )
+
+        return pipeline.wait()
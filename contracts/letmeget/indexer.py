@@ -0,0 +1,304 @@
+""" Incremental, reorg-safe indexer of LetMeGet_v2 offer events
+
+    python -m letmeget.indexer --rpc http://localhost:8545 \
+        --address 0x... --start-block 9000000 --db offers.sqlite3 --serve 8000
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from eth_utils import is_address, to_checksum_address
+
+from letmeget.backfill import Backfill
+from letmeget.events import EVENT_TOPICS, decode_log
+from letmeget.live import LiveOffers
+from letmeget.offers import Offer
+from letmeget.store import OfferStore
+from letmeget.verify import SignatureVerifier, offer_signature
+
+
+def _hex(value):
+    if isinstance(value, str):
+        return value
+    return "0x" + bytes(value).hex()
+
+
+class OfferIndexer:
+    """
+    Follows Offer, OfferRevoked and Accept events of one LetMeGet_v2
+    contract into an OfferStore.
+
+    Only blocks at least `confirmations` deep are indexed.  If the chain
+    reorgs deeper than that anyway, the store is rolled back to the newest
+    checkpoint that is still on the canonical chain and synced forward again.
+
+    Catching up is done by a Backfill, `workers` block ranges at a time,
+    starting from ranges of `chunk_size` blocks and adapting to what the
+    node accepts.
+
+    `live` holds the offers that are open and unexpired at the last synced
+    head, so liveness checks need neither RPC nor database queries.
+
+    Unless `verify` is off, each Offer event's maker is recovered from the
+    signature in its transaction by a SignatureVerifier, over
+    `verify_workers` processes, and stored as the offer's offer_owner.
+    The transactions are fetched `tx_workers` at a time, shared by all
+    backfill workers.
+    Offers whose transaction did not call offer() directly are left
+    unverified, with no offer_owner.
+    """
+
+    def __init__(
+        self,
+        web3,
+        address,
+        store,
+        start_block=0,
+        confirmations=12,
+        chunk_size=2000,
+        workers=4,
+        max_chunk_size=100000,
+        verify=True,
+        verify_workers=None,
+        tx_workers=8,
+    ):
+        self.web3 = web3
+        self.address = to_checksum_address(address)
+        self.store = store
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.chunk_size = chunk_size
+        self.backfill = Backfill(
+            self, workers=workers, max_chunk_size=max_chunk_size
+        )
+        self.verifier = (
+            SignatureVerifier(workers=verify_workers) if verify else None
+        )
+        self.tx_executor = ThreadPoolExecutor(max_workers=max(1, tx_workers))
+        self.live = LiveOffers()
+        self.load_live()
+
+    def get_logs(self, from_block, to_block):
+        """ All of the contract's offer events in an inclusive block range """
+        return self.web3.eth.get_logs(
+            {
+                "address": self.address,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                # Any of the three events
+                "topics": [list(EVENT_TOPICS.keys())],
+            }
+        )
+
+    def block_hash(self, block_number):
+        return _hex(self.web3.eth.get_block(block_number)["hash"])
+
+    def transaction_input(self, tx_hash):
+        return self.web3.eth.get_transaction(tx_hash)["input"]
+
+    def verify_events(self, events):
+        """ Events with each Offer's signer recovered from its transaction """
+        if self.verifier is None:
+            return events
+
+        # One eth_getTransactionByHash per transaction, concurrently
+        tx_hashes = list(
+            dict.fromkeys(e.tx_hash for e in events if e.name == "Offer")
+        )
+        inputs = dict(
+            zip(
+                tx_hashes,
+                self.tx_executor.map(self.transaction_input, tx_hashes),
+            )
+        )
+
+        items = []
+        for event in events:
+            if event.name != "Offer":
+                continue
+            offer = Offer(
+                event.offer_contract,
+                event.offer_token_id,
+                event.wanted_contract,
+                event.wanted_token_id,
+                event.expires,
+            )
+            items.append((offer, offer_signature(inputs[event.tx_hash], offer)))
+
+        signers = iter(self.verifier.verify(items))
+        return [
+            event._replace(signer=next(signers))
+            if event.name == "Offer"
+            else event
+            for event in events
+        ]
+
+    def safe_head(self):
+        """ Newest block considered final """
+        return self.web3.eth.block_number - self.confirmations
+
+    def load_live(self):
+        """ Rebuild the live offers from the store """
+        checkpoint = self.store.checkpoint()
+        # Expiry only ever moves forward, even if the checkpoint moved back
+        block_number = max(
+            self.live.block_number, checkpoint[0] if checkpoint else 0
+        )
+        self.live.load(self.store.live_offers(block_number), block_number)
+
+    def apply(self, events, block_number, block_hash):
+        """ Store events up to a checkpoint and update the live offers """
+        self.store.apply(events, block_number, block_hash)
+        self.live.apply(
+            sorted(events, key=lambda e: (e.block_number, e.log_index))
+        )
+
+    def check_reorg(self):
+        """
+        Roll back to the newest checkpoint still on the canonical chain.
+        Returns the block number rolled back to, or None if no reorg.
+        """
+        head = self.web3.eth.block_number
+        checkpoints = self.store.checkpoints()
+        for i, (block_number, block_hash) in enumerate(checkpoints):
+            # The new chain may be shorter than the one we indexed
+            if block_number > head:
+                continue
+            if self.block_hash(block_number) == block_hash:
+                if i == 0:
+                    return None
+                self.store.rollback(block_number)
+                self.load_live()
+                return block_number
+
+        # Forked below everything we remember, start over
+        self.store.rollback(self.start_block - 1)
+        self.load_live()
+        return self.start_block - 1
+
+    def next_block(self):
+        checkpoint = self.store.checkpoint()
+        return checkpoint[0] + 1 if checkpoint else self.start_block
+
+    def sync(self):
+        """ Index everything confirmed since the last checkpoint """
+        if self.store.checkpoint():
+            self.check_reorg()
+
+        head = self.web3.eth.block_number
+        from_block = self.next_block()
+        indexed = 0
+
+        if from_block <= head - self.confirmations:
+            indexed = self.backfill.run(from_block, head - self.confirmations)
+
+        self.live.advance(head)
+        return indexed
+
+    def run(self, poll_interval=5):
+        """ Sync forever """
+        while True:
+            if self.sync() and self.verifier is not None:
+                print(self.verifier.report(), file=sys.stderr)
+            time.sleep(poll_interval)
+
+
+class OffersHandler(BaseHTTPRequestHandler):
+    """ GET /offers/<wanted owner address> """
+
+    def do_GET(self):
+        parts = urlsplit(self.path).path.strip("/").split("/")
+
+        if len(parts) != 2 or parts[0] != "offers":
+            self.send_error(404)
+            return
+        if not is_address(parts[1]):
+            self.send_error(400, "Invalid address")
+            return
+
+        live = self.server.indexer.live
+        body = json.dumps(
+            {
+                "block_number": live.block_number,
+                "offers": live.for_owner(parts[1]),
+            }
+        ).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(indexer, port):
+    """ Serve open offers over HTTP from a background thread """
+    server = ThreadingHTTPServer(("", port), OffersHandler)
+    server.daemon_threads = True
+    server.indexer = indexer
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    from web3 import Web3
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rpc", default="http://localhost:8545")
+    parser.add_argument("--address", required=True, help="LetMeGet_v2")
+    parser.add_argument("--db", default="offers.sqlite3")
+    parser.add_argument("--start-block", type=int, default=0)
+    parser.add_argument("--confirmations", type=int, default=12)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--max-chunk-size", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--poll-interval", type=float, default=5)
+    parser.add_argument(
+        "--verify-workers",
+        type=int,
+        default=None,
+        help="Signature recovery processes, default one per CPU",
+    )
+    parser.add_argument(
+        "--tx-workers",
+        type=int,
+        default=8,
+        help="Concurrent transaction lookups for signature recovery",
+    )
+    parser.add_argument(
+        "--no-verify",
+        dest="verify",
+        action="store_false",
+        help="Do not recover offer signers from transactions",
+    )
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT")
+    args = parser.parse_args(argv)
+
+    indexer = OfferIndexer(
+        Web3(Web3.HTTPProvider(args.rpc)),
+        args.address,
+        OfferStore(args.db),
+        start_block=args.start_block,
+        confirmations=args.confirmations,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        max_chunk_size=args.max_chunk_size,
+        verify=args.verify,
+        verify_workers=args.verify_workers,
+        tx_workers=args.tx_workers,
+    )
+
+    if args.serve:
+        serve(indexer, args.serve)
+        print("Serving open offers on :{}".format(args.serve), file=sys.stderr)
+
+    indexer.run(args.poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+""" In-memory table of live offers, kept current from indexed events """
+import heapq
+import threading
+from collections import defaultdict
+from eth_utils import to_bytes, to_checksum_address
+
+
+def _key(offer_hash):
+    if isinstance(offer_hash, str):
+        return to_bytes(hexstr=offer_hash)
+    return bytes(offer_hash)
+
+
+def _event_offer(event):
+    """ An Offer event as the same dict OfferStore returns """
+    return {
+        "offer_hash": "0x" + event.offer_hash.hex(),
+        "status": "open",
+        "wanted_owner": event.owner,
+        "offer_owner": event.signer,
+        "wanted_contract": event.wanted_contract,
+        "offer_contract": event.offer_contract,
+        "wanted_token_id": event.wanted_token_id,
+        "offer_token_id": event.offer_token_id,
+        "expires": event.expires,
+        "block_number": event.block_number,
+        "updated_block": event.block_number,
+        "tx_hash": event.tx_hash,
+    }
+
+
+class LiveOffers:
+    """
+    Offers that are open and unexpired as of `block_number`, mirroring the
+    contract's checks without any RPC.
+
+    Revokes and accepts remove offers as their events arrive.  Expiry is
+    driven by a min-heap on `expires`, popped as the block number advances,
+    so each advance costs O(k log n) for the k offers that just expired.
+    """
+
+    def __init__(self):
+        self.block_number = 0
+        self._offers = {}
+        self._by_owner = defaultdict(set)
+        self._expiry = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._offers)
+
+    def _add(self, offer):
+        if offer["expires"] <= self.block_number:
+            return
+        key = _key(offer["offer_hash"])
+        self._offers[key] = offer
+        self._by_owner[offer["wanted_owner"]].add(key)
+        heapq.heappush(self._expiry, (offer["expires"], key))
+
+    def _remove(self, key):
+        offer = self._offers.pop(key, None)
+        if offer is None:
+            return
+        owned = self._by_owner[offer["wanted_owner"]]
+        owned.discard(key)
+        if not owned:
+            del self._by_owner[offer["wanted_owner"]]
+        # Its heap entry is skipped when popped, rather than searched for now
+
+    def load(self, offers, block_number):
+        """ Replace everything with offers (OfferStore dicts) at a block """
+        with self._lock:
+            self.block_number = block_number
+            self._offers.clear()
+            self._by_owner.clear()
+            self._expiry = []
+            for offer in offers:
+                self._add(offer)
+
+    def apply(self, events):
+        """ Apply decoded events, in chain order """
+        with self._lock:
+            for event in events:
+                if event.name == "Offer":
+                    self._add(_event_offer(event))
+                else:
+                    self._remove(event.offer_hash)
+
+    def advance(self, block_number):
+        """ Evict every offer that has expired by block_number """
+        with self._lock:
+            if block_number <= self.block_number:
+                return 0
+            self.block_number = block_number
+
+            evicted = 0
+            while self._expiry and self._expiry[0][0] <= block_number:
+                expires, key = heapq.heappop(self._expiry)
+                offer = self._offers.get(key)
+                # Stale entry of an offer already revoked or accepted
+                if offer is not None and offer["expires"] == expires:
+                    self._remove(key)
+                    evicted += 1
+            return evicted
+
+    def is_live(self, offer_hash):
+        with self._lock:
+            return _key(offer_hash) in self._offers
+
+    def get(self, offer_hash):
+        with self._lock:
+            return self._offers.get(_key(offer_hash))
+
+    def for_owner(self, wanted_owner):
+        """ Live offers for tokens owned by wanted_owner, soonest expiry first """
+        with self._lock:
+            keys = self._by_owner.get(to_checksum_address(wanted_owner), ())
+            offers = [self._offers[key] for key in keys]
+        return sorted(offers, key=lambda offer: offer["expires"])
@@ -0,0 +1,129 @@
+""" Compact per-chain deployment manifests for the frontend
+
+    python -m letmeget.manifest build/deployments/4 \
+        ../frontend/src/artifacts/4.json
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+from eth_utils import to_checksum_address
+
+# What ethers needs to call a contract and filter its events
+ABI_TYPES = ("function", "event")
+ABI_KEYS = (
+    "type",
+    "name",
+    "inputs",
+    "outputs",
+    "stateMutability",
+    "anonymous",
+    "indexed",
+    "components",
+)
+
+
+def _compact(entry):
+    """ An ABI entry or parameter without gas estimates or internalType """
+    compact = {}
+    for key in ABI_KEYS:
+        if key not in entry:
+            continue
+        value = entry[key]
+        if key in ("inputs", "outputs", "components"):
+            value = [_compact(param) for param in value]
+        compact[key] = value
+    return compact
+
+
+def compact_abi(abi):
+    return [_compact(entry) for entry in abi if entry.get("type") in ABI_TYPES]
+
+
+def manifest_entry(address, abi, deploy_block):
+    return {
+        "address": to_checksum_address(address),
+        "abi": compact_abi(abi),
+        "deployBlock": deploy_block,
+    }
+
+
+def from_deployment(artifact):
+    """ (name, entry) from a brownie build/deployments artifact """
+    deployment = artifact["deployment"]
+    return artifact["contractName"], manifest_entry(
+        deployment["address"], artifact["abi"], deployment["blockHeight"]
+    )
+
+
+def encode_manifest(chain_id, contracts):
+    """ Canonical JSON bytes, so equal manifests hash equal """
+    return json.dumps(
+        {"chainId": int(chain_id), "contracts": contracts},
+        sort_keys=True,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def write_manifest(path, chain_id, contracts):
+    """
+    Write a manifest of {name: manifest_entry} unless the file already has
+    the same content.  Returns whether it was written.
+    """
+    data = encode_manifest(chain_id, contracts)
+    try:
+        with open(path, "rb") as f:
+            current = hashlib.sha256(f.read()).digest()
+    except FileNotFoundError:
+        current = None
+    if current == hashlib.sha256(data).digest():
+        return False
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = "{}.tmp".format(path)
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def export_deployments(deployments_dir, path, names=None):
+    """
+    Manifest of the newest deployment of each contract in a brownie
+    build/deployments/<chain> directory
+    """
+    contracts = {}
+    blocks = {}
+    chain_id = os.path.basename(os.path.normpath(deployments_dir))
+
+    for filename in sorted(os.listdir(deployments_dir)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(deployments_dir, filename)) as f:
+            name, entry = from_deployment(json.load(f))
+        if names and name not in names:
+            continue
+        if entry["deployBlock"] >= blocks.get(name, -1):
+            contracts[name] = entry
+            blocks[name] = entry["deployBlock"]
+
+    return write_manifest(path, chain_id, contracts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("deployments", help="build/deployments/<chain ID>")
+    parser.add_argument("manifest", help="Manifest file to write")
+    parser.add_argument("names", nargs="*", help="Only these contracts")
+    args = parser.parse_args(argv)
+
+    written = export_deployments(args.deployments, args.manifest, args.names)
+    print(
+        "{} {}".format("Wrote" if written else "Unchanged", args.manifest),
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
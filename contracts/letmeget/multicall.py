@@ -0,0 +1,151 @@
+""" Check many offers in one eth_call through a Multicall2 aggregator """
+from collections import namedtuple
+from eth_utils import keccak, to_bytes, to_checksum_address
+
+try:
+    from eth_abi import decode as decode_abi, encode as encode_abi
+except ImportError:  # eth-abi < 4
+    from eth_abi import decode_abi, encode_abi
+
+from letmeget.offers import Offer, hash_params
+
+# MakerDAO's Multicall2, same address on mainnet, rinkeby, goerli, kovan and
+# ropsten.  Local chains get their own from scripts/deploy/dev_deploy.py
+MULTICALL2_ADDRESS = "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696"
+
+
+def selector(signature):
+    return keccak(text=signature)[:4]
+
+
+TRY_BLOCK_AND_AGGREGATE = selector(
+    "tryBlockAndAggregate(bool,(address,bytes)[])"
+)
+OFFERS = selector("offers(bytes32)")
+GET_APPROVED = selector("getApproved(uint256)")
+
+# LetMeGet_v2.offers() returns OfferDetails(revoked, signer, signature, expires)
+OFFER_DETAILS_TYPES = ["bool", "address", "bytes", "uint256"]
+
+OfferCheck = namedtuple("OfferCheck", ["offer", "can_complete", "reason"])
+
+
+def _bytes(value):
+    if isinstance(value, str):
+        return to_bytes(hexstr=value)
+    return bytes(value)
+
+
+def _address(return_data):
+    return to_checksum_address(decode_abi(["address"], return_data)[0])
+
+
+def offer_calls(letmeget, offer):
+    """ The three calls offer_can_complete makes, as (target, calldata) """
+    offer_hash = hash_params(*offer)
+    return [
+        (letmeget, OFFERS + offer_hash),
+        (
+            offer.offer_contract,
+            GET_APPROVED + encode_abi(["uint256"], [offer.offer_token_id]),
+        ),
+        (
+            offer.wanted_contract,
+            GET_APPROVED + encode_abi(["uint256"], [offer.wanted_token_id]),
+        ),
+    ]
+
+
+def check_results(letmeget, offer, block_number, results):
+    """
+    Mirror LetMeGet_v2.offer_can_complete on the results of offer_calls,
+    naming the first check that fails
+    """
+    details, offer_approved, wanted_approved = results
+
+    if not details[0] or not details[1]:
+        return OfferCheck(offer, False, "call-failed")
+
+    revoked, signer, _, expires = decode_abi(OFFER_DETAILS_TYPES, details[1])
+    if int(signer, 16) == 0:
+        return OfferCheck(offer, False, "offer-does-not-exist")
+    if revoked:
+        return OfferCheck(offer, False, "offer-revoked")
+    if expires <= block_number:
+        return OfferCheck(offer, False, "offer-expired")
+
+    # getApproved reverts for tokens that do not exist (any more), and calls
+    # to an address without code succeed but return nothing
+    if not offer_approved[0]:
+        return OfferCheck(offer, False, "offer-token-not-found")
+    if len(offer_approved[1]) < 32:
+        return OfferCheck(offer, False, "offer-not-erc721")
+    if _address(offer_approved[1]) != letmeget:
+        return OfferCheck(offer, False, "offer-not-approved")
+    if not wanted_approved[0]:
+        return OfferCheck(offer, False, "wanted-token-not-found")
+    if len(wanted_approved[1]) < 32:
+        return OfferCheck(offer, False, "wanted-not-erc721")
+    if _address(wanted_approved[1]) != letmeget:
+        return OfferCheck(offer, False, "wanted-not-approved")
+
+    return OfferCheck(offer, True, None)
+
+
+class OfferChecker:
+    """
+    Batched offer_can_complete: every offer's checks in one eth_call to a
+    Multicall2 contract per `batch_size` offers, with failed sub-calls
+    reported instead of reverting the whole batch.
+    """
+
+    def __init__(
+        self,
+        web3,
+        letmeget,
+        multicall=MULTICALL2_ADDRESS,
+        batch_size=500,
+    ):
+        self.web3 = web3
+        self.letmeget = to_checksum_address(letmeget)
+        self.multicall = to_checksum_address(multicall)
+        self.batch_size = batch_size
+
+    def aggregate(self, calls):
+        """ block.number and [(success, return_data)] for (target, data) """
+        data = TRY_BLOCK_AND_AGGREGATE + encode_abi(
+            ["bool", "(address,bytes)[]"],
+            [False, [(to_checksum_address(t), d) for t, d in calls]],
+        )
+        returned = self.web3.eth.call(
+            {"to": self.multicall, "data": "0x" + data.hex()}
+        )
+        block_number, _, results = decode_abi(
+            ["uint256", "bytes32", "(bool,bytes)[]"], _bytes(returned)
+        )
+        return block_number, results
+
+    def check(self, offers):
+        """ An OfferCheck for each offer, in order """
+        offers = [Offer(*offer) for offer in offers]
+        checks = []
+
+        for i in range(0, len(offers), self.batch_size):
+            batch = offers[i : i + self.batch_size]
+            calls = [
+                call
+                for offer in batch
+                for call in offer_calls(self.letmeget, offer)
+            ]
+            block_number, results = self.aggregate(calls)
+            checks.extend(
+                check_results(
+                    self.letmeget,
+                    offer,
+                    block_number,
+                    results[j * 3 : (j + 1) * 3],
+                )
+                for j, offer in enumerate(batch)
+            )
+
+        return checks
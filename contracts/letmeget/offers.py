@@ -0,0 +1,40 @@
+""" Offer parameters and hashing, matching LetMeGet_v2._hash_params """
+from collections import namedtuple
+from eth_utils import keccak, to_bytes
+
+Offer = namedtuple(
+    "Offer",
+    [
+        "offer_contract",
+        "offer_token_id",
+        "wanted_contract",
+        "wanted_token_id",
+        "expires",
+    ],
+)
+
+
+def address_word(address):
+    """ Left pad an address to a 32 byte word, like convert(addr, bytes32) """
+    return to_bytes(hexstr=address).rjust(32, b"\0")
+
+
+def uint_word(value):
+    return int(value).to_bytes(32, "big")
+
+
+def hash_params(
+    offer_contract,
+    offer_token_id,
+    wanted_contract,
+    wanted_token_id,
+    expires,
+):
+    """ Hash offer params the same way the contract keys its offers """
+    return keccak(
+        address_word(offer_contract)
+        + uint_word(offer_token_id)
+        + address_word(wanted_contract)
+        + uint_word(wanted_token_id)
+        + uint_word(expires)
+    )
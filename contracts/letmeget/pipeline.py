@@ -0,0 +1,118 @@
+""" Pipelined transaction submission with locally assigned nonces """
+import time
+from contextlib import contextmanager
+from eth_utils import to_checksum_address
+
+# Enough for an ERC-721 transfer or a plain ETH send on a dev chain
+DEFAULT_GAS = 100000
+
+
+class TransactionFailed(Exception):
+    pass
+
+
+class TxPipeline:
+    """
+    Sends transactions back to back without waiting on each one.
+
+    Nonces are fetched once per sender and then counted locally, and gas
+    is given up front, so a send is a single RPC round trip.  Senders are
+    either addresses the node has unlocked or eth_account LocalAccounts,
+    which are signed for locally.  `wait()` collects every receipt at the
+    end.  Time spent in each `stage()` is kept for `report()`.
+    """
+
+    def __init__(self, web3, gas_price=int(1e9), timeout=120):
+        self.web3 = web3
+        self.gas_price = gas_price
+        self.timeout = timeout
+        self.pending = []
+        self.timings = []
+        self._nonces = {}
+        self._chain_id = None
+
+    def nonce(self, address):
+        """ The next nonce for address, counting what was sent here """
+        address = to_checksum_address(address)
+        if address not in self._nonces:
+            self._nonces[address] = self.web3.eth.get_transaction_count(
+                address, "pending"
+            )
+        nonce = self._nonces[address]
+        self._nonces[address] += 1
+        return nonce
+
+    def send(self, sender, to, data=b"", value=0, gas=DEFAULT_GAS):
+        """ Submit a transaction and return its hash without waiting """
+        address = getattr(sender, "address", sender)
+        tx = {
+            "from": to_checksum_address(address),
+            "to": to_checksum_address(to),
+            "data": data,
+            "value": value,
+            "gas": gas,
+            "gasPrice": self.gas_price,
+            "nonce": self.nonce(address),
+        }
+
+        try:
+            if hasattr(sender, "sign_transaction"):
+                tx_hash = self.web3.eth.send_raw_transaction(
+                    self._sign(sender, tx)
+                )
+            else:
+                tx_hash = self.web3.eth.send_transaction(tx)
+        except Exception:
+            # The node never saw this nonce, so start again from its count
+            del self._nonces[tx["from"]]
+            raise
+
+        self.pending.append(tx_hash)
+        return tx_hash
+
+    def _sign(self, account, tx):
+        if self._chain_id is None:
+            self._chain_id = self.web3.eth.chain_id
+        tx = dict(tx, chainId=self._chain_id)
+        del tx["from"]
+        signed = account.sign_transaction(tx)
+        raw = getattr(signed, "raw_transaction", None)
+        if raw is None:  # eth-account < 0.13
+            raw = signed.rawTransaction
+        return raw
+
+    def wait(self):
+        """
+        Receipts of everything sent since the last wait, in order.  Raises
+        TransactionFailed if any of them reverted.
+        """
+        pending, self.pending = self.pending, []
+        receipts = [
+            self.web3.eth.wait_for_transaction_receipt(
+                tx_hash, timeout=self.timeout
+            )
+            for tx_hash in pending
+        ]
+
+        failed = [r["transactionHash"] for r in receipts if r["status"] != 1]
+        if failed:
+            raise TransactionFailed(
+                "{} of {} transactions failed, first {}".format(
+                    len(failed), len(receipts), "0x" + bytes(failed[0]).hex()
+                )
+            )
+        return receipts
+
+    @contextmanager
+    def stage(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings.append((name, time.monotonic() - started))
+
+    def report(self):
+        return "\n".join(
+            "{:<24} {:>8.3f}s".format(name, seconds)
+            for name, seconds in self.timings
+        )
@@ -0,0 +1,293 @@
+""" SQLite store of indexed LetMeGet offers """
+import sqlite3
+import threading
+from contextlib import contextmanager
+from eth_utils import to_checksum_address
+
+from letmeget.events import OfferEvent
+
+# Offer status by the last event seen for its hash
+STATUS_BY_EVENT = {
+    "Offer": "open",
+    "OfferRevoked": "revoked",
+    "Accept": "accepted",
+}
+# How many past checkpoints to keep for finding where a reorg forked
+CHECKPOINT_HISTORY = 128
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    offer_hash BLOB NOT NULL,
+    owner TEXT NOT NULL,
+    wanted_contract TEXT NOT NULL,
+    offer_contract TEXT NOT NULL,
+    wanted_token_id TEXT NOT NULL,
+    offer_token_id TEXT NOT NULL,
+    expires INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    signer TEXT,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS events_offer_hash ON events (offer_hash);
+
+CREATE TABLE IF NOT EXISTS offers (
+    offer_hash BLOB PRIMARY KEY,
+    status TEXT NOT NULL,
+    wanted_owner TEXT NOT NULL,
+    offer_owner TEXT,
+    wanted_contract TEXT NOT NULL,
+    offer_contract TEXT NOT NULL,
+    wanted_token_id TEXT NOT NULL,
+    offer_token_id TEXT NOT NULL,
+    expires INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    updated_block INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS offers_wanted_owner
+    ON offers (wanted_owner, status, expires);
+CREATE INDEX IF NOT EXISTS offers_offer_contract
+    ON offers (offer_contract, status, expires);
+CREATE INDEX IF NOT EXISTS offers_expires ON offers (expires);
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    block_number INTEGER PRIMARY KEY,
+    block_hash TEXT NOT NULL
+);
+"""
+
+OFFER_COLUMNS = (
+    "offer_hash",
+    "status",
+    "wanted_owner",
+    "offer_owner",
+    "wanted_contract",
+    "offer_contract",
+    "wanted_token_id",
+    "offer_token_id",
+    "expires",
+    "block_number",
+    "updated_block",
+    "tx_hash",
+)
+OFFER_SELECT = "SELECT {} FROM offers".format(", ".join(OFFER_COLUMNS))
+OFFER_INSERT = "INSERT OR REPLACE INTO offers ({}) VALUES ({})".format(
+    ", ".join(OFFER_COLUMNS), ", ".join("?" * len(OFFER_COLUMNS))
+)
+
+
+def _offer_dict(row):
+    offer = dict(zip(OFFER_COLUMNS, row))
+    offer["offer_hash"] = "0x" + bytes(offer["offer_hash"]).hex()
+    offer["wanted_token_id"] = int(offer["wanted_token_id"])
+    offer["offer_token_id"] = int(offer["offer_token_id"])
+    return offer
+
+
+class OfferStore:
+    """ Events, derived offer state and sync checkpoints in one SQLite file """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+
+        # Stores created before events recorded verified signers
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(events)")]
+        if "signer" not in columns:
+            conn.execute("ALTER TABLE events ADD COLUMN signer TEXT")
+
+    def _conn(self):
+        # sqlite3 connections can not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _apply_event(self, conn, event):
+        """ Update the offer an event refers to """
+        status = STATUS_BY_EVENT[event.name]
+
+        if event.name == "Offer":
+            conn.execute(
+                OFFER_INSERT,
+                (
+                    event.offer_hash,
+                    status,
+                    event.owner,
+                    event.signer,
+                    event.wanted_contract,
+                    event.offer_contract,
+                    str(event.wanted_token_id),
+                    str(event.offer_token_id),
+                    event.expires,
+                    event.block_number,
+                    event.block_number,
+                    event.tx_hash,
+                ),
+            )
+        else:
+            conn.execute(
+                "UPDATE offers SET status = ?, updated_block = ?,"
+                " offer_owner = COALESCE(?, offer_owner)"
+                " WHERE offer_hash = ?",
+                (
+                    status,
+                    event.block_number,
+                    event.owner if event.name == "Accept" else None,
+                    event.offer_hash,
+                ),
+            )
+
+    def apply(self, events, block_number, block_hash):
+        """
+        Atomically store events, in chain order, up to and including
+        block_number and checkpoint there
+        """
+        with self._transaction() as conn:
+            for event in sorted(
+                events, key=lambda e: (e.block_number, e.log_index)
+            ):
+                conn.execute(
+                    "INSERT OR IGNORE INTO events VALUES"
+                    " (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        event.block_number,
+                        event.log_index,
+                        event.name,
+                        event.offer_hash,
+                        event.owner,
+                        event.wanted_contract,
+                        event.offer_contract,
+                        str(event.wanted_token_id),
+                        str(event.offer_token_id),
+                        event.expires,
+                        event.tx_hash,
+                        event.signer,
+                    ),
+                )
+                self._apply_event(conn, event)
+
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?)",
+                (block_number, block_hash),
+            )
+            conn.execute(
+                "DELETE FROM checkpoints WHERE block_number NOT IN ("
+                " SELECT block_number FROM checkpoints"
+                " ORDER BY block_number DESC LIMIT ?"
+                ")",
+                (CHECKPOINT_HISTORY,),
+            )
+
+    def checkpoint(self):
+        """ (block_number, block_hash) of the last synced block, or None """
+        return (
+            self._conn()
+            .execute(
+                "SELECT block_number, block_hash FROM checkpoints"
+                " ORDER BY block_number DESC LIMIT 1"
+            )
+            .fetchone()
+        )
+
+    def checkpoints(self):
+        """ Known (block_number, block_hash) checkpoints, newest first """
+        return (
+            self._conn()
+            .execute(
+                "SELECT block_number, block_hash FROM checkpoints"
+                " ORDER BY block_number DESC"
+            )
+            .fetchall()
+        )
+
+    def rollback(self, block_number):
+        """ Forget everything after block_number and rebuild what it touched """
+        with self._transaction() as conn:
+            hashes = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT DISTINCT offer_hash FROM events"
+                    " WHERE block_number > ?",
+                    (block_number,),
+                )
+            ]
+            conn.execute(
+                "DELETE FROM events WHERE block_number > ?", (block_number,)
+            )
+            conn.execute(
+                "DELETE FROM checkpoints WHERE block_number > ?",
+                (block_number,),
+            )
+
+            # Replay what is left of each affected offer's history
+            for offer_hash in hashes:
+                conn.execute(
+                    "DELETE FROM offers WHERE offer_hash = ?", (offer_hash,)
+                )
+                rows = conn.execute(
+                    "SELECT name, offer_hash, owner, wanted_contract,"
+                    " offer_contract, wanted_token_id, offer_token_id,"
+                    " expires, block_number, log_index, tx_hash, signer"
+                    " FROM events WHERE offer_hash = ?"
+                    " ORDER BY block_number, log_index",
+                    (offer_hash,),
+                ).fetchall()
+                for row in rows:
+                    self._apply_event(conn, OfferEvent(*row))
+
+    def get_offer(self, offer_hash):
+        row = (
+            self._conn()
+            .execute(
+                OFFER_SELECT + " WHERE offer_hash = ?", (bytes(offer_hash),)
+            )
+            .fetchone()
+        )
+        return _offer_dict(row) if row else None
+
+    def live_offers(self, block_number=0):
+        """ Every open offer still unexpired at block_number """
+        rows = self._conn().execute(
+            OFFER_SELECT + " WHERE status = 'open' AND expires > ?",
+            (block_number,),
+        )
+        return [_offer_dict(row) for row in rows]
+
+    def open_offers(self, wanted_owner, block_number=0):
+        """ Open offers for tokens owned by wanted_owner, unexpired at block """
+        rows = self._conn().execute(
+            OFFER_SELECT
+            + " WHERE wanted_owner = ? AND status = 'open' AND expires > ?"
+            " ORDER BY expires",
+            (to_checksum_address(wanted_owner), block_number),
+        )
+        return [_offer_dict(row) for row in rows]
+
+    def offers_for_contract(self, offer_contract, block_number=0):
+        """ Open offers of tokens from offer_contract, unexpired at block """
+        rows = self._conn().execute(
+            OFFER_SELECT
+            + " WHERE offer_contract = ? AND status = 'open' AND expires > ?"
+            " ORDER BY expires",
+            (to_checksum_address(offer_contract), block_number),
+        )
+        return [_offer_dict(row) for row in rows]
@@ -0,0 +1,186 @@
+""" EIP-712 typed data offers, as signed for LetMeGet_v3 """
+from eth_keys import keys
+from eth_utils import keccak, to_bytes, to_checksum_address
+
+from letmeget.bulk import hash_records, pack_offers, sign_hashes
+from letmeget.offers import Offer, address_word, uint_word
+
+DOMAIN_NAME = "LetMeGet"
+DOMAIN_VERSION = "3"
+DOMAIN_TYPE = (
+    "EIP712Domain(string name,string version,uint256 chainId,"
+    "address verifyingContract)"
+)
+OFFER_TYPE = (
+    "Offer(address offerContract,uint256 offerTokenId,address wantedContract,"
+    "uint256 wantedTokenId,uint256 expires,uint256 epoch)"
+)
+DOMAIN_TYPEHASH = keccak(text=DOMAIN_TYPE)
+OFFER_TYPEHASH = keccak(text=OFFER_TYPE)
+
+# The same types in the form wallets' eth_signTypedData_v4 and the eip712
+# package expect
+EIP712_TYPES = {
+    "EIP712Domain": [
+        {"name": "name", "type": "string"},
+        {"name": "version", "type": "string"},
+        {"name": "chainId", "type": "uint256"},
+        {"name": "verifyingContract", "type": "address"},
+    ],
+    "Offer": [
+        {"name": "offerContract", "type": "address"},
+        {"name": "offerTokenId", "type": "uint256"},
+        {"name": "wantedContract", "type": "address"},
+        {"name": "wantedTokenId", "type": "uint256"},
+        {"name": "expires", "type": "uint256"},
+        {"name": "epoch", "type": "uint256"},
+    ],
+}
+
+
+def domain_separator(chain_id, verifying_contract):
+    return keccak(
+        DOMAIN_TYPEHASH
+        + keccak(text=DOMAIN_NAME)
+        + keccak(text=DOMAIN_VERSION)
+        + uint_word(chain_id)
+        + address_word(verifying_contract)
+    )
+
+
+def struct_hash(offer, epoch=0):
+    """ hashStruct(Offer), matching LetMeGet_v3._hash_params """
+    offer = Offer(*offer)
+    return keccak(
+        OFFER_TYPEHASH
+        + address_word(offer.offer_contract)
+        + uint_word(offer.offer_token_id)
+        + address_word(offer.wanted_contract)
+        + uint_word(offer.wanted_token_id)
+        + uint_word(offer.expires)
+        + uint_word(epoch)
+    )
+
+
+def typed_data(chain_id, verifying_contract, offer, epoch=0):
+    """ An offer as eth_signTypedData_v4 JSON, for signing in a wallet """
+    offer = Offer(*offer)
+    return {
+        "types": EIP712_TYPES,
+        "primaryType": "Offer",
+        "domain": {
+            "name": DOMAIN_NAME,
+            "version": DOMAIN_VERSION,
+            "chainId": chain_id,
+            "verifyingContract": to_checksum_address(verifying_contract),
+        },
+        "message": {
+            "offerContract": to_checksum_address(offer.offer_contract),
+            "offerTokenId": offer.offer_token_id,
+            "wantedContract": to_checksum_address(offer.wanted_contract),
+            "wantedTokenId": offer.wanted_token_id,
+            "expires": offer.expires,
+            "epoch": epoch,
+        },
+    }
+
+
+def offer_message(chain_id, verifying_contract, offer, epoch=0):
+    """ An offer as an eip712 package EIP712Message """
+    # eip712 is only needed for interop, not for hashing or signing here
+    from eip712.messages import EIP712Domain
+
+    offer = Offer(*offer)
+    return _offer_message_class()(
+        offerContract=offer.offer_contract,
+        offerTokenId=offer.offer_token_id,
+        wantedContract=offer.wanted_contract,
+        wantedTokenId=offer.wanted_token_id,
+        expires=offer.expires,
+        epoch=epoch,
+        eip712_domain=EIP712Domain(
+            name=DOMAIN_NAME,
+            version=DOMAIN_VERSION,
+            chainId=chain_id,
+            verifyingContract=verifying_contract,
+        ),
+    )
+
+
+_OFFER_MESSAGE = None
+
+
+def _offer_message_class():
+    global _OFFER_MESSAGE
+    if _OFFER_MESSAGE is None:
+        from eip712.messages import EIP712Message
+        from eth_pydantic_types import abi
+
+        class Offer(EIP712Message):
+            offerContract: abi.address
+            offerTokenId: abi.uint256
+            wantedContract: abi.address
+            wantedTokenId: abi.uint256
+            expires: abi.uint256
+            epoch: abi.uint256
+
+        _OFFER_MESSAGE = Offer
+    return _OFFER_MESSAGE
+
+
+class TypedOffers:
+    """
+    Hashes and signs offers for one LetMeGet_v3 deployment.  The domain
+    separator and type hash are computed once, so each offer costs two
+    keccaks over fixed size buffers and no re-encoding.
+    """
+
+    def __init__(self, chain_id, verifying_contract):
+        self.chain_id = chain_id
+        self.verifying_contract = to_checksum_address(verifying_contract)
+        self.separator = domain_separator(chain_id, verifying_contract)
+        self._prefix = b"\x19\x01" + self.separator
+
+    def digest(self, offer, epoch=0):
+        """ The hash signed for an offer, LetMeGet_v3.hash_params """
+        return keccak(self._prefix + struct_hash(offer, epoch))
+
+    def digests(self, offers, epoch=0):
+        """ digest() of many offers sharing an epoch, hashed in bulk """
+        struct_hashes = hash_records(
+            *pack_offers(offers, prefix=OFFER_TYPEHASH, suffix=uint_word(epoch))
+        )
+        return [keccak(self._prefix + h) for h in struct_hashes]
+
+    def sign(self, private_key, offer, epoch=0):
+        """ 65 byte r, s, v signature of an offer """
+        return sign_digest(private_key, self.digest(offer, epoch))
+
+    def sign_all(self, private_key, offers, epoch=0, workers=None):
+        """ sign() many offers, over a process pool for large batches """
+        return sign_hashes(
+            _private_key(private_key),
+            self.digests(offers, epoch),
+            workers=workers,
+        )
+
+    def typed_data(self, offer, epoch=0):
+        return typed_data(self.chain_id, self.verifying_contract, offer, epoch)
+
+
+def _private_key(private_key):
+    if isinstance(private_key, keys.PrivateKey):
+        return private_key
+    if isinstance(private_key, str):
+        private_key = to_bytes(hexstr=private_key)
+    return keys.PrivateKey(private_key)
+
+
+def sign_digest(private_key, digest):
+    """ Sign a 32 byte digest as it is, no prefix, v as 27 or 28 """
+    signature = _private_key(private_key).sign_msg_hash(digest)
+    return (
+        signature.r.to_bytes(32, "big")
+        + signature.s.to_bytes(32, "big")
+        + bytes([signature.v + 27])
+    )
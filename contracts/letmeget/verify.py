@@ -0,0 +1,178 @@
+""" Off-chain verification of LetMeGet_v2 offer signatures """
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from eth_utils import to_bytes, to_checksum_address
+
+try:
+    from eth_abi import decode as decode_abi
+except ImportError:  # eth-abi < 4
+    from eth_abi import decode_abi
+
+from letmeget.bulk import (
+    DEFAULT_CHUNK_SIZE,
+    SIGNATURE_LENGTH,
+    hash_offers,
+    personal_hashes,
+    recover_signers,
+)
+from letmeget.multicall import selector
+from letmeget.offers import Offer
+
+OFFER_ARGS_TYPES = [
+    "address",
+    "uint256",
+    "address",
+    "uint256",
+    "uint256",
+    "bytes",
+]
+OFFER_SELECTOR = selector("offer({})".format(",".join(OFFER_ARGS_TYPES)))
+
+
+def _bytes(value):
+    if isinstance(value, str):
+        return to_bytes(hexstr=value)
+    return bytes(value)
+
+
+def offer_signature(tx_input, offer):
+    """
+    The signature passed to offer() in a transaction's input, or None if
+    the transaction did not call offer() directly with these params
+    """
+    data = _bytes(tx_input)
+    if data[:4] != OFFER_SELECTOR:
+        return None
+    try:
+        args = decode_abi(OFFER_ARGS_TYPES, data[4:])
+    except Exception:
+        return None
+
+    offer = Offer(*offer)
+    called = Offer(
+        to_checksum_address(args[0]),
+        args[1],
+        to_checksum_address(args[2]),
+        args[3],
+        args[4],
+    )
+    if called != offer._replace(
+        offer_contract=to_checksum_address(offer.offer_contract),
+        wanted_contract=to_checksum_address(offer.wanted_contract),
+    ):
+        return None
+    return bytes(args[5])
+
+
+class SignatureVerifier:
+    """
+    Recovers the signers of (offer, signature) pairs in batches, over a
+    process pool once a batch spans more than one `chunk_size` chunk.
+
+    Results are memoized by offer hash (up to `cache_size` of them), so
+    re-indexing after a reorg or restart does not recover them again.
+    `recovered`, `cache_hits` and `seconds` accumulate for throughput
+    reporting.
+    """
+
+    def __init__(
+        self, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, cache_size=100000
+    ):
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self.recovered = 0
+        self.cache_hits = 0
+        self.seconds = 0.0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None and self.workers > 1:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def _cached(self, offer_hash, signature):
+        with self._lock:
+            hit = self._cache.get(offer_hash)
+            if hit is None or hit[0] != signature:
+                return False, None
+            self._cache.move_to_end(offer_hash)
+            self.cache_hits += 1
+            return True, hit[1]
+
+    def _remember(self, offer_hash, signature, signer):
+        with self._lock:
+            self._cache[offer_hash] = (signature, signer)
+            self._cache.move_to_end(offer_hash)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def verify(self, items):
+        """
+        The address that signed each (offer, signature), or None where the
+        signature is missing or invalid
+        """
+        items = list(items)
+        signers = [None] * len(items)
+        offer_hashes = hash_offers([offer for offer, _ in items])
+        # Indexes of each (offer_hash, signature) still to recover
+        misses = {}
+
+        for i, ((_, signature), offer_hash) in enumerate(
+            zip(items, offer_hashes)
+        ):
+            if not signature:
+                continue
+            signature = _bytes(signature)
+            # Calldata can carry any bytes, none of them a valid signature
+            if len(signature) != SIGNATURE_LENGTH:
+                continue
+            found, signer = self._cached(offer_hash, signature)
+            if found:
+                signers[i] = signer
+            else:
+                misses.setdefault((offer_hash, signature), []).append(i)
+
+        if misses:
+            # Small batches are cheaper to recover than to ship to the pool
+            pooled = len(misses) > self.chunk_size
+            started = time.monotonic()
+            recovered = recover_signers(
+                personal_hashes([offer_hash for offer_hash, _ in misses]),
+                [signature for _, signature in misses],
+                workers=self.workers if pooled else 1,
+                chunk_size=self.chunk_size,
+                executor=self._pool() if pooled else None,
+            )
+            elapsed = time.monotonic() - started
+
+            for (offer_hash, signature), signer in zip(misses, recovered):
+                for i in misses[offer_hash, signature]:
+                    signers[i] = signer
+                self._remember(offer_hash, signature, signer)
+            with self._lock:
+                self.recovered += len(misses)
+                self.seconds += elapsed
+
+        return signers
+
+    def throughput(self):
+        """ Signatures recovered per second of recovery so far """
+        return self.recovered / self.seconds if self.seconds else 0.0
+
+    def report(self):
+        return "{} signatures recovered at {:.0f}/s, {} cached".format(
+            self.recovered, self.throughput(), self.cache_hits
+        )
@@ -1,10 +1,22 @@
 import os
-import json
-import shutil
 from pathlib import Path
-from brownie import ApesMock, RatsMock, LetMeGet_v1, LetMeGet_v2, accounts, web3
+from brownie import (
+    ApesMock,
+    RatsMock,
+    Multicall2,
+    LetMeGet_v1,
+    LetMeGet_v2,
+    LetMeGet_v3,
+    accounts,
+    web3,
+)
+
+from letmeget.manifest import manifest_entry, write_manifest
+from letmeget.pipeline import TxPipeline
 
 CHAIN_ID = 1337
+# The frontend's per-chain contract manifests
+ARTIFACTS_DIR = Path(__file__).parent / "../../../frontend/src/artifacts"
 
 
 def deploy_mocks(deployer):
@@ -14,6 +26,10 @@ def deploy_mocks(deployer):
     return (apes, rats)
 
 
+def deploy_multicall(deployer):
+    return Multicall2.deploy({"from": deployer})
+
+
 def deploy_lmgv1(deployer):
     return LetMeGet_v1.deploy({"from": deployer})
 
@@ -22,15 +38,23 @@ def deploy_lmgv2(deployer):
     return LetMeGet_v2.deploy({"from": deployer})
 
 
-def fund_account(addr, value):
-    return web3.eth.send_transaction(
-        {
-            "from": accounts[0].address,
-            "to": addr,
-            "value": value,
-            "gasPrice": int(2e9),
-        }
-    )
+def deploy_lmgv3(deployer):
+    return LetMeGet_v3.deploy({"from": deployer})
+
+
+def fund_account(pipeline, addr, value):
+    return pipeline.send(accounts[0].address, addr, value=value, gas=21000)
+
+
+def transfer_tokens(pipeline, deployer, token, name, owners):
+    """ Queue transfers of token IDs 1.. from deployer to owners, in order """
+    for token_id, owner in enumerate(owners, start=1):
+        print("Transferring {} #{} to {}".format(name, token_id, owner))
+        pipeline.send(
+            deployer,
+            token.address,
+            token.transferFrom.encode_input(deployer, owner, token_id),
+        )
 
 
 def get_account(address):
@@ -41,33 +65,20 @@ def get_account(address):
     return None
 
 
-def copy_artifact(address):
-    fe_dir = (
-        Path(__file__)
-        .parent.joinpath("../../../frontend/src/artifacts/{}".format(CHAIN_ID))
-        .resolve()
-    )
-
-    if not fe_dir.exists():
-        fe_dir.mkdir()
-
-    artifact_dir = (
-        Path(__file__)
-        .parent.joinpath("../../build/deployments/{}".format(CHAIN_ID))
-        .resolve()
-    )
-    artifact_file = artifact_dir.joinpath("{}.json".format(address))
-
-    if not artifact_file.is_file():
-        raise Exception("Artifact not found: {}".format(artifact_file))
-
-    jason = json.loads(artifact_file.read_text())
-    dest = fe_dir.joinpath("{}.json".format(jason.get("contractName")))
-    shutil.copy(
-        artifact_file,
-        dest,
+def export_manifest(contracts):
+    """ Write the frontend's manifest of this chain's contracts """
+    manifest = ARTIFACTS_DIR.joinpath("{}.json".format(CHAIN_ID)).resolve()
+    written = write_manifest(
+        manifest,
+        CHAIN_ID,
+        {
+            contract._name: manifest_entry(
+                contract.address, contract.abi, contract.tx.block_number
+            )
+            for contract in contracts
+        },
     )
-    print("Copied artifact {}".format(dest))
+    print("{} {}".format("Wrote" if written else "Unchanged", manifest))
 
 
 def main():
@@ -75,77 +86,57 @@ def main():
     bob = os.environ.get("BOB")
 
     deployer = accounts[9]
+    pipeline = TxPipeline(web3)
 
-    apes, rats = deploy_mocks(deployer)
-    lmgv1 = deploy_lmgv1(deployer)
-    lmgv2 = deploy_lmgv2(deployer)
+    with pipeline.stage("deploy"):
+        apes, rats = deploy_mocks(deployer)
+        multicall = deploy_multicall(deployer)
+        lmgv1 = deploy_lmgv1(deployer)
+        lmgv2 = deploy_lmgv2(deployer)
+        lmgv3 = deploy_lmgv3(deployer)
 
-    copy_artifact(apes.address)
-    copy_artifact(rats.address)
-    copy_artifact(lmgv1.address)
-    copy_artifact(lmgv2.address)
+    with pipeline.stage("export manifest"):
+        export_manifest([apes, rats, multicall, lmgv1, lmgv2, lmgv3])
 
+    # Each mock should've minted 10 NFTs
+    owners = None
     if os.environ.get("NFT_OWNER"):
-        owner = os.environ.get("NFT_OWNER")
-        # Each mock should've minted 10 NFTs
-        tx_params = {
-            "required_confs": 0,
-            "gas_limit": 75000,
-            "gas_price": int(1e9),
-        }
-
-        for i in range(1, 11):
-            print("Transferring Ape #{} to {}".format(i, owner))
-            apes.transferFrom(deployer, owner, i, tx_params)
-            print("Transferring Rat #{} to {}".format(i, owner))
-            rats.transferFrom(deployer, owner, i, tx_params)
+        owners = [os.environ.get("NFT_OWNER")] * 10
 
     elif alice and bob:
-        alice_balance = web3.eth.get_balance(alice)
-        bob_balance = web3.eth.get_balance(bob)
-
         amount = int(5e17)
-        if alice_balance < amount:
-            print(
-                "Funding Alice ({}) with {} ETH...".format(
-                    alice, amount / int(1e18)
-                )
-            )
-            fund_account(alice, amount)
-        if bob_balance < amount:
-            print(
-                "Funding Bob ({}) with {} ETH...".format(
-                    bob, amount / int(1e18)
-                )
-            )
-            fund_account(bob, amount)
-
-        # Each mock should've minted 10 NFTs
-        tx_params = {
-            "required_confs": 0,
-            "gas_limit": 75000,
-            "gas_price": int(1e9),
-            "from": deployer,
-        }
-
-        for i in range(1, 11):
-            if i % 2 == 0:
-                owner = alice
-            else:
-                owner = bob
-
-            print("Transferring Ape #{} to {}".format(i, owner))
-            apes.transferFrom(deployer, owner, i, tx_params)
-            print("Transferring Rat #{} to {}".format(i, owner))
-            rats.transferFrom(deployer, owner, i, tx_params)
+        with pipeline.stage("fund"):
+            for name, addr in (("Alice", alice), ("Bob", bob)):
+                if web3.eth.get_balance(addr) < amount:
+                    print(
+                        "Funding {} ({}) with {} ETH...".format(
+                            name, addr, amount / int(1e18)
+                        )
+                    )
+                    fund_account(pipeline, addr, amount)
+
+        owners = [alice if i % 2 == 0 else bob for i in range(1, 11)]
+
+    if owners:
+        with pipeline.stage("send transfers"):
+            transfer_tokens(pipeline, deployer, apes, "Ape", owners)
+            transfer_tokens(pipeline, deployer, rats, "Rat", owners)
+
+    with pipeline.stage("wait for receipts"):
+        receipts = pipeline.wait()
 
     print("\n\nDeployed Contracts")
     print("------------------")
     print("Apes Mock: {}".format(apes.address))
     print("Rats Mock: {}".format(rats.address))
+    print("Multicall2: {}".format(multicall.address))
     print("LetMeGet_v1: {}".format(lmgv1.address))
     print("LetMeGet_v2: {}".format(lmgv2.address))
+    print("LetMeGet_v3: {}".format(lmgv3.address))
     if alice and bob:
         print("Alice: {}".format(alice))
         print("Bob: {}".format(bob))
+    print("------------------")
+    print("{} transactions pipelined".format(len(receipts)))
+    print(pipeline.report())
     print("------------------\n\n")
@@ -0,0 +1,68 @@
+"""
+Seed a dev chain with N collections x M tokens x K accounts and K x M
+random LetMeGet_v2 offers, e.g.
+
+    FIXTURE_COLLECTIONS=5 FIXTURE_TOKENS=1000 FIXTURE_ACCOUNTS=20 \
+        brownie run --network ganache scripts/deploy/seed_fixtures.py
+"""
+import os
+from brownie import CollectionMock, LetMeGet_v2, accounts, web3
+
+from letmeget.fixtures import Fixture, fixture_accounts
+from letmeget.pipeline import TxPipeline
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def main():
+    collections = env_int("FIXTURE_COLLECTIONS", 3)
+    tokens = env_int("FIXTURE_TOKENS", 100)
+    account_count = env_int("FIXTURE_ACCOUNTS", 10)
+    seed = env_int("FIXTURE_SEED", 0)
+    offer_count = env_int("FIXTURE_OFFERS", account_count * tokens)
+
+    deployer = accounts[9]
+    pipeline = TxPipeline(web3)
+
+    with pipeline.stage("deploy"):
+        mocks = [
+            CollectionMock.deploy(
+                "Fixture {}".format(i), "FX{}".format(i), {"from": deployer}
+            )
+            for i in range(collections)
+        ]
+        if os.environ.get("LMG_V2"):
+            lmgv2 = LetMeGet_v2.at(os.environ["LMG_V2"])
+        else:
+            lmgv2 = LetMeGet_v2.deploy({"from": deployer})
+
+    fixture = Fixture(
+        [mock.address for mock in mocks],
+        fixture_accounts(account_count, seed),
+        tokens,
+        seed,
+    )
+
+    with pipeline.stage("fund"):
+        fixture.fund(pipeline, deployer)
+    with pipeline.stage("mint"):
+        fixture.mint(pipeline, deployer)
+    with pipeline.stage("offer"):
+        expires = web3.eth.block_number + int(1e6)
+        offers = fixture.random_offers(offer_count, expires)
+        fixture.make_offers(pipeline, lmgv2.address, offers)
+
+    print("\n\nSeeded Fixtures")
+    print("------------------")
+    for mock in mocks:
+        print("{}: {}".format(mock.name(), mock.address))
+    print("LetMeGet_v2: {}".format(lmgv2.address))
+    print(
+        "{} accounts x {} tokens, {} offers (seed {})".format(
+            account_count, tokens, len(offers), seed
+        )
+    )
+    print(pipeline.report())
+    print("------------------\n\n")
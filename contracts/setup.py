@@ -1,14 +1,107 @@
 """ Setup Portle Singularity """
 import sys
+import json
+import hashlib
 import os.path
 import shutil
-from time import sleep
+from time import monotonic, sleep
+from urllib.error import URLError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
 from subprocess import Popen, check_call, CalledProcessError
 from setuptools import Command, setup, find_packages
 from setuptools.command.develop import develop
 
 __DIR__ = os.path.abspath(os.path.dirname(__file__))
 
+GANACHE_CMD = "ganache-cli -d -a10 -i 1337 --chainId 1337"
+DEPLOY_CMD = "brownie run --network ganache scripts/deploy/dev_deploy.py"
+# Chain DBs of finished deployments, one per cache key
+CACHE_DIR = os.path.join(__DIR__, ".ganache")
+# What the deployed chain state depends on, besides the commands and env
+DEPLOY_INPUTS = (
+    "contracts",
+    "scripts/deploy",
+    "letmeget",
+    "brownie-config.yaml",
+)
+DEPLOY_ENV = ("ALICE", "BOB", "NFT_OWNER")
+
+
+def rpc_call(url, method, params=None, timeout=10):
+    """ One JSON-RPC request, returning its result """
+    request = Request(
+        url,
+        data=json.dumps(
+            {
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": method,
+                "params": params or [],
+            }
+        ).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urlopen(request, timeout=timeout) as response:
+        body = json.load(response)
+    if "error" in body:
+        raise ValueError(body["error"])
+    return body["result"]
+
+
+def wait_for_rpc(url, deadline=60.0, process=None):
+    """
+    Poll a JSON-RPC endpoint with exponential backoff until eth_chainId
+    answers, returning the chain ID and seconds waited
+    """
+    started = monotonic()
+    delay = 0.05
+
+    while True:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(
+                "Node exited with {} before it was ready".format(
+                    process.returncode
+                )
+            )
+        try:
+            chain_id = rpc_call(url, "eth_chainId", timeout=max(delay, 1))
+            return int(chain_id, 16), monotonic() - started
+        except (URLError, OSError, ValueError, KeyError):
+            pass
+
+        elapsed = monotonic() - started
+        if elapsed >= deadline:
+            raise TimeoutError(
+                "{} not ready after {:.1f}s".format(url, elapsed)
+            )
+        sleep(min(delay, deadline - elapsed))
+        delay = min(delay * 2, 1.0)
+
+
+def deploy_cache_key(env):
+    """ Hash of every input of a dev deployment's end state """
+    digest = hashlib.sha256()
+    digest.update("{}\n{}\n".format(GANACHE_CMD, DEPLOY_CMD).encode("utf-8"))
+    for name in DEPLOY_ENV:
+        digest.update("{}={}\n".format(name, env.get(name) or "").encode())
+
+    paths = []
+    for name in DEPLOY_INPUTS:
+        path = os.path.join(__DIR__, name)
+        if os.path.isfile(path):
+            paths.append(path)
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            paths.extend(os.path.join(root, f) for f in sorted(files))
+
+    for path in paths:
+        digest.update(os.path.relpath(path, __DIR__).encode("utf-8"))
+        with open(path, "rb") as f:
+            digest.update(f.read())
+
+    return digest.hexdigest()[:16]
+
 
 class NodeCommand(Command):
     """ Start local chain and deploy contracts """
@@ -17,38 +110,95 @@ class NodeCommand(Command):
     user_options = [
         ("alice=", "a", "Address for Alice account"),
         ("bob=", "b", "Address for Bob account"),
+        ("rpc=", "r", "JSON-RPC URL for ganache to listen on"),
+        ("timeout=", "t", "Seconds to wait for ganache to be ready"),
+        ("no-cache", None, "Always deploy from scratch"),
     ]
+    boolean_options = ["no-cache"]
 
     def initialize_options(self):
         self.alice = None
         self.bob = None
+        self.rpc = "http://127.0.0.1:8545"
+        self.timeout = 60
+        self.no_cache = False
 
     def finalize_options(self):
-        pass
+        self.timeout = float(self.timeout)
+        rpc = urlsplit(self.rpc)
+        self.host = rpc.hostname or "127.0.0.1"
+        self.port = rpc.port or 8545
 
-    def run(self):
+    def start_ganache(self, db):
         self.ganache = Popen(
-            "ganache-cli -d -a10 -i 1337 --chainId 1337".split()
+            GANACHE_CMD.split()
+            + ["-h", self.host, "-p", str(self.port), "--db", db]
         )
 
-        # Let ganache settle
-        sleep(3)
+        try:
+            chain_id, waited = wait_for_rpc(
+                self.rpc, self.timeout, self.ganache
+            )
+        except (RuntimeError, TimeoutError) as err:
+            print(err, file=sys.stderr)
+            self.ganache.terminate()
+            sys.exit(1)
+        print("Ganache (chain {}) ready in {:.2f}s".format(chain_id, waited))
 
-        env = os.environ
-        env["ALICE"] = self.alice
-        env["BOB"] = self.bob
+    def stop_ganache(self):
+        self.ganache.terminate()
+        self.ganache.wait()
 
-        # Deploy
+    def deploy(self, env):
         try:
-            check_call(
-                "brownie run --network ganache scripts/deploy/dev_deploy.py".split(),
-                env=env,
-            )
+            check_call(DEPLOY_CMD.split(), env=env)
         except Exception as err:
             print(err)
             self.ganache.terminate()
             sys.exit(1)
 
+    def save_cache(self, db, cached):
+        """ Keep a copy of the freshly deployed chain, replacing old ones """
+        # Stopped so ganache has flushed its DB to disk
+        self.stop_ganache()
+        for name in os.listdir(CACHE_DIR):
+            if name != os.path.basename(db):
+                shutil.rmtree(os.path.join(CACHE_DIR, name))
+        shutil.copytree(db, cached + ".tmp")
+        os.rename(cached + ".tmp", cached)
+
+    def run(self):
+        env = os.environ
+        env["ALICE"] = self.alice
+        env["BOB"] = self.bob
+
+        started = monotonic()
+        key = deploy_cache_key(env)
+        cached = os.path.join(CACHE_DIR, key)
+        # Always run on a copy, so every start begins from a clean deploy
+        db = os.path.join(CACHE_DIR, "db")
+        shutil.rmtree(db, ignore_errors=True)
+        os.makedirs(db)
+
+        if not self.no_cache and os.path.isdir(cached):
+            shutil.rmtree(db)
+            shutil.copytree(cached, db)
+            self.start_ganache(db)
+            print(
+                "Restored deployment {} in {:.2f}s".format(
+                    key, monotonic() - started
+                )
+            )
+        else:
+            self.start_ganache(db)
+            self.deploy(env)
+            if not self.no_cache:
+                self.save_cache(db, cached)
+                self.start_ganache(db)
+
+        snapshot = rpc_call(self.rpc, "evm_snapshot")
+        print("Took snapshot {}, evm_revert to it to reset".format(snapshot))
+
         # Stay running
         self.ganache.wait()
 
@@ -82,12 +232,13 @@ class GanacheInstallCommand(Command):
 setup(
     name="letmeget_contracts",
     version="0.1.0",
+    packages=find_packages(include=["letmeget", "letmeget.*"]),
     install_requires=[
         # "eth-ape>=0.1.0a13",
         # "ape-vyper>=0.1.0a5",
-        "eth-brownie @ git+https://github.com/eth-brownie/brownie.git@4a399b1#egg=eth-brownie"
+        "eth-brownie @ git+https://github.com/eth-brownie/brownie.git@4a399b1#egg=eth-brownie",
         # "eth-brownie>=1.14.6",
-        "eip712>=0.1.0",
+        "eip712>=0.3.0",
     ],
     extras_require={
         "dev": [
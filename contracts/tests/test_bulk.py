@@ -0,0 +1,153 @@
+import pytest
+from brownie import (
+    LetMeGet_v2,
+    LetMeGet_v3,
+    ApesMock,
+    RatsMock,
+    accounts,
+    chain,
+)
+
+from letmeget.bulk import (
+    hash_offers,
+    personal_hashes,
+    recover_signers,
+    sign_hashes,
+)
+from letmeget.offers import Offer, hash_params
+from letmeget.typed import TypedOffers
+
+EXPIRES = 999999
+
+
+@pytest.fixture
+def signers():
+    return accounts.from_mnemonic(
+        "buffalo cinnamon glory chalk require inform strike ginger crop sell hidden cart",
+        count=2,
+        offset=0,
+    )
+
+
+@pytest.fixture
+def letmegetv2():
+    return accounts[0].deploy(LetMeGet_v2)
+
+
+@pytest.fixture
+def letmegetv3():
+    return accounts[0].deploy(LetMeGet_v3)
+
+
+@pytest.fixture
+def apes():
+    return accounts[0].deploy(ApesMock)
+
+
+@pytest.fixture
+def rats():
+    return accounts[0].deploy(RatsMock)
+
+
+def test_hash_offers(apes, rats, letmegetv2):
+    """ Test bulk hashes are identical to the contract's """
+    offers = [
+        Offer(apes.address, 1, rats.address, 2, EXPIRES),
+        Offer(rats.address, 2 ** 256 - 1, apes.address, 0, 2 ** 64),
+        Offer(apes.address.lower(), 3, rats.address, 3, 0),
+    ]
+
+    hashes = hash_offers(offers)
+
+    assert hashes == [hash_params(*offer) for offer in offers]
+    for offer, offer_hash in zip(offers, hashes):
+        assert letmegetv2.hash_params(*offer) == offer_hash
+
+
+def test_typed_digests(apes, rats, letmegetv3):
+    """ Test bulk EIP-712 digests are identical to the contract's """
+    typed = TypedOffers(chain.id, letmegetv3.address)
+    offers = [
+        Offer(apes.address, i, rats.address, i, EXPIRES) for i in range(5)
+    ]
+
+    digests = typed.digests(offers)
+
+    assert digests == [typed.digest(offer) for offer in offers]
+    for offer, digest in zip(offers, digests):
+        assert letmegetv3.hash_params(*offer) == digest
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sign_and_recover(signers, apes, rats, letmegetv2, workers):
+    """ Test pooled signatures are accepted by the contract and recovered """
+    bruce = signers[0]
+    offers = [
+        Offer(apes.address, i, rats.address, i, EXPIRES) for i in range(9)
+    ]
+    hashes = personal_hashes(hash_offers(offers))
+
+    signatures = sign_hashes(
+        bruce.private_key, hashes, workers=workers, chunk_size=4
+    )
+
+    assert len(signatures) == len(offers)
+    assert recover_signers(
+        hashes, signatures, workers=workers, chunk_size=4
+    ) == [bruce.address] * len(offers)
+
+    apes.transferFrom(accounts[0], bruce.address, 1, {"from": accounts[0]})
+    apes.approve(letmegetv2.address, 1, {"from": bruce})
+    letmegetv2.offer(*offers[1], signatures[1], {"from": bruce})
+    assert letmegetv2.offer_exists(*offers[1])
+
+
+def test_recover_bad_signature():
+    """ Test an unrecoverable signature gives None, not an exception """
+    offer_hash = personal_hashes([b"\x01" * 32])[0]
+    signed = sign_hashes(accounts[0].private_key, [offer_hash])
+    signature = bytearray(signed[0])
+    signature[64] = 30
+
+    assert recover_signers([offer_hash], [bytes(signature)]) == [None]
+
+    with pytest.raises(ValueError):
+        recover_signers([offer_hash], [])
+
+
+def signed_hashes(count):
+    hashes = personal_hashes([bytes([i + 1]) * 32 for i in range(count)])
+    return hashes, sign_hashes(accounts[0].private_key, hashes)
+
+
+def test_recover_short_signature():
+    """ Test a truncated signature gives None without failing the batch """
+    hashes, signatures = signed_hashes(2)
+
+    assert recover_signers(hashes, [signatures[0][:64], signatures[1]]) == [
+        None,
+        accounts[0].address,
+    ]
+
+
+def test_recover_long_signature():
+    """ Test an over long signature doesn't shift the ones after it """
+    hashes, signatures = signed_hashes(3)
+
+    assert recover_signers(
+        hashes, [signatures[0], signatures[1] + b"\0", signatures[2]]
+    ) == [accounts[0].address, None, accounts[0].address]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_recover_mixed_signatures(workers):
+    """ Test malformed signatures of any length across pooled chunks """
+    hashes, signatures = signed_hashes(10)
+    signatures[1] = signatures[1][:64]
+    signatures[4] = signatures[4] + b"\0"
+    signatures[5] = b""
+    signatures[8] = "0x" + signatures[8].hex() + "00"
+
+    assert recover_signers(
+        hashes, signatures, workers=workers, chunk_size=3
+    ) == [None if i in (1, 4, 5, 8) else accounts[0].address for i in range(10)]
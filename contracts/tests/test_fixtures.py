@@ -0,0 +1,80 @@
+import pytest
+from brownie import CollectionMock, LetMeGet_v2, accounts, reverts
+
+from letmeget.fixtures import Fixture, fixture_accounts
+from letmeget.pipeline import TxPipeline
+
+EXPIRES = 999999
+
+
+@pytest.fixture
+def letmegetv2():
+    return accounts[0].deploy(LetMeGet_v2)
+
+
+@pytest.fixture
+def collections():
+    return [
+        accounts[0].deploy(
+            CollectionMock, "Fixture {}".format(i), "FX{}".format(i)
+        )
+        for i in range(2)
+    ]
+
+
+def test_mint_batch(collections):
+    collections[0].mintBatch(accounts[1], 5, 3, {"from": accounts[0]})
+
+    assert collections[0].balanceOf(accounts[1]) == 3
+    assert [collections[0].ownerOf(i) for i in (5, 6, 7)] == [accounts[1]] * 3
+
+
+def test_mint_batch_fails_if_not_minter(collections):
+    """ Test only the deployer can mint """
+    assert collections[0].minter() == accounts[0]
+
+    with reverts("not-minter"):
+        collections[0].mintBatch(accounts[2], 1, 3, {"from": accounts[2]})
+
+    assert collections[0].balanceOf(accounts[2]) == 0
+
+
+def test_seed_fixture(web3, collections, letmegetv2):
+    """ Test collections x tokens x accounts and random offers get seeded """
+    fixture = Fixture(
+        [c.address for c in collections], fixture_accounts(3, seed=7), 4, seed=7
+    )
+    pipeline = TxPipeline(web3)
+
+    fixture.fund(pipeline, accounts[0])
+    fixture.mint(pipeline, accounts[0], batch_size=3)
+
+    for collection in collections:
+        for token_id in range(1, 13):
+            assert (
+                collection.ownerOf(token_id) == fixture.owner(token_id).address
+            )
+
+    offers = fixture.random_offers(12, EXPIRES)
+    assert len(set(offer for _, offer in offers)) == 12
+    fixture.make_offers(pipeline, letmegetv2.address, offers, workers=1)
+
+    for maker, offer in offers:
+        assert letmegetv2.offer_exists(*offer)
+        assert fixture.owner(offer.offer_token_id) == maker
+        assert fixture.owner(offer.wanted_token_id) != maker
+
+    # Same seed, same accounts
+    assert [a.address for a in fixture_accounts(3, seed=7)] == [
+        a.address for a in fixture.accounts
+    ]
+
+
+def test_random_offers_are_bounded():
+    """ Test asking for more distinct offers than exist fails at once """
+    fixture = Fixture([accounts[1].address], fixture_accounts(2), 1)
+
+    # One token each, so only A's for B's and B's for A's
+    assert len(fixture.random_offers(2, EXPIRES)) == 2
+    with pytest.raises(ValueError):
+        fixture.random_offers(3, EXPIRES)
@@ -0,0 +1,325 @@
+import pytest
+from eth_account.account import Account
+from eth_account.messages import defunct_hash_message
+from brownie import (
+    LetMeGet_v2,
+    ApesMock,
+    RatsMock,
+    accounts,
+    chain,
+)
+
+from letmeget.indexer import OfferIndexer
+from letmeget.offers import Offer, hash_params
+from letmeget.store import OfferStore
+from letmeget.verify import SignatureVerifier
+
+EXPIRES = 999999
+
+
+def sign_offer(
+    account,
+    offer_contract,
+    offer_token_id,
+    wanted_contract,
+    wanted_token_id,
+    expires,
+):
+    """ Sign offer data with given account """
+    acc = Account.from_key(account.private_key)
+    offer_hash = hash_params(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires,
+    )
+    return acc.signHash(defunct_hash_message(offer_hash)).signature.hex()
+
+
+@pytest.fixture
+def signers():
+    return accounts.from_mnemonic(
+        "buffalo cinnamon glory chalk require inform strike ginger crop sell hidden cart",
+        count=2,
+        offset=0,
+    )
+
+
+@pytest.fixture
+def letmegetv2():
+    return accounts[0].deploy(LetMeGet_v2)
+
+
+@pytest.fixture
+def apes():
+    return accounts[0].deploy(ApesMock)
+
+
+@pytest.fixture
+def rats():
+    return accounts[0].deploy(RatsMock)
+
+
+@pytest.fixture
+def indexer(web3, letmegetv2, tmp_path):
+    return OfferIndexer(
+        web3,
+        letmegetv2.address,
+        OfferStore(str(tmp_path.joinpath("offers.sqlite3"))),
+        start_block=web3.eth.block_number,
+        confirmations=0,
+        chunk_size=5,
+    )
+
+
+def make_offer(
+    letmegetv2,
+    apes,
+    rats,
+    signer,
+    offer_token_id,
+    wanted_token_id,
+    expires=EXPIRES,
+):
+    """ Give signer an Ape and offer it for a Rat owned by accounts[0] """
+    apes.transferFrom(
+        accounts[0], signer.address, offer_token_id, {"from": accounts[0]}
+    )
+    apes.approve(letmegetv2.address, offer_token_id, {"from": signer})
+    signature = sign_offer(
+        signer,
+        apes.address,
+        offer_token_id,
+        rats.address,
+        wanted_token_id,
+        expires,
+    )
+    letmegetv2.offer(
+        apes.address,
+        offer_token_id,
+        rats.address,
+        wanted_token_id,
+        expires,
+        signature,
+        {"from": signer},
+    )
+    return signature
+
+
+def test_indexes_open_offers(signers, apes, rats, letmegetv2, indexer):
+    make_offer(letmegetv2, apes, rats, signers[0], 1, 1)
+    make_offer(letmegetv2, apes, rats, signers[0], 2, 2)
+
+    assert indexer.sync() == 2
+
+    offers = indexer.store.open_offers(accounts[0].address)
+    assert len(offers) == 2
+    assert offers[0]["offer_contract"] == apes.address
+    assert offers[0]["wanted_contract"] == rats.address
+    assert {o["offer_token_id"] for o in offers} == {1, 2}
+    assert offers[0]["offer_hash"] == letmegetv2.hash_params(
+        apes.address, 1, rats.address, 1, EXPIRES
+    )
+
+    # Nothing new to index
+    assert indexer.sync() == 0
+
+
+def test_indexes_revoke(signers, apes, rats, letmegetv2, indexer):
+    signature = make_offer(letmegetv2, apes, rats, signers[0], 3, 3)
+    indexer.sync()
+
+    letmegetv2.revoke(
+        apes.address,
+        3,
+        rats.address,
+        3,
+        EXPIRES,
+        signature,
+        {"from": signers[0]},
+    )
+    assert indexer.sync() == 1
+
+    assert indexer.store.open_offers(accounts[0].address) == []
+    offer = indexer.store.get_offer(
+        hash_params(apes.address, 3, rats.address, 3, EXPIRES)
+    )
+    assert offer["status"] == "revoked"
+
+
+def test_indexes_accept(signers, apes, rats, letmegetv2, indexer):
+    make_offer(letmegetv2, apes, rats, signers[0], 4, 4)
+
+    rats.transferFrom(accounts[0], signers[1].address, 4, {"from": accounts[0]})
+    rats.approve(letmegetv2.address, 4, {"from": signers[1]})
+    letmegetv2.accept(
+        apes.address,
+        4,
+        rats.address,
+        4,
+        EXPIRES,
+        sign_offer(signers[1], apes.address, 4, rats.address, 4, EXPIRES),
+        {"from": signers[1]},
+    )
+
+    assert indexer.sync() == 2
+
+    offer = indexer.store.get_offer(
+        hash_params(apes.address, 4, rats.address, 4, EXPIRES)
+    )
+    assert offer["status"] == "accepted"
+    assert offer["offer_owner"] == signers[0].address
+
+
+def test_rolls_back_reorg(signers, apes, rats, letmegetv2, indexer):
+    make_offer(letmegetv2, apes, rats, signers[0], 5, 5)
+    indexer.sync()
+
+    chain.snapshot()
+    make_offer(letmegetv2, apes, rats, signers[0], 6, 6)
+    indexer.sync()
+    assert len(indexer.store.open_offers(accounts[0].address)) == 2
+
+    # Replace the blocks holding the second offer
+    chain.revert()
+    chain.mine(3)
+
+    assert indexer.check_reorg() is not None
+    indexer.sync()
+
+    offers = indexer.store.open_offers(accounts[0].address)
+    assert [o["offer_token_id"] for o in offers] == [5]
+
+
+def test_live_offers(web3, signers, apes, rats, letmegetv2, indexer):
+    expires = web3.eth.block_number + 20
+    signature = make_offer(letmegetv2, apes, rats, signers[0], 7, 7)
+    make_offer(letmegetv2, apes, rats, signers[0], 8, 8, expires)
+    indexer.sync()
+
+    live = indexer.live
+    assert len(live) == 2
+    assert live.is_live(hash_params(apes.address, 7, rats.address, 7, EXPIRES))
+    assert [o["offer_token_id"] for o in live.for_owner(accounts[0])] == [8, 7]
+
+    letmegetv2.revoke(
+        apes.address,
+        7,
+        rats.address,
+        7,
+        EXPIRES,
+        signature,
+        {"from": signers[0]},
+    )
+    indexer.sync()
+    assert not live.is_live(
+        hash_params(apes.address, 7, rats.address, 7, EXPIRES)
+    )
+    assert live.is_live(hash_params(apes.address, 8, rats.address, 8, expires))
+
+    chain.mine(20)
+    indexer.sync()
+    assert len(live) == 0
+    head = web3.eth.block_number
+    assert indexer.store.open_offers(accounts[0].address, head) == []
+
+
+class CappedIndexer(OfferIndexer):
+    """ Rejects getLogs ranges matching more than two logs, like Infura """
+
+    def get_logs(self, from_block, to_block):
+        logs = super().get_logs(from_block, to_block)
+        if len(logs) > 2:
+            raise ValueError(
+                {
+                    "code": -32005,
+                    "message": "query returned more than 2 results",
+                }
+            )
+        return logs
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_backfill_splits_ranges(
+    web3, signers, apes, rats, letmegetv2, tmp_path, workers
+):
+    start_block = web3.eth.block_number
+    for token_id in range(1, 7):
+        make_offer(letmegetv2, apes, rats, signers[0], token_id, token_id)
+        chain.mine(token_id)
+
+    indexer = CappedIndexer(
+        web3,
+        letmegetv2.address,
+        OfferStore(str(tmp_path.joinpath("offers.sqlite3"))),
+        start_block=start_block,
+        confirmations=0,
+        chunk_size=64,
+        workers=workers,
+    )
+
+    assert indexer.sync() == 6
+    assert len(indexer.store.open_offers(accounts[0].address)) == 6
+    assert indexer.store.checkpoint()[0] == web3.eth.block_number
+    assert indexer.backfill.sizer.size < 64
+
+
+def test_verifies_offer_signers(signers, apes, rats, letmegetv2, indexer):
+    """ Test offer makers are recovered from their offer() signatures """
+    make_offer(letmegetv2, apes, rats, signers[0], 9, 9)
+    make_offer(letmegetv2, apes, rats, signers[1], 10, 10)
+    indexer.sync()
+
+    makers = {9: signers[0].address, 10: signers[1].address}
+    for offer in indexer.store.open_offers(accounts[0].address):
+        assert offer["offer_owner"] == makers[offer["offer_token_id"]]
+    for offer in indexer.live.for_owner(accounts[0]):
+        assert offer["offer_owner"] == makers[offer["offer_token_id"]]
+    assert indexer.verifier.recovered == 2
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_signature_verifier(signers, apes, rats, workers):
+    offers = [
+        Offer(apes.address, i, rats.address, i, EXPIRES) for i in range(5)
+    ]
+    signatures = [
+        sign_offer(signers[i % 2], *offer) for i, offer in enumerate(offers)
+    ]
+    verifier = SignatureVerifier(workers=workers, chunk_size=2)
+
+    recovered = verifier.verify(zip(offers, signatures))
+    assert recovered == [signers[i % 2].address for i in range(5)]
+    assert verifier.recovered == 5
+
+    # Memoized by offer hash, missing and bad signatures give None
+    items = [
+        (offers[0], signatures[0]),
+        (offers[1], None),
+        (offers[2], "0x" + "00" * 65),
+    ]
+    assert verifier.verify(items) == [signers[0].address, None, None]
+    assert verifier.cache_hits == 1
+    assert verifier.recovered == 6
+    assert verifier.throughput() > 0
+
+    verifier.close()
+
+
+def test_signature_verifier_malformed(signers, apes, rats):
+    """ Test signatures that aren't 65 bytes give None for just themselves """
+    offers = [
+        Offer(apes.address, i, rats.address, i, EXPIRES) for i in range(4)
+    ]
+    signatures = [sign_offer(signers[0], *offer) for offer in offers]
+    items = [
+        (offers[0], signatures[0][:-2]),
+        (offers[1], signatures[1]),
+        (offers[2], signatures[2] + "00"),
+        (offers[3], signatures[3]),
+    ]
+    verifier = SignatureVerifier(workers=1)
+
+    assert verifier.verify(items) == [None, signers[0].address] * 2
+    assert verifier.recovered == 2
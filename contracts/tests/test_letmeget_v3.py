@@ -0,0 +1,541 @@
+import pytest
+from eth_account.account import Account
+from eth_account.messages import defunct_hash_message
+from web3 import Web3
+from brownie import (
+    LetMeGet_v2,
+    LetMeGet_v3,
+    ApesMock,
+    RatsMock,
+    accounts,
+    chain,
+    reverts,
+)
+
+from letmeget.typed import TypedOffers
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def typed_offers(letmegetv3):
+    return TypedOffers(chain.id, letmegetv3.address)
+
+
+def sign_offer(
+    account,
+    letmegetv3,
+    offer_contract,
+    offer_token_id,
+    wanted_contract,
+    wanted_token_id,
+    expires,
+    epoch=0,
+) -> (str, bytes):
+    """ Sign offer data as EIP-712 typed data with given account """
+    offer = (
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires,
+    )
+    offer_hash = typed_offers(letmegetv3).digest(offer, epoch)
+
+    signed = Account.from_key(account.private_key).signHash(offer_hash)
+    return signed.signature.hex(), offer_hash
+
+
+def sign_revoke(account, signature) -> str:
+    """ Sign the hash of an offer's signature to revoke it """
+    revoke_hash = defunct_hash_message(Web3.keccak(hexstr=signature))
+    signed = Account.from_key(account.private_key).signHash(revoke_hash)
+    return signed.signature.hex()
+
+
+@pytest.fixture
+def signers():
+    return accounts.from_mnemonic(
+        "buffalo cinnamon glory chalk require inform strike ginger crop sell hidden cart",
+        count=2,
+        offset=0,
+    )
+
+
+@pytest.fixture
+def letmegetv3():
+    return accounts[0].deploy(LetMeGet_v3)
+
+
+@pytest.fixture
+def apes():
+    return accounts[0].deploy(ApesMock)
+
+
+@pytest.fixture
+def rats():
+    return accounts[0].deploy(RatsMock)
+
+
+def approve(token, from_address, approved_address, token_id):
+    tx = token.approve(approved_address, token_id, {"from": from_address})
+    tx.wait(1)
+    assert tx.status == 1
+    return tx
+
+
+def transfer_token(token, from_address, to_address, token_id):
+    tx = token.transferFrom(
+        from_address, to_address, token_id, {"from": from_address}
+    )
+    tx.wait(1)
+    assert tx.status == 1
+    return tx
+
+
+MAX_BATCH = 20
+
+
+def pad(values, value, length=MAX_BATCH):
+    """ Pad a list out to a fixed size array argument """
+    return list(values) + [value] * (length - len(values))
+
+
+def offer_batch(letmegetv3, signer, offers):
+    """ Sign and make a list of offer param tuples in one transaction """
+    signatures = [sign_offer(signer, letmegetv3, *offer)[0] for offer in offers]
+    columns = list(zip(*offers))
+    return letmegetv3.offer_batch(
+        pad(columns[0], ZERO_ADDRESS),
+        pad(columns[1], 0),
+        pad(columns[2], ZERO_ADDRESS),
+        pad(columns[3], 0),
+        pad(columns[4], 0),
+        "0x" + "".join(sig[2:] for sig in signatures),
+        {"from": signer},
+    )
+
+
+def test_version(letmegetv3):
+    assert letmegetv3.version() == 3
+
+
+def test_offer_batch_succeeds(signers, apes, rats, letmegetv3):
+    """ Test that one token can be offered for several at once """
+    bruce = signers[0]
+    offer_token_id = 1
+    expires = 999999
+
+    transfer_token(apes, accounts[0], bruce.address, offer_token_id)
+    approve(apes, bruce.address, letmegetv3.address, offer_token_id)
+
+    offers = [
+        (apes.address, offer_token_id, rats.address, wanted_token_id, expires)
+        for wanted_token_id in range(1, 6)
+    ]
+    offer_tx = offer_batch(letmegetv3, bruce, offers)
+    offer_tx.wait(1)
+
+    assert offer_tx.status == 1, "Offer tx failed"
+    assert len(offer_tx.events["Offer"]) == len(offers)
+
+    for event, offer in zip(offer_tx.events["Offer"], offers):
+        assert event["wanted_owner"] == accounts[0].address
+        assert event["offer_contract"] == offer[0]
+        assert event["offer_token_id"] == offer[1]
+        assert event["wanted_contract"] == offer[2]
+        assert event["wanted_token_id"] == offer[3]
+        assert event["expires"] == offer[4]
+        assert letmegetv3.offer_exists(*offer)
+
+
+def test_offer_batch_reverts_as_a_whole(signers, apes, rats, letmegetv3):
+    """ Test that one bad offer reverts the entire batch """
+    bruce = signers[0]
+    expires = 999999
+
+    transfer_token(apes, accounts[0], bruce.address, 2)
+    approve(apes, bruce.address, letmegetv3.address, 2)
+
+    offers = [
+        (apes.address, 2, rats.address, 1, expires),
+        # Bruce does not own Ape #3
+        (apes.address, 3, rats.address, 1, expires),
+    ]
+
+    with reverts("signer-not-owner"):
+        offer_batch(letmegetv3, bruce, offers)
+
+    assert not letmegetv3.offer_exists(*offers[0])
+
+
+def test_offer_batch_fails_on_bad_signatures(signers, apes, rats, letmegetv3):
+    """ Test that signatures must be a whole number of 65 byte signatures """
+    bruce = signers[0]
+
+    with reverts("no-offers"):
+        letmegetv3.offer_batch(
+            pad([], ZERO_ADDRESS),
+            pad([], 0),
+            pad([], ZERO_ADDRESS),
+            pad([], 0),
+            pad([], 0),
+            "0x",
+            {"from": bruce},
+        )
+
+    with reverts("bad-signatures"):
+        letmegetv3.offer_batch(
+            pad([apes.address], ZERO_ADDRESS),
+            pad([4], 0),
+            pad([rats.address], ZERO_ADDRESS),
+            pad([1], 0),
+            pad([999999], 0),
+            # One and a bit signatures
+            "0x" + "00" * 100,
+            {"from": bruce},
+        )
+
+
+def test_offer_batch_gas(signers, apes, rats, letmegetv3):
+    """ Compare gas per offer for single and batched offers """
+    bruce = signers[0]
+    offer_token_id = 5
+
+    transfer_token(apes, accounts[0], bruce.address, offer_token_id)
+    approve(apes, bruce.address, letmegetv3.address, offer_token_id)
+
+    # Distinct offers of the same tokens, by expiry block
+    single_offer = (apes.address, offer_token_id, rats.address, 1, 100000)
+    single_tx = letmegetv3.offer(
+        *single_offer,
+        sign_offer(bruce, letmegetv3, *single_offer)[0],
+        {"from": bruce},
+    )
+    single_gas = single_tx.gas_used
+
+    expires = 200000
+    for count in (2, 10, MAX_BATCH):
+        offers = [
+            (apes.address, offer_token_id, rats.address, 1, expires + i)
+            for i in range(count)
+        ]
+        expires += count
+
+        batch_gas = offer_batch(letmegetv3, bruce, offers).gas_used
+        per_offer = batch_gas // count
+
+        print(
+            "offer_batch({}): {} gas per offer, {} ({:.1%}) less than offer".format(
+                count,
+                per_offer,
+                single_gas - per_offer,
+                (single_gas - per_offer) / single_gas,
+            )
+        )
+        assert per_offer < single_gas
+
+
+def revoke_batch(letmegetv3, signer, offers):
+    """ Revoke a list of offer param tuples in one transaction """
+    columns = list(zip(*offers))
+    return letmegetv3.revoke_batch(
+        pad(columns[0], ZERO_ADDRESS),
+        pad(columns[1], 0),
+        pad(columns[2], ZERO_ADDRESS),
+        pad(columns[3], 0),
+        pad(columns[4], 0),
+        len(offers),
+        {"from": signer},
+    )
+
+
+def test_hash_params_includes_epoch(signers, apes, rats, letmegetv3):
+    """ Test that offer hashes include the offered token owner's epoch """
+    bruce = signers[0]
+    offer = (apes.address, 6, rats.address, 1, 999999)
+
+    transfer_token(apes, accounts[0], bruce.address, 6)
+
+    assert letmegetv3.epochs(bruce.address) == 0
+    assert letmegetv3.hash_params(*offer) == typed_offers(letmegetv3).digest(
+        offer, 0
+    )
+
+    letmegetv3.bump_epoch({"from": bruce})
+
+    assert letmegetv3.epochs(bruce.address) == 1
+    assert letmegetv3.hash_params(*offer) == typed_offers(letmegetv3).digest(
+        offer, 1
+    )
+
+
+def test_revoke_batch_succeeds(signers, apes, rats, letmegetv3):
+    """ Test that a maker can revoke a selection of their offers """
+    bruce = signers[0]
+    offer_token_id = 7
+
+    transfer_token(apes, accounts[0], bruce.address, offer_token_id)
+    approve(apes, bruce.address, letmegetv3.address, offer_token_id)
+
+    offers = [
+        (apes.address, offer_token_id, rats.address, wanted_token_id, 999999)
+        for wanted_token_id in range(1, 5)
+    ]
+    offer_batch(letmegetv3, bruce, offers)
+
+    revoke_tx = revoke_batch(letmegetv3, bruce, offers[:3])
+    revoke_tx.wait(1)
+
+    assert revoke_tx.status == 1, "Revoke tx failed"
+    assert len(revoke_tx.events["OfferRevoked"]) == 3
+    assert [letmegetv3.offer_revoked(*offer) for offer in offers] == [
+        True,
+        True,
+        True,
+        False,
+    ]
+
+
+def test_revoke_batch_fails_if_not_maker(signers, apes, rats, letmegetv3):
+    """ Test that only the maker can batch revoke their offers """
+    bruce = signers[0]
+    dandi = signers[1]
+    offer = (apes.address, 8, rats.address, 1, 999999)
+
+    transfer_token(apes, accounts[0], bruce.address, 8)
+    approve(apes, bruce.address, letmegetv3.address, 8)
+    offer_batch(letmegetv3, bruce, [offer])
+
+    with reverts("not-maker"):
+        revoke_batch(letmegetv3, dandi, [offer])
+
+    with reverts("bad-count"):
+        revoke_batch(letmegetv3, bruce, [])
+
+    assert not letmegetv3.offer_revoked(*offer)
+
+
+def test_revoke_fails_if_not_maker(signers, apes, rats, letmegetv3):
+    """ Test that only the maker's signature can revoke an offer """
+    bruce = signers[0]
+    dandi = signers[1]
+    offer = (apes.address, 7, rats.address, 1, 999999)
+
+    transfer_token(apes, accounts[0], bruce.address, 7)
+    approve(apes, bruce.address, letmegetv3.address, 7)
+
+    signature = sign_offer(bruce, letmegetv3, *offer)[0]
+    letmegetv3.offer(*offer, signature, {"from": bruce})
+
+    with reverts("not-maker"):
+        letmegetv3.revoke(
+            *offer, sign_revoke(dandi, signature), {"from": dandi}
+        )
+
+    with reverts("not-maker"):
+        letmegetv3.revoke(*offer, signature, {"from": bruce})
+
+    assert not letmegetv3.offer_revoked(*offer)
+
+    letmegetv3.revoke(*offer, sign_revoke(bruce, signature), {"from": dandi})
+    assert letmegetv3.offer_revoked(*offer)
+
+
+def test_bump_epoch_invalidates_offers(signers, apes, rats, letmegetv3):
+    """ Test that bumping the epoch orphans all offers and their signatures """
+    bruce = signers[0]
+    offer_token_id = 9
+    offers = [
+        (apes.address, offer_token_id, rats.address, wanted_token_id, 999999)
+        for wanted_token_id in range(1, 4)
+    ]
+
+    transfer_token(apes, accounts[0], bruce.address, offer_token_id)
+    approve(apes, bruce.address, letmegetv3.address, offer_token_id)
+    offer_batch(letmegetv3, bruce, offers)
+
+    bump_tx = letmegetv3.bump_epoch({"from": bruce})
+    bump_tx.wait(1)
+
+    assert bump_tx.events["EpochBumped"]["owner"] == bruce.address
+    assert bump_tx.events["EpochBumped"]["epoch"] == 1
+    assert not any(letmegetv3.offer_exists(*offer) for offer in offers)
+
+    # Old signatures can not be replayed
+    with reverts("signer-not-owner"):
+        letmegetv3.offer(
+            *offers[0],
+            sign_offer(bruce, letmegetv3, *offers[0])[0],
+            {"from": bruce},
+        )
+
+    # But the same offer can be made again for the new epoch
+    letmegetv3.offer(
+        *offers[0],
+        sign_offer(bruce, letmegetv3, *offers[0], 1)[0],
+        {"from": bruce},
+    )
+    assert letmegetv3.offer_exists(*offers[0])
+
+
+def test_revoke_gas(signers, apes, rats, letmegetv3):
+    """ Compare gas for revoking offers one by one, in a batch and by epoch """
+    bruce = signers[0]
+    offer_token_id = 10
+    count = 10
+
+    transfer_token(apes, accounts[0], bruce.address, offer_token_id)
+    approve(apes, bruce.address, letmegetv3.address, offer_token_id)
+
+    def make_offers(first_expires):
+        offers = [
+            (apes.address, offer_token_id, rats.address, 1, first_expires + i)
+            for i in range(count)
+        ]
+        offer_batch(letmegetv3, bruce, offers)
+        return offers
+
+    single_gas = 0
+    for offer in make_offers(100000):
+        signature = sign_offer(bruce, letmegetv3, *offer)[0]
+        single_gas += letmegetv3.revoke(
+            *offer, sign_revoke(bruce, signature), {"from": bruce}
+        ).gas_used
+
+    batch_gas = revoke_batch(letmegetv3, bruce, make_offers(200000)).gas_used
+
+    make_offers(300000)
+    epoch_gas = letmegetv3.bump_epoch({"from": bruce}).gas_used
+
+    print(
+        "revoking {} offers: revoke {} gas, revoke_batch {} gas, "
+        "bump_epoch {} gas".format(count, single_gas, batch_gas, epoch_gas)
+    )
+    assert batch_gas < single_gas
+    assert epoch_gas < batch_gas
+
+
+def test_typed_offers(signers, apes, rats, letmegetv3):
+    """ Test that offers are signed as EIP-712 typed data """
+    bruce = signers[0]
+    offer = (apes.address, 2, rats.address, 2, 999999)
+    typed = typed_offers(letmegetv3)
+
+    transfer_token(apes, accounts[0], bruce.address, 2)
+
+    assert letmegetv3.DOMAIN_SEPARATOR() == typed.separator
+
+    assert letmegetv3.hash_params(*offer) == typed.digest(offer)
+
+    signature = typed.sign(bruce.private_key, offer)
+    assert letmegetv3.offer_signer(*offer, signature)[0] == bruce.address
+
+    # Prefixed personal_sign signatures are no longer accepted
+    personal = Account.from_key(bruce.private_key).signHash(
+        defunct_hash_message(typed.digest(offer))
+    )
+    assert (
+        letmegetv3.offer_signer(*offer, personal.signature)[0] != bruce.address
+    )
+
+
+def test_offer_details_packed(signers, apes, rats, letmegetv3):
+    """ Test that the offers getter unpacks what offer stored """
+    bruce = signers[0]
+    offer = (apes.address, 3, rats.address, 2, 999999)
+
+    transfer_token(apes, accounts[0], bruce.address, 3)
+    approve(apes, bruce.address, letmegetv3.address, 3)
+
+    signature, offer_hash = sign_offer(bruce, letmegetv3, *offer)
+    letmegetv3.offer(*offer, signature, {"from": bruce})
+
+    assert letmegetv3.offers(offer_hash) == (
+        False,
+        bruce.address,
+        Web3.keccak(hexstr=signature),
+        999999,
+    )
+
+    revoke_batch(letmegetv3, bruce, [offer])
+    assert letmegetv3.offers(offer_hash)[0] is True
+
+    with reverts("expires-too-high"):
+        letmegetv3.offer(
+            apes.address,
+            3,
+            rats.address,
+            3,
+            2 ** 64,
+            sign_offer(
+                bruce, letmegetv3, apes.address, 3, rats.address, 3, 2 ** 64
+            )[0],
+            {"from": bruce},
+        )
+
+
+def test_gas_benchmark(signers, apes, rats, letmegetv3):
+    """ Compare offer, accept and revoke gas of v2's and v3's storage """
+    bruce = signers[0]
+    dandi = signers[1]
+    letmegetv2 = accounts[0].deploy(LetMeGet_v2)
+
+    def sign(account, lmg, offer):
+        acc = Account.from_key(account.private_key)
+        offer_hash = lmg.hash_params(*offer)
+        # v2 offers are personal_sign messages, v3 offers typed data
+        if lmg.version() == 2:
+            offer_hash = defunct_hash_message(offer_hash)
+        return acc.signHash(offer_hash).signature.hex()
+
+    gas = {}
+    for lmg, offer_token_id, wanted_token_id in (
+        (letmegetv2, 4, 4),
+        (letmegetv3, 5, 5),
+    ):
+        accepted = (
+            apes.address,
+            offer_token_id,
+            rats.address,
+            wanted_token_id,
+            999999,
+        )
+        revoked = (apes.address, offer_token_id, rats.address, 1, 999999)
+
+        transfer_token(apes, accounts[0], bruce.address, offer_token_id)
+        transfer_token(rats, accounts[0], dandi.address, wanted_token_id)
+        approve(apes, bruce.address, lmg.address, offer_token_id)
+        approve(rats, dandi.address, lmg.address, wanted_token_id)
+
+        offer_gas = lmg.offer(
+            *accepted, sign(bruce, lmg, accepted), {"from": bruce}
+        ).gas_used
+
+        revoked_signature = sign(bruce, lmg, revoked)
+        lmg.offer(*revoked, revoked_signature, {"from": bruce})
+        # v3 revokes are signed over the hash of the offer's signature
+        if lmg.version() == 3:
+            revoked_signature = sign_revoke(bruce, revoked_signature)
+        revoke_gas = lmg.revoke(
+            *revoked, revoked_signature, {"from": bruce}
+        ).gas_used
+
+        accept_gas = lmg.accept(
+            *accepted, sign(dandi, lmg, accepted), {"from": dandi}
+        ).gas_used
+
+        gas[lmg.version()] = (offer_gas, accept_gas, revoke_gas)
+
+    for i, name in enumerate(("offer", "accept", "revoke")):
+        print(
+            "{}: v2 {} gas, v3 {} gas ({:+.1%})".format(
+                name,
+                gas[2][i],
+                gas[3][i],
+                (gas[3][i] - gas[2][i]) / gas[2][i],
+            )
+        )
+
+    # Storage packing pays for v3's extra ownerOf calls
+    assert gas[3][0] < gas[2][0]
+    assert gas[3][2] < gas[2][2]
@@ -0,0 +1,66 @@
+import json
+from brownie import LetMeGet_v2, accounts
+
+from letmeget.manifest import (
+    export_deployments,
+    manifest_entry,
+    write_manifest,
+)
+
+
+def test_manifest_entry():
+    lmg = accounts[0].deploy(LetMeGet_v2)
+    entry = manifest_entry(lmg.address, lmg.abi, lmg.tx.block_number)
+
+    assert entry["address"] == lmg.address
+    assert entry["deployBlock"] == lmg.tx.block_number
+    names = {e["name"] for e in entry["abi"]}
+    assert {"offer", "accept", "revoke", "Offer", "Accept"} <= names
+    assert all(e["type"] in ("function", "event") for e in entry["abi"])
+    assert "gas" not in json.dumps(entry["abi"])
+
+
+def test_write_manifest_only_on_change(tmp_path):
+    path = tmp_path.joinpath("1337.json")
+    contracts = {"LetMeGet_v2": manifest_entry(accounts[1].address, [], 1)}
+
+    assert write_manifest(path, 1337, contracts)
+    mtime = path.stat().st_mtime_ns
+    assert not write_manifest(path, 1337, contracts)
+    assert path.stat().st_mtime_ns == mtime
+
+    contracts["LetMeGet_v2"]["deployBlock"] = 2
+    assert write_manifest(path, 1337, contracts)
+    assert json.loads(path.read_text()) == {
+        "chainId": 1337,
+        "contracts": contracts,
+    }
+
+
+def test_export_deployments(tmp_path):
+    deployments = tmp_path.joinpath("4")
+    deployments.mkdir()
+    for i, block in enumerate((10, 20)):
+        deployments.joinpath("{}.json".format(i)).write_text(
+            json.dumps(
+                {
+                    "contractName": "LetMeGet_v2",
+                    "abi": LetMeGet_v2.abi,
+                    "bytecode": "0x00",
+                    "deployment": {
+                        "address": accounts[i].address,
+                        "blockHeight": block,
+                    },
+                }
+            )
+        )
+
+    path = tmp_path.joinpath("4.json")
+    assert export_deployments(str(deployments), str(path))
+
+    manifest = json.loads(path.read_text())
+    assert manifest["chainId"] == 4
+    entry = manifest["contracts"]["LetMeGet_v2"]
+    # Newest deployment wins
+    assert entry["address"] == accounts[1].address
+    assert "bytecode" not in entry
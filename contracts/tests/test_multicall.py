@@ -0,0 +1,172 @@
+import pytest
+from eth_account.account import Account
+from eth_account.messages import defunct_hash_message
+from brownie import (
+    LetMeGet_v2,
+    ApesMock,
+    RatsMock,
+    Multicall2,
+    accounts,
+    chain,
+)
+
+try:
+    from eth_abi import encode as encode_abi
+except ImportError:  # eth-abi < 4
+    from eth_abi import encode_abi
+
+from letmeget.multicall import OfferChecker, check_results
+from letmeget.offers import Offer, hash_params
+
+EXPIRES = 999999
+
+
+def sign_offer(
+    account,
+    offer_contract,
+    offer_token_id,
+    wanted_contract,
+    wanted_token_id,
+    expires,
+):
+    """ Sign offer data with given account """
+    acc = Account.from_key(account.private_key)
+    offer_hash = hash_params(
+        offer_contract,
+        offer_token_id,
+        wanted_contract,
+        wanted_token_id,
+        expires,
+    )
+    return acc.signHash(defunct_hash_message(offer_hash)).signature.hex()
+
+
+@pytest.fixture
+def signers():
+    return accounts.from_mnemonic(
+        "buffalo cinnamon glory chalk require inform strike ginger crop sell hidden cart",
+        count=2,
+        offset=0,
+    )
+
+
+@pytest.fixture
+def letmegetv2():
+    return accounts[0].deploy(LetMeGet_v2)
+
+
+@pytest.fixture
+def apes():
+    return accounts[0].deploy(ApesMock)
+
+
+@pytest.fixture
+def rats():
+    return accounts[0].deploy(RatsMock)
+
+
+@pytest.fixture
+def checker(web3, letmegetv2):
+    multicall = accounts[0].deploy(Multicall2)
+    return OfferChecker(web3, letmegetv2.address, multicall.address)
+
+
+def make_offer(letmegetv2, apes, rats, signer, token_id, expires=EXPIRES):
+    """ Offer signer's Ape for accounts[0]'s Rat with the same token ID """
+    apes.transferFrom(
+        accounts[0], signer.address, token_id, {"from": accounts[0]}
+    )
+    apes.approve(letmegetv2.address, token_id, {"from": signer})
+    signature = sign_offer(
+        signer, apes.address, token_id, rats.address, token_id, expires
+    )
+    letmegetv2.offer(
+        apes.address,
+        token_id,
+        rats.address,
+        token_id,
+        expires,
+        signature,
+        {"from": signer},
+    )
+    return Offer(apes.address, token_id, rats.address, token_id, expires)
+
+
+def test_check_offers(web3, signers, apes, rats, letmegetv2, checker):
+    bruce = signers[0]
+
+    completes = make_offer(letmegetv2, apes, rats, bruce, 1)
+    rats.approve(letmegetv2.address, 1, {"from": accounts[0]})
+
+    not_approved = make_offer(letmegetv2, apes, rats, bruce, 2)
+
+    expired = make_offer(
+        letmegetv2, apes, rats, bruce, 3, web3.eth.block_number + 3
+    )
+    rats.approve(letmegetv2.address, 3, {"from": accounts[0]})
+    chain.mine(3)
+
+    revoked = make_offer(letmegetv2, apes, rats, bruce, 4)
+    letmegetv2.revoke(
+        *revoked,
+        sign_offer(bruce, *revoked),
+        {"from": bruce},
+    )
+
+    missing = Offer(apes.address, 5, rats.address, 5, EXPIRES)
+    no_token = Offer(apes.address, 1, rats.address, 1000, EXPIRES)
+
+    offers = [completes, not_approved, expired, revoked, missing, no_token]
+    checks = checker.check(offers)
+
+    assert [c.offer for c in checks] == offers
+    assert [(c.can_complete, c.reason) for c in checks] == [
+        (True, None),
+        (False, "wanted-not-approved"),
+        (False, "offer-expired"),
+        (False, "offer-revoked"),
+        (False, "offer-does-not-exist"),
+        (False, "offer-does-not-exist"),
+    ]
+
+    # Agrees with the contract itself
+    for check in checks[:5]:
+        assert check.can_complete == letmegetv2.offer_can_complete(*check.offer)
+
+
+def test_check_offers_batches(signers, apes, rats, letmegetv2, checker):
+    offers = [
+        make_offer(letmegetv2, apes, rats, signers[0], i) for i in (6, 7, 8)
+    ]
+    for offer in offers:
+        rats.approve(
+            letmegetv2.address, offer.wanted_token_id, {"from": accounts[0]}
+        )
+
+    checker.batch_size = 2
+    assert [c.can_complete for c in checker.check(offers)] == [True] * 3
+
+
+@pytest.mark.parametrize(
+    "no_code, reason",
+    [(1, "offer-not-erc721"), (2, "wanted-not-erc721")],
+)
+def test_check_results_without_code(letmegetv2, apes, rats, no_code, reason):
+    """ Test empty returndata fails its own check, not the whole batch """
+    offer = Offer(apes.address, 1, rats.address, 1, EXPIRES)
+    approved = (True, encode_abi(["address"], [letmegetv2.address]))
+    details = encode_abi(
+        ["bool", "address", "bytes", "uint256"],
+        [False, accounts[1].address, b"", EXPIRES],
+    )
+    results = [(True, details), approved, approved]
+    results[no_code] = (True, b"")
+
+    check = check_results(letmegetv2.address, offer, 1, results)
+
+    assert (check.can_complete, check.reason) == (False, reason)
+    assert check_results(letmegetv2.address, offer, 1, [(True, b"")] * 3) == (
+        offer,
+        False,
+        "call-failed",
+    )
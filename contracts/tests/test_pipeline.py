@@ -0,0 +1,66 @@
+import pytest
+from eth_account.account import Account
+from brownie import ApesMock, accounts
+
+from letmeget.pipeline import TransactionFailed, TxPipeline
+
+
+@pytest.fixture
+def apes():
+    return accounts[0].deploy(ApesMock)
+
+
+def test_pipeline_transfers(web3, apes):
+    """ Test pipelined transfers land in order with local nonces """
+    pipeline = TxPipeline(web3)
+    nonce = web3.eth.get_transaction_count(accounts[0].address)
+
+    with pipeline.stage("send"):
+        for token_id in range(1, 11):
+            pipeline.send(
+                accounts[0],
+                apes.address,
+                apes.transferFrom.encode_input(
+                    accounts[0], accounts[token_id % 3 + 1], token_id
+                ),
+            )
+    with pipeline.stage("wait"):
+        receipts = pipeline.wait()
+
+    assert [r["status"] for r in receipts] == [1] * 10
+    assert web3.eth.get_transaction_count(accounts[0].address) == nonce + 10
+    for token_id in range(1, 11):
+        assert apes.ownerOf(token_id) == accounts[token_id % 3 + 1]
+    assert [name for name, _ in pipeline.timings] == ["send", "wait"]
+
+
+def test_pipeline_local_account(web3):
+    """ Test LocalAccounts are signed for locally """
+    local = Account.create()
+    pipeline = TxPipeline(web3)
+
+    pipeline.send(accounts[0], local.address, value=int(1e18), gas=21000)
+    pipeline.wait()
+    pipeline.send(local, accounts[1].address, value=1, gas=21000)
+    pipeline.send(local, accounts[1].address, value=1, gas=21000)
+
+    assert len(pipeline.wait()) == 2
+    assert web3.eth.get_transaction_count(local.address) == 2
+
+
+def test_pipeline_reports_failures(web3, apes):
+    pipeline = TxPipeline(web3)
+
+    # accounts[1] owns no Apes to transfer.  Ganache may reject it at send
+    # time instead of mining a failed transaction.
+    with pytest.raises((TransactionFailed, ValueError)):
+        pipeline.send(
+            accounts[1],
+            apes.address,
+            apes.transferFrom.encode_input(accounts[1], accounts[2], 1),
+        )
+        pipeline.wait()
+
+    # Nonces stay in step with the node either way
+    pipeline.send(accounts[1], accounts[2].address, value=1, gas=21000)
+    assert pipeline.wait()[0]["status"] == 1
@@ -0,0 +1,102 @@
+import pytest
+from brownie import LetMeGet_v3, ApesMock, RatsMock, accounts, chain
+from eth_account.messages import encode_typed_data
+from eth_utils import keccak
+
+from letmeget.bulk import recover_signers
+from letmeget.offers import Offer
+from letmeget.typed import TypedOffers, offer_message
+
+EXPIRES = 999999
+
+
+@pytest.fixture
+def signers():
+    return accounts.from_mnemonic(
+        "buffalo cinnamon glory chalk require inform strike ginger crop sell hidden cart",
+        count=2,
+        offset=0,
+    )
+
+
+@pytest.fixture
+def letmegetv3():
+    return accounts[0].deploy(LetMeGet_v3)
+
+
+@pytest.fixture
+def apes():
+    return accounts[0].deploy(ApesMock)
+
+
+@pytest.fixture
+def rats():
+    return accounts[0].deploy(RatsMock)
+
+
+def signable_digest(message):
+    """ The hash a wallet signs for an EIP-191 SignableMessage """
+    return keccak(b"\x19" + message.version + message.header + message.body)
+
+
+@pytest.mark.parametrize("epoch", [0, 3])
+def test_offer_message_digest(apes, rats, letmegetv3, epoch):
+    """ Test the eip712 package hashes offers exactly like TypedOffers """
+    typed = TypedOffers(chain.id, letmegetv3.address)
+    offer = Offer(apes.address, 1, rats.address, 2 ** 256 - 1, EXPIRES)
+
+    message = offer_message(chain.id, letmegetv3.address, offer, epoch)
+
+    assert signable_digest(message.signable_message) == typed.digest(
+        offer, epoch
+    )
+
+
+def test_typed_data_shape(apes, rats, letmegetv3):
+    """ Test typed_data is eth_signTypedData_v4 JSON of the same digest """
+    typed = TypedOffers(chain.id, letmegetv3.address)
+    offer = Offer(apes.address.lower(), 1, rats.address, 2, EXPIRES)
+
+    data = typed.typed_data(offer, epoch=2)
+
+    assert set(data) == {"types", "primaryType", "domain", "message"}
+    assert set(data["types"]) == {"EIP712Domain", "Offer"}
+    assert data["primaryType"] == "Offer"
+    assert data["domain"] == {
+        "name": "LetMeGet",
+        "version": "3",
+        "chainId": chain.id,
+        "verifyingContract": letmegetv3.address,
+    }
+    assert data["message"] == {
+        "offerContract": apes.address,
+        "offerTokenId": 1,
+        "wantedContract": rats.address,
+        "wantedTokenId": 2,
+        "expires": EXPIRES,
+        "epoch": 2,
+    }
+
+    # A wallet hashing it signs the same digest as the contract checks
+    message = encode_typed_data(full_message=data)
+    assert signable_digest(message) == typed.digest(offer, epoch=2)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sign_all_recovers(signers, apes, rats, letmegetv3, workers):
+    """ Test bulk signatures recover to the signer, here and on-chain """
+    bruce = signers[0]
+    typed = TypedOffers(chain.id, letmegetv3.address)
+    offers = [
+        Offer(apes.address, i, rats.address, i, EXPIRES) for i in range(5)
+    ]
+
+    signatures = typed.sign_all(bruce.private_key, offers, workers=workers)
+
+    assert signatures == [typed.sign(bruce.private_key, o) for o in offers]
+    assert recover_signers(typed.digests(offers), signatures) == [
+        bruce.address
+    ] * len(offers)
+    assert letmegetv3.offer_signer(*offers[0], signatures[0])[0] == (
+        bruce.address
+    )
@@ -0,0 +1,327 @@
+""" Offline load test and benchmark for the json_proxy lambda
+
+Runs lambda_handler in-process against a local stand-in metadata server
+with configurable latency, body size and error rate, across a range of
+concurrency levels, and writes the results as JSON.
+
+    python bench/bench.py --concurrency 1,8,32 --requests 500 --latency 0.05
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+__DIR__ = os.path.abspath(os.path.dirname(__file__))
+
+
+class Upstream(ThreadingHTTPServer):
+    """ Stand-in for a token metadata server """
+
+    daemon_threads = True
+
+    def __init__(self, latency, body_size, error_rate, seed=None):
+        super().__init__(("127.0.0.1", 0), UpstreamHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.body = json.dumps(
+            {
+                "name": "Bench Token",
+                "description": "x" * max(0, body_size - 64),
+                "image": "https://example.com/image.png",
+            }
+        ).encode("utf-8")
+
+    @property
+    def root(self):
+        return "http://127.0.0.1:{}".format(self.server_address[1])
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real metadata servers
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, without this Nagle's algorithm
+    # and delayed ACKs add ~40ms to every response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            failed = server.random.random() < server.error_rate
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if failed:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(server.body)))
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def percentile(sorted_values, pct):
+    """ Nearest-rank percentile of already sorted values """
+    if not sorted_values:
+        return None
+    rank = max(0, int(round(pct / 100.0 * len(sorted_values))) - 1)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def rss_mb():
+    """ Current resident set size, or the peak so far where /proc is missing """
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / (1024.0 * 1024.0)
+    except (OSError, IndexError, ValueError):
+        # ru_maxrss is KiB on Linux (and bytes on macOS, close enough here)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class RSSSampler:
+    """
+    Peak RSS over a block, relative to the RSS at its start.  ru_maxrss
+    is the peak of the whole process, so after the first level it would only
+    ever report the largest level so far.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.baseline = self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def __enter__(self):
+        self.baseline = self.peak = rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+    def report(self):
+        return {
+            "baseline": round(self.baseline, 2),
+            "peak": round(self.peak, 2),
+            "growth": round(self.peak - self.baseline, 2),
+        }
+
+
+def build_events(root, requests, unique, batch_size):
+    """ Lambda events for a run, cycling through `unique` distinct URIs """
+    uris = [
+        "{}/token/{}.json".format(root, i % unique) for i in range(requests)
+    ]
+    if batch_size <= 1:
+        return [{"queryStringParameters": {"uri": uri}} for uri in uris]
+    return [
+        {"body": json.dumps({"uris": uris[i : i + batch_size]})}
+        for i in range(0, len(uris), batch_size)
+    ]
+
+
+def run_level(handler, events, concurrency):
+    """ Fire events at handler with `concurrency` callers """
+    latencies = []
+    errors = 0
+
+    def invoke(event):
+        start = time.perf_counter()
+        response = handler(event, None)
+        return time.perf_counter() - start, response
+
+    start = time.perf_counter()
+    with RSSSampler() as rss, ThreadPoolExecutor(
+        max_workers=concurrency
+    ) as executor:
+        for latency, response in executor.map(invoke, events):
+            latencies.append(latency)
+            if response["statusCode"] != 200:
+                errors += 1
+                continue
+            body = json.loads(response["body"])
+            results = body["results"].values() if "results" in body else [body]
+            errors += sum(1 for r in results if r.get("statusCode") != 200)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "invocations": len(events),
+        "elapsed_s": round(elapsed, 4),
+        "rps": round(len(events) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1e3, 3),
+            "p95": round(percentile(latencies, 95) * 1e3, 3),
+            "p99": round(percentile(latencies, 99) * 1e3, 3),
+            "max": round(latencies[-1] * 1e3, 3),
+        },
+        "errors": errors,
+        "rss_mb": rss.report(),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--concurrency",
+        default="1,4,16",
+        help="comma separated concurrency levels (default: 1,4,16)",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=200,
+        help="URIs requested per concurrency level (default: 200)",
+    )
+    parser.add_argument(
+        "--unique",
+        type=int,
+        default=50,
+        help="distinct URIs among the requests (default: 50)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="URIs per invocation, >1 uses the batch endpoint (default: 1)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.02,
+        help="upstream latency in seconds (default: 0.02)",
+    )
+    parser.add_argument(
+        "--body-size",
+        type=int,
+        default=2048,
+        help="upstream JSON body size in bytes (default: 2048)",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="fraction of upstream requests that return 500 (default: 0)",
+    )
+    parser.add_argument(
+        "--keep-cache",
+        action="store_true",
+        help="keep the proxy cache warm between concurrency levels",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--output",
+        "-o",
+        default=None,
+        help="write results JSON here instead of stdout",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # A durable tier left from earlier runs or levels would make cold levels
+    # warm, so each cache gets a fresh database of its own
+    tmpdir = None
+    if os.environ.get("JSON_PROXY_CACHE_DB"):
+        tmpdir = tempfile.TemporaryDirectory(prefix="json_proxy_bench_")
+        # Before the import, which builds a cache from the environment
+        os.environ["JSON_PROXY_CACHE_DB"] = os.path.join(
+            tmpdir.name, "import.sqlite3"
+        )
+
+    # The proxy's modules live one directory up, as they do in the zip
+    sys.path.insert(0, os.path.dirname(__DIR__))
+    import lambda_function
+
+    def fresh_cache(name):
+        if tmpdir is not None:
+            os.environ["JSON_PROXY_CACHE_DB"] = os.path.join(
+                tmpdir.name, "{}.sqlite3".format(name)
+            )
+        lambda_function.CACHE = lambda_function.build_cache()
+
+    # One metrics line per invocation would swamp the results
+    logging.getLogger().setLevel(logging.WARNING)
+
+    upstream = Upstream(
+        args.latency, args.body_size, args.error_rate, args.seed
+    ).start()
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    results = {
+        "config": {
+            key: value for key, value in vars(args).items() if key != "output"
+        },
+        "levels": [],
+    }
+
+    for i, concurrency in enumerate(levels):
+        if i == 0 or not args.keep_cache:
+            fresh_cache("level-{}".format(i))
+
+        with upstream.lock:
+            upstream.requests = 0
+        events = build_events(
+            upstream.root, args.requests, args.unique, args.batch_size
+        )
+        level = run_level(lambda_function.lambda_handler, events, concurrency)
+        level["upstream_requests"] = upstream.requests
+        level["cache"] = dict(lambda_function.CACHE.stats)
+        results["levels"].append(level)
+
+        print(
+            "concurrency={concurrency} rps={rps} p50={p50}ms p95={p95}ms "
+            "p99={p99}ms upstream={upstream_requests} "
+            "rss=+{growth}MB".format(
+                **level, **level["latency_ms"], **level["rss_mb"]
+            ),
+            file=sys.stderr,
+        )
+
+    upstream.shutdown()
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as outfile:
+            outfile.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,8 +13,8 @@ fi
 # Create workdir
 mkdir -p $WORK_DIR &&
 
-# Copy function
-cp $THIS_DIR/lambda_function.py $WORK_DIR/ &&
+# Copy function and its modules
+cp $THIS_DIR/*.py $WORK_DIR/ &&
 
 # Install deps
 pip install --target $WORK_DIR/ -r $THIS_DIR/requirements.txt &&
@@ -0,0 +1,395 @@
+""" Two tier metadata cache for the JSON proxy """
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlsplit, urlunsplit
+
+# Status codes we remember as "this URI has nothing for you", including the
+# proxy's own refusals for oversized and non-JSON responses
+NEGATIVE_STATUS_CODES = (404, 410, 413, 415)
+# How often a process waiting on another's fetch checks for its result
+LOCK_POLL_INTERVAL = 0.05
+# Entry freshness, see MetadataCache.lookup()
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+CacheEntry = namedtuple(
+    "CacheEntry",
+    ["status_code", "body", "expires_at", "etag", "last_modified"],
+    defaults=(None, None),
+)
+
+
+def normalize_uri(uri):
+    """ Normalize a URI so trivially different spellings share a cache key """
+    parts = urlsplit(uri.strip())
+    scheme = parts.scheme.lower()
+
+    # Only HTTP hosts are case-insensitive, IPFS CIDs for one are not
+    if scheme not in ("http", "https"):
+        return uri.strip()
+
+    netloc = parts.netloc.lower()
+
+    if scheme == "http" and netloc.endswith(":80"):
+        netloc = netloc[:-3]
+    elif scheme == "https" and netloc.endswith(":443"):
+        netloc = netloc[:-4]
+
+    # Fragments never make it to the origin
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+class MemoryCache:
+    """ In-process LRU, lives as long as the warm container """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DurableBackend:
+    """ Interface for the durable cache tier """
+
+    def get(self, key):
+        raise NotImplementedError()
+
+    def set(self, key, entry):
+        raise NotImplementedError()
+
+    def delete(self, key):
+        raise NotImplementedError()
+
+    def acquire(self, key, ttl):
+        """
+        Try to take the fill lock for key, held for at most ttl seconds.
+        Backends that can not lock across processes always succeed.
+        """
+        return True
+
+    def release(self, key):
+        pass
+
+
+class SQLiteBackend(DurableBackend):
+    """ Durable tier backed by a local SQLite file """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            " key TEXT PRIMARY KEY,"
+            " status_code INTEGER NOT NULL,"
+            " body TEXT,"
+            " expires_at REAL NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT"
+            ")"
+        )
+        self._migrate()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS fill_locks ("
+            " key TEXT PRIMARY KEY,"
+            " expires_at REAL NOT NULL"
+            ")"
+        )
+
+    def _conn(self):
+        # sqlite3 connections can not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self):
+        """ Add columns missing from cache files made by older versions """
+        columns = [
+            row[1]
+            for row in self._conn().execute("PRAGMA table_info(metadata)")
+        ]
+        for column in ("etag", "last_modified"):
+            if column not in columns:
+                self._conn().execute(
+                    "ALTER TABLE metadata ADD COLUMN {} TEXT".format(column)
+                )
+
+    def get(self, key):
+        row = (
+            self._conn()
+            .execute(
+                "SELECT status_code, body, expires_at, etag, last_modified"
+                " FROM metadata WHERE key = ?",
+                (key,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        status_code, body, expires_at, etag, last_modified = row
+        return CacheEntry(
+            status_code,
+            json.loads(body) if body is not None else None,
+            expires_at,
+            etag,
+            last_modified,
+        )
+
+    def set(self, key, entry):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO metadata"
+            " (key, status_code, body, expires_at, etag, last_modified)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                entry.status_code,
+                json.dumps(entry.body) if entry.body is not None else None,
+                entry.expires_at,
+                entry.etag,
+                entry.last_modified,
+            ),
+        )
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM metadata WHERE key = ?", (key,))
+
+    def acquire(self, key, ttl):
+        conn = self._conn()
+        now = time.time()
+        # Locks left behind by a process that died mid-fetch
+        conn.execute(
+            "DELETE FROM fill_locks WHERE key = ? AND expires_at <= ?",
+            (key, now),
+        )
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO fill_locks (key, expires_at) VALUES (?, ?)",
+            (key, now + ttl),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, key):
+        self._conn().execute("DELETE FROM fill_locks WHERE key = ?", (key,))
+
+
+class MetadataCache:
+    """
+    LRU in front of an optional durable backend with per-entry TTLs.
+
+    Entries past their TTL are served stale for up to stale_grace seconds
+    while they are revalidated.  After that they are only kept if they carry
+    validators (ETag/Last-Modified) for a conditional refresh.
+    """
+
+    def __init__(
+        self,
+        memory=None,
+        durable=None,
+        ttl=86400,
+        negative_ttl=300,
+        lock_ttl=15,
+        stale_grace=3600,
+    ):
+        self.memory = memory if memory is not None else MemoryCache()
+        self.durable = durable
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock_ttl = lock_ttl
+        self.stale_grace = stale_grace
+        self.stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "durable_hits": 0,
+            "negative_hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "lock_waits": 0,
+            "revalidated": 0,
+        }
+
+    def _count(self, entry):
+        self.stats["hits"] += 1
+        if entry.status_code in NEGATIVE_STATUS_CODES:
+            self.stats["negative_hits"] += 1
+
+    def freshness(self, entry, now=None):
+        """ FRESH, STALE or EXPIRED for an entry """
+        now = now if now is not None else time.time()
+        if entry.expires_at > now:
+            return FRESH
+        if entry.expires_at + self.stale_grace > now:
+            return STALE
+        return EXPIRED
+
+    def _check(self, tier, key, entry, now):
+        """ Freshness of an entry from a tier, dropping it if useless """
+        freshness = self.freshness(entry, now)
+        if freshness == EXPIRED:
+            self.stats["expired"] += 1
+            if not (entry.etag or entry.last_modified):
+                tier.delete(key)
+                return None
+        return freshness
+
+    def lookup(self, uri):
+        """
+        Look up the entry for a URI, returning (entry, freshness).  Expired
+        entries are only returned when they can be conditionally refreshed.
+        (None, None) is a miss.
+        """
+        key = normalize_uri(uri)
+        now = time.time()
+        tier_stat = "memory_hits"
+
+        entry = self.memory.get(key)
+        freshness = None
+        if entry is not None:
+            freshness = self._check(self.memory, key, entry, now)
+
+        # Another process may have refreshed what this one has gone stale on
+        if freshness != FRESH and self.durable is not None:
+            durable_entry = self.durable.get(key)
+            if durable_entry is not None and (
+                freshness is None or durable_entry.expires_at > entry.expires_at
+            ):
+                durable_freshness = self._check(
+                    self.durable, key, durable_entry, now
+                )
+                if durable_freshness is not None:
+                    entry, freshness = durable_entry, durable_freshness
+                    # Promote so the next warm request stays in-process
+                    self.memory.set(key, entry)
+                    tier_stat = "durable_hits"
+
+        if freshness in (FRESH, STALE):
+            self.stats[tier_stat] += 1
+            if freshness == STALE:
+                self.stats["stale_hits"] += 1
+            self._count(entry)
+            return entry, freshness
+
+        self.stats["misses"] += 1
+        if freshness == EXPIRED:
+            return entry, EXPIRED
+        return None, None
+
+    def ttl_for(self, status_code):
+        """ TTL in seconds for a status code, or None if not cacheable """
+        if status_code == 200:
+            return self.ttl
+        if status_code in NEGATIVE_STATUS_CODES:
+            return self.negative_ttl
+        return None
+
+    def _store(self, uri, entry):
+        key = normalize_uri(uri)
+        self.memory.set(key, entry)
+        if self.durable is not None:
+            self.durable.set(key, entry)
+        return entry
+
+    def set(self, uri, status_code, body, etag=None, last_modified=None):
+        """ Store a fetch result, returning the entry if it was cacheable """
+        ttl = self.ttl_for(status_code)
+        if not ttl:
+            return None
+
+        return self._store(
+            uri,
+            CacheEntry(
+                status_code, body, time.time() + ttl, etag, last_modified
+            ),
+        )
+
+    def extend(self, uri, entry):
+        """ Renew an entry's TTL after the origin said it is unchanged """
+        self.stats["revalidated"] += 1
+        ttl = self.ttl_for(entry.status_code) or self.ttl
+        return self._store(uri, entry._replace(expires_at=time.time() + ttl))
+
+    def _wait_for_fill(self, key):
+        """
+        Wait for another process holding the fill lock to store its result.
+        Returns (entry, acquired) where acquired means the lock came free
+        without a result and this process should fetch it instead.
+        """
+        self.stats["lock_waits"] += 1
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            acquired = self.durable.acquire(key, self.lock_ttl)
+            # Check after acquiring, the holder stores before it releases
+            entry = self.durable.get(key)
+            if entry is not None and entry.expires_at > time.time():
+                if acquired:
+                    self.durable.release(key)
+                self.memory.set(key, entry)
+                return entry, False
+            if acquired:
+                return None, True
+        return None, False
+
+    def fill(self, uri, fetch, stale=None):
+        """
+        Fetch and store an entry, returning (status_code, body).
+
+        fetch() returns a result with status_code, content, etag and
+        last_modified.  A 304 renews the stale entry it was validating.
+
+        When the durable backend supports it, only one process fetches a
+        key at a time and the rest wait for its result to land.
+        """
+        key = normalize_uri(uri)
+        acquired = False
+
+        if self.durable is not None:
+            acquired = self.durable.acquire(key, self.lock_ttl)
+            if not acquired:
+                entry, acquired = self._wait_for_fill(key)
+                if entry is not None:
+                    return entry.status_code, entry.body
+
+        try:
+            result = fetch()
+            if result.status_code == 304 and stale is not None:
+                entry = self.extend(uri, stale)
+                return entry.status_code, entry.body
+
+            self.set(
+                uri,
+                result.status_code,
+                result.content,
+                result.etag,
+                result.last_modified,
+            )
+            return result.status_code, result.content
+        finally:
+            if acquired:
+                self.durable.release(key)
@@ -0,0 +1,318 @@
+""" Pooled upstream fetching for the JSON proxy """
+import os
+import json
+import time
+import socket
+from collections import namedtuple
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.retry import Retry
+
+import metrics
+
+DEFAULT_HEADERS = {"Accept": "application/json"}
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+# Proxy statuses for responses we refuse to read
+STATUS_TOO_LARGE = 413
+STATUS_NOT_JSON = 415
+# Plenty of metadata servers (and IPFS gateways) serve JSON as these
+JSON_COMPATIBLE_TYPES = ("text/plain", "application/octet-stream")
+
+
+class InvalidJSON(Exception):
+    """ A body that should be JSON and is not """
+
+    status_code = 502
+    reason = "Upstream response is not valid JSON"
+
+    def __init__(self):
+        super().__init__(self.reason)
+
+
+FetchResult = namedtuple(
+    "FetchResult",
+    ["status_code", "content", "etag", "last_modified"],
+    defaults=(None, None),
+)
+
+
+def is_json_content_type(content_type):
+    """ Check if a Content-Type header could reasonably be JSON """
+    if not content_type:
+        return True
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return "json" in media_type or media_type in JSON_COMPATIBLE_TYPES
+
+
+def read_limited(res, max_bytes):
+    """ Stream a response body, returning None if it exceeds max_bytes """
+    content_length = res.headers.get("Content-Length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > max_bytes:
+            return None
+
+    body = bytearray()
+    for chunk in res.iter_content(CHUNK_SIZE):
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            metrics.incr("bytes", len(body))
+            return None
+    metrics.incr("bytes", len(body))
+    return bytes(body)
+
+
+class TimedConnectionMixin:
+    """
+    Records how long new upstream connections take to resolve and open.
+
+    requests has no public hook for this, so it overrides urllib3's private
+    _new_conn() and points _dns_host at each resolved address in turn.
+    Check both still exist when upgrading requests or urllib3.
+    """
+
+    setup_time = 0.0
+
+    def resolve(self):
+        """ Look up the host's addresses, or just the host if that fails """
+        host = self._dns_host
+        try:
+            infos = socket.getaddrinfo(
+                host, self.port, allowed_gai_family(), socket.SOCK_STREAM
+            )
+        except socket.gaierror:
+            # urllib3's own lookup raises the error it expects
+            return [host]
+        return list(dict.fromkeys(info[4][0] for info in infos))
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        addresses = self.resolve()
+        resolved = time.perf_counter()
+        metrics.record_phase("dns", resolved - start)
+
+        host = self._dns_host
+        try:
+            # Like urllib3, try every address before giving up
+            for address in addresses[:-1]:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (ConnectTimeoutError, NewConnectionError):
+                    continue
+            self._dns_host = addresses[-1]
+            return super()._new_conn()
+        finally:
+            self._dns_host = host
+            self.setup_time = time.perf_counter() - start
+            metrics.record_phase("connect", time.perf_counter() - resolved)
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        # connect() is _new_conn() (DNS and TCP) then the TLS handshake
+        metrics.record_phase(
+            "tls", time.perf_counter() - start - self.setup_time
+        )
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """ HTTPAdapter whose connections record their setup phases """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+def parse_host_pools(value):
+    """ Parse "host=size,host=size" into a dict """
+    pools = {}
+    for pair in (value or "").split(","):
+        if "=" not in pair:
+            continue
+        host, size = pair.split("=", 1)
+        pools[host.strip().lower()] = int(size)
+    return pools
+
+
+def host_prefixes(host):
+    """
+    Session mount prefixes for a host pool.  Adapters match URLs by prefix,
+    so "host" also gets its default ports spelled out and other ports need
+    their own "host:port" entry.
+    """
+    if ":" in host:
+        return ["http://{}/".format(host), "https://{}/".format(host)]
+    return [
+        "http://{}/".format(host),
+        "http://{}:80/".format(host),
+        "https://{}/".format(host),
+        "https://{}:443/".format(host),
+    ]
+
+
+def build_adapter(
+    pool_maxsize, retries, backoff, pool_connections=16, status_retries=1
+):
+    """
+    Adapter that retries failures to connect and 503s, but never reads,
+    which may have been partly processed upstream
+    """
+    return TimedHTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(
+            total=retries + status_retries,
+            connect=retries,
+            # Raised as they are, so a read timeout is a ReadTimeout
+            read=False,
+            status=status_retries,
+            status_forcelist=(503,),
+            backoff_factor=backoff,
+            # A Retry-After of minutes would outlast the invocation
+            respect_retry_after_header=False,
+            # The last 503 is returned rather than raised
+            raise_on_status=False,
+        ),
+    )
+
+
+def build_session(
+    pool_maxsize=10,
+    host_pools=None,
+    retries=2,
+    backoff=0.1,
+    pool_connections=16,
+    status_retries=1,
+):
+    """ Build a keep-alive session with per-host connection pools """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+
+    default_adapter = build_adapter(
+        pool_maxsize, retries, backoff, pool_connections, status_retries
+    )
+    session.mount("http://", default_adapter)
+    session.mount("https://", default_adapter)
+
+    # Longest prefix wins so these override the defaults for their host
+    for host, size in (host_pools or {}).items():
+        adapter = build_adapter(
+            size, retries, backoff, pool_connections, status_retries
+        )
+        for prefix in host_prefixes(host):
+            session.mount(prefix, adapter)
+
+    return session
+
+
+class Fetcher:
+    """ Fetches JSON over a session reused across warm invocations """
+
+    def __init__(
+        self,
+        session=None,
+        connect_timeout=3.05,
+        read_timeout=10,
+        max_bytes=DEFAULT_MAX_BYTES,
+    ):
+        self.session = session if session is not None else build_session()
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            session=build_session(
+                pool_maxsize=int(os.environ.get("JSON_PROXY_POOL_SIZE", 10)),
+                host_pools=parse_host_pools(
+                    os.environ.get("JSON_PROXY_HOST_POOLS")
+                ),
+                retries=int(os.environ.get("JSON_PROXY_CONNECT_RETRIES", 2)),
+                backoff=float(os.environ.get("JSON_PROXY_RETRY_BACKOFF", 0.1)),
+                pool_connections=int(
+                    os.environ.get("JSON_PROXY_POOL_CONNECTIONS", 16)
+                ),
+                status_retries=int(
+                    os.environ.get("JSON_PROXY_STATUS_RETRIES", 1)
+                ),
+            ),
+            connect_timeout=float(
+                os.environ.get("JSON_PROXY_CONNECT_TIMEOUT", 3.05)
+            ),
+            read_timeout=float(os.environ.get("JSON_PROXY_READ_TIMEOUT", 10)),
+            max_bytes=int(
+                os.environ.get("JSON_PROXY_MAX_BYTES", DEFAULT_MAX_BYTES)
+            ),
+        )
+
+    def fetch(self, uri, etag=None, last_modified=None):
+        """
+        Fetch JSON from uri, returning a FetchResult.  Given validators from
+        a previous response the request is conditional and may return 304.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        metrics.record_host(urlsplit(uri).hostname)
+        metrics.incr("upstream_requests")
+
+        # Includes any connection setup, which is also recorded on its own
+        with metrics.timed("headers"):
+            res = self.session.get(
+                uri, headers=headers, timeout=self.timeout, stream=True
+            )
+
+        with res:
+            if res.status_code != 200:
+                return FetchResult(res.status_code, None)
+
+            if not is_json_content_type(res.headers.get("Content-Type")):
+                return FetchResult(STATUS_NOT_JSON, None)
+
+            with metrics.timed("download"):
+                body = read_limited(res, self.max_bytes)
+            if body is None:
+                return FetchResult(STATUS_TOO_LARGE, None)
+
+            with metrics.timed("parse"):
+                try:
+                    content = json.loads(body)
+                except ValueError:
+                    raise InvalidJSON() from None
+
+            return FetchResult(
+                200,
+                content,
+                res.headers.get("ETag"),
+                res.headers.get("Last-Modified"),
+            )
+
+    def fetch_json(self, uri):
+        """ Fetch JSON from uri, returning (status_code, content) """
+        return self.fetch(uri)[:2]
@@ -0,0 +1,175 @@
+""" IPFS gateway racing for the JSON proxy """
+import re
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from fetch import STATUS_NOT_JSON, STATUS_TOO_LARGE
+import metrics
+
+# Same CID matching the frontend uses (utils/ipfs.ts)
+IPFS_CID_PATTERN = re.compile(
+    r"(Qm[1-9A-HJ-NP-Za-km-z]{44,}|b[A-Za-z2-7]{58,}|B[A-Z2-7]{58,}"
+    r"|z[1-9A-HJ-NP-Za-km-z]{48,}|F[0-9A-F]{50,})"
+)
+DEFAULT_GATEWAYS = [
+    "https://cloudflare-ipfs.com",
+    "https://ipfs.io",
+    "https://dweb.link",
+]
+# Statuses that are a property of the content, not the gateway
+DEFINITIVE_STATUS_CODES = (200, STATUS_TOO_LARGE, STATUS_NOT_JSON)
+# Smoothing for the latency and error moving averages
+EWMA_ALPHA = 0.3
+# Seconds of latency an always-failing gateway is treated as having
+ERROR_PENALTY = 10.0
+
+
+def parse_ipfs_path(uri):
+    """
+    Get the "<cid>/<path>" an ipfs:// URI or gateway URL points to, or None
+    if the URI does not reference IPFS content
+    """
+    parts = urlsplit(uri.strip())
+    scheme = parts.scheme.lower()
+
+    if scheme == "ipfs":
+        # Seen in the wild as both ipfs://<cid>/... and ipfs://ipfs/<cid>/...
+        path = "{}{}".format(parts.netloc, parts.path).lstrip("/")
+        if path.startswith("ipfs/"):
+            path = path[5:]
+        return path if IPFS_CID_PATTERN.match(path) else None
+
+    if scheme not in ("http", "https"):
+        return None
+
+    # Path gateway: https://<gateway>/ipfs/<cid>/...
+    if parts.path.startswith("/ipfs/"):
+        path = parts.path[6:]
+        return path if IPFS_CID_PATTERN.match(path) else None
+
+    # Subdomain gateway: https://<cid>.ipfs.<gateway>/...
+    labels = parts.hostname.split(".") if parts.hostname else []
+    if len(labels) > 2 and labels[1] == "ipfs":
+        # Hostnames are case-insensitive so only base32 CIDs live here
+        if IPFS_CID_PATTERN.match(labels[0]):
+            return "{}{}".format(labels[0], parts.path.rstrip("/"))
+
+    return None
+
+
+class GatewayStats:
+    """ Moving average latency and error rate per gateway """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _get(self, gateway):
+        return self._stats.setdefault(
+            gateway,
+            {"latency": 0.0, "error_rate": 0.0, "requests": 0, "errors": 0},
+        )
+
+    def record(self, gateway, latency, error):
+        with self._lock:
+            stats = self._get(gateway)
+            # First sample seeds the averages instead of decaying from zero
+            alpha = EWMA_ALPHA if stats["requests"] else 1.0
+            stats["requests"] += 1
+            stats["errors"] += int(error)
+            stats["latency"] += alpha * (latency - stats["latency"])
+            stats["error_rate"] += alpha * (float(error) - stats["error_rate"])
+
+    def score(self, gateway):
+        """ Lower is better """
+        with self._lock:
+            stats = self._get(gateway)
+            return stats["latency"] + stats["error_rate"] * ERROR_PENALTY
+
+    def ranked(self, gateways):
+        """ Gateways ordered healthiest first, config order breaking ties """
+        return sorted(gateways, key=self.score)
+
+    def snapshot(self):
+        with self._lock:
+            return {gw: dict(stats) for gw, stats in self._stats.items()}
+
+
+class IPFSResolver:
+    """ Fetch IPFS content by racing hedged requests across gateways """
+
+    def __init__(
+        self,
+        fetcher,
+        gateways=None,
+        hedge_delay=0.5,
+        max_workers=16,
+    ):
+        self.fetcher = fetcher
+        self.gateways = [
+            gw.rstrip("/") for gw in (gateways or DEFAULT_GATEWAYS)
+        ]
+        self.hedge_delay = hedge_delay
+        self.stats = GatewayStats()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _fetch(self, gateway, ipfs_path):
+        start = time.monotonic()
+        try:
+            status_code, content = self.fetcher.fetch_json(
+                "{}/ipfs/{}".format(gateway, ipfs_path)
+            )
+        except Exception:
+            self.stats.record(gateway, time.monotonic() - start, True)
+            raise
+        self.stats.record(
+            gateway,
+            time.monotonic() - start,
+            status_code not in DEFINITIVE_STATUS_CODES,
+        )
+        return status_code, content
+
+    def fetch_json(self, ipfs_path):
+        """
+        Fetch JSON for "<cid>/<path>", returning (status_code, content).
+
+        The healthiest gateway is asked first.  Every hedge_delay seconds
+        without an answer, or as soon as a request fails, the next gateway
+        joins the race.  The first definitive answer wins and the losers are
+        left to finish in the background, still feeding the stats.
+        """
+        gateways = self.stats.ranked(self.gateways)
+        pending = set()
+        result = (504, None)
+        last_error = None
+
+        while gateways or pending:
+            if gateways:
+                pending.add(
+                    metrics.submit(
+                        self.executor, self._fetch, gateways.pop(0), ipfs_path
+                    )
+                )
+
+            done, pending = wait(
+                pending,
+                timeout=self.hedge_delay if gateways else None,
+                return_when=FIRST_COMPLETED,
+            )
+
+            for future in done:
+                try:
+                    status_code, content = future.result()
+                except Exception as err:
+                    last_error = err
+                    continue
+                if status_code in DEFINITIVE_STATUS_CODES:
+                    return status_code, content
+                result = (status_code, content)
+
+        if last_error is not None and result[0] == 504:
+            raise last_error
+
+        return result
@@ -1,41 +1,238 @@
 import os
 import json
+import base64
 import logging
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cache import (
+    FRESH,
+    STALE,
+    MemoryCache,
+    MetadataCache,
+    SQLiteBackend,
+    normalize_uri,
+)
+from datauri import decode_data_uri, is_data_uri
+from fetch import Fetcher, FetchResult, InvalidJSON
+from ipfs import IPFSResolver, parse_ipfs_path
+from singleflight import SingleFlight
+import metrics
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
+def build_cache():
+    """ Build the metadata cache from environment config """
+    db_path = os.environ.get("JSON_PROXY_CACHE_DB")
+    return MetadataCache(
+        memory=MemoryCache(int(os.environ.get("JSON_PROXY_CACHE_SIZE", 1024))),
+        durable=SQLiteBackend(db_path) if db_path else None,
+        ttl=int(os.environ.get("JSON_PROXY_CACHE_TTL", 86400)),
+        negative_ttl=int(os.environ.get("JSON_PROXY_NEGATIVE_TTL", 300)),
+        lock_ttl=int(os.environ.get("JSON_PROXY_LOCK_TTL", 15)),
+        stale_grace=int(os.environ.get("JSON_PROXY_STALE_GRACE", 3600)),
+    )
+
+
+# Module scoped so they survive between warm invocations
+CACHE = build_cache()
+FETCHER = Fetcher.from_env()
+FLIGHTS = SingleFlight()
+IPFS = IPFSResolver(
+    FETCHER,
+    gateways=[
+        gw.strip()
+        for gw in os.environ.get("JSON_PROXY_IPFS_GATEWAYS", "").split(",")
+        if gw.strip()
+    ],
+    hedge_delay=float(os.environ.get("JSON_PROXY_IPFS_HEDGE_DELAY", 0.5)),
+)
+BATCH_MAX = int(os.environ.get("JSON_PROXY_BATCH_MAX", 200))
+BATCH_WORKERS = int(os.environ.get("JSON_PROXY_BATCH_WORKERS", 10))
+EXECUTOR = ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+# Kept apart from EXECUTOR so batch workers never wait on queued refreshes
+REVALIDATOR = ThreadPoolExecutor(max_workers=2)
+# Keys with a background revalidation queued or running
+REVALIDATING = set()
+REVALIDATING_LOCK = threading.Lock()
+
+
+def revalidate(key, fill):
+    """ Refresh a stale key in the background, once at a time per key """
+    with REVALIDATING_LOCK:
+        if key in REVALIDATING:
+            return None
+        REVALIDATING.add(key)
+
+    def run():
+        try:
+            return fill()
+        finally:
+            with REVALIDATING_LOCK:
+                REVALIDATING.discard(key)
+
+    def done(future):
+        err = future.exception()
+        if err is not None:
+            logger.error("revalidating %s failed: %r", key, err)
+
+    future = metrics.submit(REVALIDATOR, run)
+    future.add_done_callback(done)
+    return future
+
+
+def resolve(uri):
+    """ Resolve a single URI to (status_code, content), using the cache """
+    # On-chain metadata is cheaper to decode than to look up
+    if is_data_uri(uri):
+        metrics.record_cache("data")
+        return decode_data_uri(uri, FETCHER.max_bytes)
+
+    ipfs_path = parse_ipfs_path(uri)
+    # IPFS content is the same through any gateway so cache it by CID
+    cache_key = "ipfs://{}".format(ipfs_path) if ipfs_path else uri
+
+    with metrics.timed("cache"):
+        entry, freshness = CACHE.lookup(cache_key)
+    # fresh, stale, expired (has validators to revalidate with) or miss
+    metrics.record_cache(freshness or "miss")
+
+    if freshness == FRESH:
+        logger.debug("cache hit %s", cache_key)
+        return entry.status_code, entry.body
+
+    def fetch():
+        logger.debug("fetching %s...", cache_key)
+        if ipfs_path:
+            result = FetchResult(*IPFS.fetch_json(ipfs_path))
+        elif entry is not None:
+            result = FETCHER.fetch(uri, entry.etag, entry.last_modified)
+        else:
+            result = FETCHER.fetch(uri)
+        logger.debug("%s returned %s", cache_key, result.status_code)
+        return result
+
+    # Concurrent requests for the same content share one upstream fetch
+    def fill():
+        return FLIGHTS.do(
+            normalize_uri(cache_key),
+            lambda: CACHE.fill(cache_key, fetch, stale=entry),
+        )
+
+    if freshness == STALE:
+        logger.debug("stale hit %s", cache_key)
+        revalidate(normalize_uri(cache_key), fill)
+        return entry.status_code, entry.body
+
+    return fill()
+
+
+def resolve_result(uri):
+    """ Resolve a URI into its response envelope, never raising """
+    try:
+        status_code, content = resolve(uri)
+        metrics.record_status(status_code)
+        return {"statusCode": status_code, "body": content, "uri": uri}
+    except InvalidJSON as err:
+        metrics.record_status(err.status_code)
+        return {"statusCode": err.status_code, "reason": err.reason, "uri": uri}
+    except Exception as err:
+        logger.error("%s: %s", uri, err)
+        metrics.record_status(500)
+        return {"statusCode": 500, "reason": str(err), "uri": uri}
+
+
+def get_batch_uris(event):
+    """
+    Get the URIs of a batch request from a POST body or repeated params.
+    Raises ValueError with a reason for the client if the body is invalid.
+    """
+    body = event.get("body")
+    if body:
+        try:
+            if event.get("isBase64Encoded"):
+                body = base64.b64decode(body).decode("utf-8")
+            payload = json.loads(body)
+        except ValueError:
+            raise ValueError("Body is not valid JSON")
+
+        uris = payload.get("uris", []) if isinstance(payload, dict) else None
+        if not isinstance(uris, list) or not all(
+            isinstance(uri, str) for uri in uris
+        ):
+            raise ValueError('Body must be {"uris": [<uri>, ...]}')
+        return uris
+
+    multi_params = event.get("multiValueQueryStringParameters") or {}
+    uris = multi_params.get("uri") or []
+    return uris if len(uris) > 1 else None
+
+
+def batch_response(uris):
+    """ Resolve many URIs concurrently into a per-URI result map """
+    if len(uris) > BATCH_MAX:
+        return {
+            "statusCode": 413,
+            "body": json.dumps(
+                {"reason": "Batch limited to {} URIs".format(BATCH_MAX)}
+            ),
+        }
+
+    # De-dupe while keeping order so each URI is only fetched once
+    unique_uris = list(dict.fromkeys(u for u in uris if u))
+    metrics.incr("uris", len(unique_uris))
+    futures = [
+        metrics.submit(EXECUTOR, resolve_result, uri) for uri in unique_uris
+    ]
+    results = {uri: f.result() for uri, f in zip(unique_uris, futures)}
+
+    with metrics.timed("serialize"):
+        body = json.dumps({"results": results})
+
+    return {"statusCode": 200, "body": body}
+
+
 def lambda_handler(event, context):
-    logger.info("lambda_handler reached")
+    metrics.start_invocation()
+    uri = ""
     try:
         content = None
         status_code = 419
-        logger.info("event: {}".format(event.keys()))
+
+        try:
+            batch_uris = get_batch_uris(event)
+        except ValueError as err:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"reason": str(err)}),
+            }
+        if batch_uris is not None:
+            return batch_response(batch_uris)
+
         params = event.get("queryStringParameters", {})
         uri = params.get("uri", "") if params else ""
 
+        reason = None
         if uri:
-            logger.info("fetching {}...".format(uri))
-            res = requests.get(uri, {"Accept": "application/json"})
-            status_code = res.status_code
-            logger.info("returned {}".format(status_code))
-            if status_code == 200:
-                content = res.json()
+            metrics.incr("uris")
+            try:
+                status_code, content = resolve(uri)
+            except InvalidJSON as err:
+                status_code, reason = err.status_code, err.reason
+            metrics.record_status(status_code)
 
-        return {
-            "statusCode": 200,
-            "body": json.dumps(
-                {
-                    "statusCode": status_code,
-                    "body": content,
-                    "uri": uri,
-                }
-            ),
-        }
+        result = {"statusCode": status_code, "body": content, "uri": uri}
+        if reason:
+            result["reason"] = reason
+
+        with metrics.timed("serialize"):
+            body = json.dumps(result)
+
+        return {"statusCode": 200, "body": body}
     except Exception as err:
         logger.error(str(err))
+        metrics.record_status(500)
         return {
             "statusCode": 500,
             "body": json.dumps(
@@ -45,6 +242,8 @@ def lambda_handler(event, context):
                 }
             ),
         }
+    finally:
+        metrics.finish_invocation()
 
 
 if __name__ == "__main__":
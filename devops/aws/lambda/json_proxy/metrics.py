@@ -0,0 +1,160 @@
+""" Per-invocation metrics for the JSON proxy """
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger()
+
+# The invocation being measured.  Worker threads only see it when their
+# work is submitted with submit(), so background work is counted against the
+# invocation that started it, never whichever happens to be running now.
+# Work still running when that invocation is logged is logged on its own.
+_current = contextvars.ContextVar("json_proxy_invocation", default=None)
+_lock = threading.Lock()
+_cold_start = True
+
+
+class InvocationMetrics:
+    """ Everything measured during one invocation """
+
+    def __init__(self, cold_start, parent=None):
+        self.cold_start = cold_start
+        self.parent = parent
+        self.finished = False
+        self.start = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.counters = Counter()
+        self.cache = Counter()
+        self.status_codes = Counter()
+        self.hosts = set()
+
+    def record(self, **fields):
+        """ The metrics as one flat, JSON serializable dict """
+        record = {
+            "cold_start": self.cold_start,
+            "duration_ms": round((time.perf_counter() - self.start) * 1e3, 3),
+            "phases_ms": {
+                name: round(secs * 1e3, 3) for name, secs in self.phases.items()
+            },
+            "cache": dict(self.cache),
+            "status_codes": {
+                str(code): n for code, n in self.status_codes.items()
+            },
+            "hosts": sorted(self.hosts),
+        }
+        record.update(self.counters)
+        record.update(fields)
+        return record
+
+    def merge(self, other):
+        """ Add another's metrics, but not its duration, to these """
+        for name, secs in other.phases.items():
+            self.phases[name] += secs
+        self.counters.update(other.counters)
+        self.cache.update(other.cache)
+        self.status_codes.update(other.status_codes)
+        self.hosts.update(other.hosts)
+
+
+def start_invocation():
+    """ Start measuring a new invocation in the current context """
+    global _cold_start
+    with _lock:
+        metrics = InvocationMetrics(_cold_start)
+        _cold_start = False
+    _current.set(metrics)
+    return metrics
+
+
+def finish_invocation(**fields):
+    """ Emit the current invocation's metrics as a single JSON log line """
+    metrics = _current.get()
+    _current.set(None)
+    if metrics is not None:
+        with _lock:
+            metrics.finished = True
+            record = metrics.record(**fields)
+        logger.info(json.dumps(record, separators=(",", ":")))
+
+
+def _finish_task(task):
+    """ Merge a submitted task's metrics upwards, or log them if too late """
+    with _lock:
+        task.finished = True
+        target = task.parent
+        while target is not None and target.finished:
+            target = target.parent
+        if target is not None:
+            target.merge(task)
+            return
+        record = task.record(background=True)
+    logger.info(json.dumps(record, separators=(",", ":")))
+
+
+def submit(executor, fn, *args):
+    """
+    executor.submit() that records into the caller's invocation, or into a
+    line of its own if it finishes after the invocation has been logged
+    """
+    parent = _current.get()
+    if parent is None:
+        return executor.submit(contextvars.copy_context().run, fn, *args)
+
+    def run():
+        task = InvocationMetrics(False, parent)
+        _current.set(task)
+        try:
+            return fn(*args)
+        finally:
+            _finish_task(task)
+
+    return executor.submit(contextvars.copy_context().run, run)
+
+
+def record_phase(name, seconds):
+    metrics = _current.get()
+    if metrics is not None:
+        with _lock:
+            metrics.phases[name] += seconds
+
+
+def incr(name, value=1):
+    metrics = _current.get()
+    if metrics is not None:
+        with _lock:
+            metrics.counters[name] += value
+
+
+def record_cache(outcome):
+    metrics = _current.get()
+    if metrics is not None:
+        with _lock:
+            metrics.cache[outcome] += 1
+
+
+def record_status(status_code):
+    metrics = _current.get()
+    if metrics is not None:
+        with _lock:
+            metrics.status_codes[status_code] += 1
+
+
+def record_host(host):
+    metrics = _current.get()
+    if metrics is not None and host:
+        with _lock:
+            metrics.hosts.add(host)
+
+
+@contextmanager
+def timed(name):
+    """ Add the time spent in the block to a phase """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - start)
@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The proxy's modules are imported flat, as they are from the zip root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Upstream(ThreadingHTTPServer):
+    """
+    Local metadata server.  Paths are routed to (status, headers, body)
+    tuples, or callables taking the request handler and returning one.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), UpstreamHandler)
+        self.routes = {}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def url(self, path):
+        return "http://127.0.0.1:{}{}".format(self.server_address[1], path)
+
+    def json(self, path, content, **headers):
+        headers.setdefault("Content-Type", "application/json")
+        self.routes[path] = (200, headers, json.dumps(content).encode("utf-8"))
+
+    def hits(self, path):
+        with self._lock:
+            return sum(1 for p, _ in self.requests if p == path)
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server._lock:
+            server.requests.append((self.path, dict(self.headers)))
+
+        route = server.routes.get(self.path, (404, {}, b""))
+        status, headers, body = route(self) if callable(route) else route
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        # Without a length the body runs until the connection closes
+        if headers.get("Connection") == "close":
+            self.close_connection = True
+        else:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = Upstream()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
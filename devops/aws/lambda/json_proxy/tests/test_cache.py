@@ -0,0 +1,232 @@
+import time
+import sqlite3
+
+import pytest
+
+from cache import (
+    EXPIRED,
+    FRESH,
+    STALE,
+    CacheEntry,
+    MemoryCache,
+    MetadataCache,
+    SQLiteBackend,
+    normalize_uri,
+)
+from fetch import STATUS_NOT_JSON, STATUS_TOO_LARGE, Fetcher, FetchResult
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteBackend(str(tmp_path.joinpath("cache.sqlite3")))
+
+
+def test_normalize_uri():
+    assert (
+        normalize_uri(" HTTPS://Example.com:443/a?b=1#frag ")
+        == "https://example.com/a?b=1"
+    )
+    assert normalize_uri("http://example.com:80") == "http://example.com/"
+    # CIDs are case sensitive
+    assert normalize_uri("ipfs://QmFoo/Bar") == "ipfs://QmFoo/Bar"
+
+
+def test_memory_cache_evicts_least_recently_used():
+    memory = MemoryCache(max_entries=2)
+    memory.set("a", 1)
+    memory.set("b", 2)
+
+    # Reading "a" makes "b" the least recently used
+    assert memory.get("a") == 1
+    memory.set("c", 3)
+
+    assert len(memory) == 2
+    assert memory.get("b") is None
+    assert memory.get("a") == 1
+    assert memory.get("c") == 3
+
+
+def test_ttl_by_status():
+    cache = MetadataCache(ttl=100, negative_ttl=5, stale_grace=10)
+
+    assert cache.ttl_for(200) == 100
+    for status_code in (404, 410, STATUS_TOO_LARGE, STATUS_NOT_JSON):
+        assert cache.ttl_for(status_code) == 5
+    assert cache.ttl_for(500) is None
+
+    # Errors are not cached at all
+    assert cache.set("https://example.com/1", 500, None) is None
+    assert cache.lookup("https://example.com/1") == (None, None)
+
+    entry = cache.set("https://example.com/2", 200, {"name": "two"})
+    now = time.time()
+    assert entry.expires_at == pytest.approx(now + 100, abs=5)
+    assert cache.freshness(entry, now) == FRESH
+    assert cache.freshness(entry, entry.expires_at + 1) == STALE
+    assert cache.freshness(entry, entry.expires_at + 11) == EXPIRED
+
+    negative = cache.set("https://example.com/3", 404, None)
+    assert negative.expires_at == pytest.approx(now + 5, abs=5)
+
+
+def test_lookup_freshness():
+    cache = MetadataCache(ttl=100, stale_grace=10)
+    uri = "https://example.com/1"
+
+    cache.set(uri, 200, {"name": "one"})
+    entry, freshness = cache.lookup(uri)
+    assert entry.body == {"name": "one"}
+    assert freshness == FRESH
+
+    cache.memory.set(
+        normalize_uri(uri), entry._replace(expires_at=time.time() - 1)
+    )
+    assert cache.lookup(uri)[1] == STALE
+    assert cache.stats["stale_hits"] == 1
+
+    # Past the grace period, entries without validators are dropped
+    cache.memory.set(
+        normalize_uri(uri), entry._replace(expires_at=time.time() - 11)
+    )
+    assert cache.lookup(uri) == (None, None)
+    assert cache.memory.get(normalize_uri(uri)) is None
+    assert cache.stats["expired"] == 1
+
+
+def test_sqlite_backend(backend):
+    entry = CacheEntry(200, {"name": "one"}, time.time() + 60, '"v1"', None)
+    backend.set("a", entry)
+    backend.set("b", CacheEntry(404, None, time.time() + 60))
+
+    # Another process opening the same file sees the same entries
+    other = SQLiteBackend(backend.path)
+    assert other.get("a") == entry
+    assert other.get("b").body is None
+    assert other.get("missing") is None
+
+    other.delete("a")
+    assert backend.get("a") is None
+
+
+def test_sqlite_backend_migrates_old_files(tmp_path):
+    path = str(tmp_path.joinpath("old.sqlite3"))
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE metadata (key TEXT PRIMARY KEY,"
+        " status_code INTEGER NOT NULL, body TEXT, expires_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO metadata VALUES ('a', 200, '{}', ?)", (time.time() + 60,)
+    )
+    conn.commit()
+    conn.close()
+
+    backend = SQLiteBackend(path)
+    assert backend.get("a").etag is None
+    backend.set("b", CacheEntry(200, {}, time.time() + 60, '"v1"'))
+    assert backend.get("b").etag == '"v1"'
+
+
+def test_sqlite_backend_fill_locks(backend):
+    assert backend.acquire("a", 60)
+    assert not SQLiteBackend(backend.path).acquire("a", 60)
+    assert backend.acquire("b", 60)
+
+    backend.release("a")
+    assert backend.acquire("a", 60)
+
+    # A lock left behind by a dead process lapses
+    assert backend.acquire("c", 0)
+    assert backend.acquire("c", 60)
+
+
+def test_durable_tier_promotes_to_memory(backend):
+    uri = "https://example.com/1"
+    MetadataCache(durable=backend).set(uri, 200, {"name": "one"})
+
+    # A cold container only has the durable tier
+    cache = MetadataCache(durable=backend)
+    entry, freshness = cache.lookup(uri)
+    assert entry.body == {"name": "one"}
+    assert freshness == FRESH
+    assert cache.stats["durable_hits"] == 1
+
+    cache.lookup(uri)
+    assert cache.stats["memory_hits"] == 1
+
+
+@pytest.mark.parametrize("durable", [False, True])
+def test_negative_caching(upstream, backend, durable):
+    """ Test 404s are cached for the negative TTL, errors not at all """
+    cache = MetadataCache(durable=backend if durable else None)
+    fetcher = Fetcher()
+    upstream.routes["/error"] = (500, {}, b"")
+
+    def resolve(path):
+        uri = upstream.url(path)
+        entry, _ = cache.lookup(uri)
+        if entry is not None:
+            return entry.status_code, entry.body
+        return cache.fill(uri, lambda: fetcher.fetch(uri))
+
+    for _ in range(3):
+        assert resolve("/missing") == (404, None)
+        assert resolve("/error") == (500, None)
+
+    assert upstream.hits("/missing") == 1
+    assert upstream.hits("/error") == 3
+    assert cache.stats["negative_hits"] == 2
+
+    entry, _ = cache.lookup(upstream.url("/missing"))
+    assert entry.expires_at <= time.time() + cache.negative_ttl
+
+
+def test_too_large(upstream):
+    fetcher = Fetcher(max_bytes=100)
+    upstream.json("/small", {"name": "x" * 10})
+    upstream.json("/large", {"name": "x" * 200})
+    # No Content-Length, so the limit is only found while streaming
+    upstream.routes["/stream"] = (
+        200,
+        {"Content-Type": "application/json", "Connection": "close"},
+        b'{"name": "' + b"x" * 200 + b'"}',
+    )
+
+    assert fetcher.fetch(upstream.url("/small")).status_code == 200
+    assert fetcher.fetch(upstream.url("/large")) == FetchResult(
+        STATUS_TOO_LARGE, None
+    )
+    assert fetcher.fetch(upstream.url("/stream")) == FetchResult(
+        STATUS_TOO_LARGE, None
+    )
+
+
+def test_not_json(upstream):
+    fetcher = Fetcher()
+    upstream.routes["/image"] = (200, {"Content-Type": "image/png"}, b"\x89PNG")
+    upstream.routes["/text"] = (200, {"Content-Type": "text/plain"}, b"{}")
+
+    assert fetcher.fetch(upstream.url("/image")) == FetchResult(
+        STATUS_NOT_JSON, None
+    )
+    assert fetcher.fetch(upstream.url("/text")) == FetchResult(200, {})
+
+
+@pytest.mark.parametrize(
+    "path, status_code",
+    [("/large", STATUS_TOO_LARGE), ("/image", STATUS_NOT_JSON)],
+)
+def test_refusals_are_cached(upstream, path, status_code):
+    """ Test oversized and non-JSON responses are negatively cached """
+    cache = MetadataCache(negative_ttl=300)
+    fetcher = Fetcher(max_bytes=100)
+    upstream.json("/large", {"name": "x" * 200})
+    upstream.routes["/image"] = (200, {"Content-Type": "image/png"}, b"\x89PNG")
+
+    uri = upstream.url(path)
+    assert cache.fill(uri, lambda: fetcher.fetch(uri)) == (status_code, None)
+
+    entry, freshness = cache.lookup(uri)
+    assert (entry.status_code, freshness) == (status_code, FRESH)
+    assert cache.stats["negative_hits"] == 1
+    assert upstream.hits(path) == 1
@@ -0,0 +1,95 @@
+import json
+import base64
+from urllib.parse import quote
+
+import pytest
+
+import lambda_function
+from cache import MetadataCache
+from datauri import decode_data_uri
+from fetch import STATUS_NOT_JSON, STATUS_TOO_LARGE, Fetcher
+
+CONTENT = {"name": "one", "description": "A token, with punctuation?"}
+ENCODED = base64.b64encode(json.dumps(CONTENT).encode("utf-8")).decode()
+
+
+@pytest.fixture
+def proxy(monkeypatch):
+    """ lambda_function whose fetcher fails any upstream request """
+    fetcher = Fetcher(max_bytes=100)
+
+    def fetch(*args, **kwargs):
+        raise AssertionError("data: URIs must not be fetched")
+
+    monkeypatch.setattr(fetcher, "fetch", fetch)
+    monkeypatch.setattr(lambda_function, "FETCHER", fetcher)
+    monkeypatch.setattr(lambda_function, "CACHE", MetadataCache())
+    return lambda_function
+
+
+@pytest.mark.parametrize(
+    "uri",
+    [
+        "data:application/json;base64," + ENCODED,
+        "data:application/json;base64," + ENCODED.rstrip("="),
+        "data:application/json;charset=utf-8;base64," + quote(ENCODED),
+        "data:application/json," + quote(json.dumps(CONTENT)),
+        "data:application/json;charset=utf-8," + json.dumps(CONTENT),
+        "DATA:Application/JSON," + quote(json.dumps(CONTENT)),
+    ],
+)
+def test_served_without_upstream(proxy, uri):
+    response = proxy.lambda_handler(
+        {"queryStringParameters": {"uri": uri}}, None
+    )
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"]) == {
+        "statusCode": 200,
+        "body": CONTENT,
+        "uri": uri,
+    }
+    # Decoded each time, never cached
+    assert proxy.CACHE.lookup(uri) == (None, None)
+
+
+def test_unpadded_base64():
+    for content in ({}, {"a": 1}, {"ab": 1}, {"abc": 1}):
+        encoded = base64.b64encode(json.dumps(content).encode("utf-8"))
+        uri = "data:application/json;base64," + encoded.decode().rstrip("=")
+
+        assert decode_data_uri(uri) == (200, content)
+
+
+@pytest.mark.parametrize(
+    "uri, status_code",
+    [
+        ("data:application/json;base64,e30=!", 400),
+        # No length of base64 leaves exactly one character over
+        ("data:application/json;base64,e30=e", 400),
+        ("data:application/json", 400),
+        ("data:image/png;base64,iVBORw0KGgo=", STATUS_NOT_JSON),
+    ],
+)
+def test_refused(uri, status_code):
+    assert decode_data_uri(uri) == (status_code, None)
+
+
+@pytest.mark.parametrize(
+    "uri",
+    [
+        "data:application/json," + quote(json.dumps({"name": "x" * 200})),
+        "data:application/json;base64,"
+        + base64.b64encode(json.dumps({"name": "x" * 200}).encode()).decode(),
+        # Small enough encoded, too large once decoded
+        "data:application/json," + "%20" * 99 + "{}",
+    ],
+)
+def test_too_large(proxy, uri):
+    """ Test data: URIs are held to JSON_PROXY_MAX_BYTES like responses """
+    assert decode_data_uri(uri, max_bytes=100) == (STATUS_TOO_LARGE, None)
+
+    response = proxy.lambda_handler(
+        {"queryStringParameters": {"uri": uri}}, None
+    )
+    assert json.loads(response["body"])["statusCode"] == STATUS_TOO_LARGE
@@ -0,0 +1,85 @@
+import time
+import threading
+
+import pytest
+import requests
+
+from fetch import Fetcher, FetchResult, build_session, parse_host_pools
+
+
+def flaky(failures):
+    """ A route that is unavailable for its first failures requests """
+    lock = threading.Lock()
+    calls = []
+
+    def route(handler):
+        with lock:
+            calls.append(1)
+            if len(calls) <= failures:
+                return 503, {"Retry-After": "120"}, b""
+        return 200, {"Content-Type": "application/json"}, b'{"name": "one"}'
+
+    return route
+
+
+def test_503_is_retried(upstream):
+    upstream.routes["/token/1"] = flaky(1)
+    fetcher = Fetcher(session=build_session(backoff=0))
+
+    start = time.monotonic()
+    assert fetcher.fetch(upstream.url("/token/1")) == FetchResult(
+        200, {"name": "one"}
+    )
+    # Retry-After is ignored, it would outlast the invocation
+    assert time.monotonic() - start < 5
+    assert upstream.hits("/token/1") == 2
+
+
+def test_503_retries_run_out(upstream):
+    """ Test the last 503 is returned, not raised, once retries run out """
+    upstream.routes["/token/1"] = flaky(3)
+    fetcher = Fetcher(session=build_session(backoff=0, status_retries=1))
+
+    assert fetcher.fetch(upstream.url("/token/1")) == FetchResult(503, None)
+    assert upstream.hits("/token/1") == 2
+
+
+@pytest.mark.parametrize("status_code", [500, 502, 504])
+def test_other_errors_are_not_retried(upstream, status_code):
+    upstream.routes["/token/1"] = (status_code, {}, b"")
+
+    result = Fetcher().fetch(upstream.url("/token/1"))
+
+    assert result == FetchResult(status_code, None)
+    assert upstream.hits("/token/1") == 1
+
+
+def test_read_timeout_is_not_retried(upstream):
+    def slow(handler):
+        time.sleep(1)
+        return 200, {"Content-Type": "application/json"}, b"{}"
+
+    upstream.routes["/token/1"] = slow
+    fetcher = Fetcher(read_timeout=0.2)
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        fetcher.fetch(upstream.url("/token/1"))
+    assert upstream.hits("/token/1") == 1
+
+
+def test_host_pools():
+    session = build_session(
+        host_pools=parse_host_pools("ipfs.io=32, localhost:8080=4")
+    )
+    default = session.get_adapter("https://example.com/")
+    ipfs = session.get_adapter("https://ipfs.io/ipfs/Qm")
+    local = session.get_adapter("http://localhost:8080/token/1")
+
+    assert ipfs is not default and local is not default
+    assert ipfs._pool_maxsize == 32
+    assert local._pool_maxsize == 4
+    # Default ports match the plain host, other ports need their own entry
+    assert session.get_adapter("https://ipfs.io:443/ipfs/Qm") is ipfs
+    assert session.get_adapter("http://ipfs.io/ipfs/Qm") is ipfs
+    assert session.get_adapter("https://ipfs.io:8443/ipfs/Qm") is default
+    assert session.get_adapter("http://localhost/token/1") is default
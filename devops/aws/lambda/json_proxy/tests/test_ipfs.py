@@ -0,0 +1,131 @@
+import time
+
+import pytest
+
+from fetch import Fetcher
+from ipfs import GatewayStats, IPFSResolver, parse_ipfs_path
+
+CID_V0 = "QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG"
+CID_V1 = "bafybeigdyrzt5sfp7udm7hu76uh7y26nf3efuylqabf3oclgtqy55fbzdi"
+BODY = b'{"name": "one"}'
+
+
+@pytest.mark.parametrize(
+    "uri, expected",
+    [
+        ("ipfs://{}".format(CID_V0), CID_V0),
+        ("ipfs://{}/1.json".format(CID_V0), CID_V0 + "/1.json"),
+        ("ipfs://ipfs/{}/1.json".format(CID_V0), CID_V0 + "/1.json"),
+        ("https://ipfs.io/ipfs/{}/1.json".format(CID_V0), CID_V0 + "/1.json"),
+        ("http://127.0.0.1:8080/ipfs/{}".format(CID_V1), CID_V1),
+        ("https://{}.ipfs.dweb.link/1.json".format(CID_V1), CID_V1 + "/1.json"),
+        ("https://{}.ipfs.dweb.link/".format(CID_V1), CID_V1),
+        ("ipfs://not-a-cid/1.json", None),
+        ("https://ipfs.io/ipfs/not-a-cid", None),
+        ("https://example.com/token/1", None),
+        ("https://www.ipfs.io/", None),
+        ("ar://{}".format(CID_V0), None),
+    ],
+)
+def test_parse_ipfs_path(uri, expected):
+    assert parse_ipfs_path(uri) == expected
+
+
+def gateway(upstream, name, route):
+    """ A gateway rooted at /<name> on the upstream server """
+    upstream.routes["/{}/ipfs/{}".format(name, CID_V0)] = route
+    return upstream.url("/{}".format(name))
+
+
+def json_route(handler):
+    return 200, {"Content-Type": "application/json"}, BODY
+
+
+def test_slow_gateway_loses_to_hedge(upstream):
+    """ Test a gateway that hasn't answered is raced after the hedge delay """
+
+    def slow(handler):
+        time.sleep(1)
+        return json_route(handler)
+
+    resolver = IPFSResolver(
+        Fetcher(),
+        gateways=[
+            gateway(upstream, "slow", slow),
+            gateway(upstream, "fast", json_route),
+        ],
+        hedge_delay=0.05,
+    )
+
+    start = time.monotonic()
+    assert resolver.fetch_json(CID_V0) == (200, {"name": "one"})
+    assert time.monotonic() - start < 0.5
+
+    # The loser still finishes and is recorded, just not waited for
+    resolver.executor.shutdown(wait=True)
+    stats = resolver.stats.snapshot()
+    assert stats[resolver.gateways[0]]["requests"] == 1
+    assert stats[resolver.gateways[0]]["latency"] >= 1
+
+
+@pytest.mark.parametrize("failure", ["error", "unreachable"])
+def test_failing_gateway_falls_over(upstream, failure):
+    """ Test a failure races the next gateway without waiting to hedge """
+    if failure == "error":
+        down = gateway(upstream, "down", (502, {}, b""))
+    else:
+        # Nothing listens on the discard port
+        down = "http://127.0.0.1:9"
+    up = gateway(upstream, "up", json_route)
+    resolver = IPFSResolver(
+        Fetcher(connect_timeout=1), gateways=[down, up], hedge_delay=10
+    )
+
+    start = time.monotonic()
+    assert resolver.fetch_json(CID_V0) == (200, {"name": "one"})
+    assert time.monotonic() - start < 5
+
+    # Until it recovers, the failing gateway is asked last
+    assert resolver.stats.ranked([down, up]) == [up, down]
+    assert resolver.stats.snapshot()[down]["errors"] == 1
+
+
+def test_every_gateway_failing(upstream):
+    """ Test the last gateway status is returned when none is definitive """
+    resolver = IPFSResolver(
+        Fetcher(),
+        gateways=[
+            gateway(upstream, "a", (502, {}, b"")),
+            gateway(upstream, "b", (504, {}, b"")),
+        ],
+        hedge_delay=10,
+    )
+
+    status_code, content = resolver.fetch_json(CID_V0)
+
+    assert status_code in (502, 504)
+    assert content is None
+
+
+def test_gateway_ranking():
+    stats = GatewayStats()
+    gateways = ["https://a", "https://b", "https://c"]
+
+    # Unknown gateways tie, keeping their configured order
+    assert stats.ranked(gateways) == gateways
+
+    stats.record("https://a", 0.5, False)
+    stats.record("https://b", 0.1, False)
+    stats.record("https://c", 0.2, False)
+    assert stats.ranked(gateways) == ["https://b", "https://c", "https://a"]
+
+    # Fast but failing drops below slow but working
+    for _ in range(3):
+        stats.record("https://b", 0.1, True)
+    assert stats.ranked(gateways) == ["https://c", "https://a", "https://b"]
+
+    # And recovers as it succeeds again
+    for _ in range(20):
+        stats.record("https://b", 0.1, False)
+    assert stats.ranked(gateways)[0] == "https://b"
+    assert stats.snapshot()["https://b"]["errors"] == 3
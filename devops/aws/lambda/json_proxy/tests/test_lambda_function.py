@@ -0,0 +1,116 @@
+import json
+import base64
+
+import pytest
+
+import lambda_function
+from cache import MetadataCache
+
+
+@pytest.fixture
+def proxy(monkeypatch):
+    monkeypatch.setattr(lambda_function, "CACHE", MetadataCache())
+    return lambda_function
+
+
+def invoke(proxy, event):
+    response = proxy.lambda_handler(event, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_single_uri(upstream, proxy):
+    upstream.json("/token/1", {"name": "one"})
+    uri = upstream.url("/token/1")
+
+    assert invoke(proxy, {"queryStringParameters": {"uri": uri}}) == (
+        200,
+        {"statusCode": 200, "body": {"name": "one"}, "uri": uri},
+    )
+
+
+def test_batch_post(upstream, proxy):
+    upstream.json("/token/1", {"name": "one"})
+    uris = [upstream.url("/token/1"), upstream.url("/token/2")]
+    body = json.dumps({"uris": uris + uris[:1]})
+
+    for event in (
+        {"body": body},
+        {
+            "body": base64.b64encode(body.encode("utf-8")).decode("ascii"),
+            "isBase64Encoded": True,
+        },
+    ):
+        status_code, response = invoke(proxy, event)
+        assert status_code == 200
+        assert list(response["results"]) == uris
+        assert response["results"][uris[0]]["body"] == {"name": "one"}
+        assert response["results"][uris[1]]["statusCode"] == 404
+
+
+@pytest.mark.parametrize(
+    "event",
+    [
+        {"body": "{not json"},
+        {"body": "bm90IGpzb24=", "isBase64Encoded": True},
+        {"body": "not base64!", "isBase64Encoded": True},
+        {"body": '["https://example.com/1"]'},
+        {"body": '{"uris": "https://example.com/1"}'},
+        {"body": '{"uris": {"a": "https://example.com/1"}}'},
+        {"body": '{"uris": ["https://example.com/1", 2]}'},
+    ],
+)
+def test_bad_batch_body(proxy, event):
+    """ Test malformed batch bodies are the client's error, not ours """
+    status_code, response = invoke(proxy, event)
+
+    assert status_code == 400
+    assert "reason" in response
+
+
+def test_invalid_upstream_json(upstream, proxy):
+    """ Test a body that doesn't parse is a 502 with a fixed reason """
+    upstream.routes["/token/1"] = (
+        200,
+        {"Content-Type": "application/json"},
+        b"<html>Bad Gateway</html>",
+    )
+    uri = upstream.url("/token/1")
+
+    assert invoke(proxy, {"queryStringParameters": {"uri": uri}}) == (
+        200,
+        {
+            "statusCode": 502,
+            "body": None,
+            "uri": uri,
+            "reason": "Upstream response is not valid JSON",
+        },
+    )
+
+    status_code, response = invoke(proxy, {"body": json.dumps({"uris": [uri]})})
+    assert status_code == 200
+    assert response["results"][uri] == {
+        "statusCode": 502,
+        "reason": "Upstream response is not valid JSON",
+        "uri": uri,
+    }
+
+    # Not cached, the next request tries again
+    assert upstream.hits("/token/1") == 2
+
+
+@pytest.mark.parametrize(
+    "uri",
+    [
+        "data:application/json,{not json",
+        "data:application/json;base64,bm90IGpzb24=",
+        "data:application/json,%FF%FE",
+    ],
+)
+def test_invalid_data_uri_json(proxy, uri):
+    status_code, response = invoke(
+        proxy, {"queryStringParameters": {"uri": uri}}
+    )
+
+    assert status_code == 200
+    assert response["statusCode"] == 422
+    assert response["reason"] == "data: URI content is not valid JSON"
@@ -0,0 +1,126 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from fetch import Fetcher
+
+
+def test_records_one_line_per_invocation(caplog):
+    with caplog.at_level(logging.INFO):
+        metrics.start_invocation()
+        metrics.incr("uris", 2)
+        metrics.record_status(200)
+        metrics.record_host("example.com")
+        with metrics.timed("cache"):
+            pass
+        metrics.finish_invocation()
+
+    (line,) = [r.getMessage() for r in caplog.records]
+    record = json.loads(line)
+    assert record["uris"] == 2
+    assert record["status_codes"] == {"200": 1}
+    assert record["hosts"] == ["example.com"]
+    assert "cache" in record["phases_ms"]
+
+    # Nothing is recorded between invocations
+    metrics.incr("uris")
+    assert metrics._current.get() is None
+
+
+def test_concurrent_invocations_are_separate():
+    """ Test concurrent handlers, like bench.py's, record their own metrics """
+    barrier = threading.Barrier(4)
+
+    def handler(n):
+        invocation = metrics.start_invocation()
+        barrier.wait(5)
+        metrics.incr("uris", n)
+        barrier.wait(5)
+        metrics.finish_invocation()
+        return invocation.counters["uris"]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(executor.map(handler, range(1, 5))) == [1, 2, 3, 4]
+
+
+def test_submitted_work_records_into_its_invocation(caplog):
+    """ Test worker threads record into the invocation that spawned them """
+    release = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    with caplog.at_level(logging.INFO):
+        first = metrics.start_invocation()
+        # Like a losing IPFS hedge or a background revalidation
+        background = metrics.submit(
+            executor,
+            lambda: release.wait(5) and metrics.incr("upstream_requests"),
+        )
+        metrics.submit(executor, metrics.incr, "uris").result()
+        metrics.finish_invocation()
+
+        second = metrics.start_invocation()
+        release.set()
+        background.result()
+        # Work submitted without the helper has no invocation at all
+        executor.submit(metrics.incr, "uris").result()
+        metrics.finish_invocation()
+        executor.shutdown()
+
+    assert first.counters == {"uris": 1}
+    assert second.counters == {}
+
+    # Finishing after its invocation was logged, it gets a line of its own
+    records = [json.loads(r.getMessage()) for r in caplog.records]
+    assert [r.get("background", False) for r in records] == [
+        False,
+        True,
+        False,
+    ]
+    assert records[0]["uris"] == 1
+    assert records[1]["upstream_requests"] == 1
+
+
+def test_nested_work_merges_into_a_running_ancestor():
+    """ Test work outliving the task that submitted it still reaches home """
+    release = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    def batch_worker():
+        metrics.incr("uris")
+        # Like an IPFS hedge that loses after the URI has resolved
+        return metrics.submit(
+            executor,
+            lambda: release.wait(5) and metrics.incr("upstream_requests"),
+        )
+
+    invocation = metrics.start_invocation()
+    hedge = metrics.submit(executor, batch_worker).result()
+    release.set()
+    hedge.result()
+    metrics.finish_invocation()
+    executor.shutdown()
+
+    assert invocation.counters == {"uris": 1, "upstream_requests": 1}
+
+
+def test_connection_setup_is_timed(upstream, monkeypatch):
+    """ Test new connections are timed once and kept-alive ones not at all """
+    upstream.json("/token/1", {"name": "one"})
+    phases = []
+
+    def record_phase(name, seconds):
+        if name in ("dns", "connect"):
+            phases.append((name, seconds))
+
+    monkeypatch.setattr(metrics, "record_phase", record_phase)
+    fetcher = Fetcher()
+    # A name to resolve, which may also resolve to an address not listened on
+    uri = upstream.url("/token/1").replace("127.0.0.1", "localhost")
+
+    for _ in range(3):
+        assert fetcher.fetch(uri).status_code == 200
+
+    assert [name for name, _ in phases] == ["dns", "connect"]
+    assert all(seconds > 0 for _, seconds in phases)
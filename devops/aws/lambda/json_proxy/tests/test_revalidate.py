@@ -0,0 +1,175 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import lambda_function
+from cache import EXPIRED, FRESH, STALE, MetadataCache, normalize_uri
+from fetch import Fetcher, FetchResult
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+BODY = b'{"name": "one"}'
+
+
+def conditional(handler):
+    """ 304 when the request's validators match, else the full body """
+    if handler.headers.get("If-None-Match") == ETAG or (
+        handler.headers.get("If-Modified-Since") == LAST_MODIFIED
+    ):
+        return 304, {}, b""
+    return (
+        200,
+        {
+            "Content-Type": "application/json",
+            "ETag": ETAG,
+            "Last-Modified": LAST_MODIFIED,
+        },
+        BODY,
+    )
+
+
+@pytest.fixture
+def proxy(monkeypatch):
+    """ lambda_function with an empty cache and its own revalidator """
+    monkeypatch.setattr(
+        lambda_function, "CACHE", MetadataCache(ttl=100, stale_grace=10)
+    )
+    monkeypatch.setattr(
+        lambda_function, "REVALIDATOR", ThreadPoolExecutor(max_workers=1)
+    )
+    return lambda_function
+
+
+def age(cache, uri, seconds):
+    """ Make the cached entry for uri expire seconds ago """
+    key = normalize_uri(uri)
+    entry = cache.memory.get(key)
+    cache.memory.set(key, entry._replace(expires_at=time.time() - seconds))
+
+
+def test_fetch_keeps_validators(upstream):
+    upstream.routes["/token"] = conditional
+
+    assert Fetcher().fetch(upstream.url("/token")) == FetchResult(
+        200, {"name": "one"}, ETAG, LAST_MODIFIED
+    )
+
+
+@pytest.mark.parametrize(
+    "etag, last_modified, header, value",
+    [
+        (ETAG, None, "If-None-Match", ETAG),
+        (None, LAST_MODIFIED, "If-Modified-Since", LAST_MODIFIED),
+    ],
+)
+def test_fetch_conditional(upstream, etag, last_modified, header, value):
+    """ Test each validator is sent and a 304 is passed through """
+    upstream.routes["/token"] = conditional
+
+    result = Fetcher().fetch(upstream.url("/token"), etag, last_modified)
+
+    assert result == FetchResult(304, None)
+    _, headers = upstream.requests[-1]
+    assert headers[header] == value
+
+
+@pytest.mark.parametrize(
+    "etag, last_modified", [(ETAG, None), (None, LAST_MODIFIED)]
+)
+def test_fill_renews_on_304(upstream, etag, last_modified):
+    """ Test a 304 renews the stale entry without replacing its body """
+    upstream.routes["/token"] = conditional
+    uri = upstream.url("/token")
+    cache = MetadataCache(ttl=100)
+    fetcher = Fetcher()
+
+    stale = cache.set(uri, 200, {"name": "one"}, etag, last_modified)
+    stale = stale._replace(expires_at=time.time() - 1)
+
+    result = cache.fill(
+        uri,
+        lambda: fetcher.fetch(uri, stale.etag, stale.last_modified),
+        stale=stale,
+    )
+
+    assert result == (200, {"name": "one"})
+
+    entry, freshness = cache.lookup(uri)
+    assert freshness == FRESH
+    assert entry.expires_at > time.time() + 90
+    assert (entry.etag, entry.last_modified) == (etag, last_modified)
+    assert cache.stats["revalidated"] == 1
+
+
+def test_fill_replaces_changed_content(upstream):
+    upstream.routes["/token"] = (
+        200,
+        {"Content-Type": "application/json", "ETag": '"v2"'},
+        b'{"name": "two"}',
+    )
+    uri = upstream.url("/token")
+    cache = MetadataCache()
+    stale = cache.set(uri, 200, {"name": "one"}, ETAG)
+
+    result = cache.fill(uri, lambda: Fetcher().fetch(uri, ETAG), stale=stale)
+
+    assert result == (200, {"name": "two"})
+    assert cache.lookup(uri)[0].etag == '"v2"'
+    assert cache.stats["revalidated"] == 0
+
+
+def test_stale_is_revalidated_in_background(upstream, proxy):
+    """ Test stale hits are served at once and refreshed conditionally """
+    upstream.routes["/token"] = conditional
+    uri = upstream.url("/token")
+
+    assert proxy.resolve(uri) == (200, {"name": "one"})
+    age(proxy.CACHE, uri, 1)
+    assert proxy.CACHE.lookup(uri)[1] == STALE
+
+    assert proxy.resolve(uri) == (200, {"name": "one"})
+    proxy.REVALIDATOR.shutdown(wait=True)
+
+    assert upstream.hits("/token") == 2
+    _, headers = upstream.requests[-1]
+    assert headers["If-None-Match"] == ETAG
+    assert headers["If-Modified-Since"] == LAST_MODIFIED
+    assert proxy.CACHE.stats["revalidated"] == 1
+    assert proxy.CACHE.lookup(uri)[1] == FRESH
+
+
+def test_expired_is_revalidated_inline(upstream, proxy):
+    """ Test expired entries with validators are refreshed before serving """
+    upstream.routes["/token"] = conditional
+    uri = upstream.url("/token")
+
+    proxy.resolve(uri)
+    age(proxy.CACHE, uri, 11)
+    assert proxy.CACHE.lookup(uri)[1] == EXPIRED
+
+    assert proxy.resolve(uri) == (200, {"name": "one"})
+
+    assert upstream.hits("/token") == 2
+    assert proxy.CACHE.stats["revalidated"] == 1
+    assert proxy.CACHE.lookup(uri)[1] == FRESH
+
+
+def test_failed_revalidation_is_logged(upstream, proxy, monkeypatch, caplog):
+    """ Test a background error is logged and the key can be retried """
+    upstream.routes["/token"] = conditional
+    uri = upstream.url("/token")
+
+    proxy.resolve(uri)
+    age(proxy.CACHE, uri, 1)
+
+    def fill(*args, **kwargs):
+        raise ConnectionError("upstream down")
+
+    monkeypatch.setattr(proxy.CACHE, "fill", fill)
+    assert proxy.resolve(uri) == (200, {"name": "one"})
+    proxy.REVALIDATOR.shutdown(wait=True)
+
+    (record,) = [r for r in caplog.records if r.levelname == "ERROR"]
+    assert "upstream down" in record.getMessage()
+    assert not proxy.REVALIDATING
@@ -0,0 +1,144 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import lambda_function
+from cache import FRESH, STALE, MetadataCache, normalize_uri
+from singleflight import SingleFlight
+
+WAITERS = 8
+
+
+def run_concurrently(flights, key, fn):
+    """
+    Call flights.do(key, fn) from WAITERS threads while fn is held open,
+    returning each call's future
+    """
+    started = threading.Event()
+    release = threading.Event()
+
+    def held():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=WAITERS) as executor:
+        leader = executor.submit(flights.do, key, held)
+        started.wait(5)
+        followers = [
+            executor.submit(flights.do, key, held) for _ in range(WAITERS - 1)
+        ]
+        # Every follower is parked on the leader's call before it finishes
+        while flights.stats["followers"] < WAITERS - 1:
+            time.sleep(0.01)
+        release.set()
+        return [leader] + followers
+
+
+def test_waiters_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"name": "one"}
+
+    futures = run_concurrently(flights, "a", fetch)
+
+    assert len(calls) == 1
+    assert [f.result() for f in futures] == [{"name": "one"}] * WAITERS
+    assert flights.stats == {"leaders": 1, "followers": WAITERS - 1}
+
+    # Finished calls are forgotten, the next one fetches again
+    assert flights.do("a", lambda: "again") == "again"
+
+
+def test_error_reaches_every_waiter():
+    flights = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        raise ValueError("upstream down")
+
+    futures = run_concurrently(flights, "a", fetch)
+
+    assert len(calls) == 1
+    for future in futures:
+        with pytest.raises(ValueError, match="upstream down"):
+            future.result()
+
+    # A failure is not cached either
+    assert flights.do("a", lambda: "recovered") == "recovered"
+
+
+def test_keys_are_independent():
+    flights = SingleFlight()
+
+    assert flights.do("a", lambda: flights.do("b", lambda: "b")) == "b"
+    assert flights.stats == {"leaders": 2, "followers": 0}
+
+
+def test_concurrent_requests_fetch_upstream_once(upstream, monkeypatch):
+    """ Test concurrent misses for one URI make a single upstream request """
+    monkeypatch.setattr(lambda_function, "CACHE", MetadataCache())
+
+    def slow(handler):
+        time.sleep(0.2)
+        return 200, {"Content-Type": "application/json"}, b'{"name": "one"}'
+
+    upstream.routes["/token/1"] = slow
+    uri = upstream.url("/token/1")
+
+    with ThreadPoolExecutor(max_workers=WAITERS) as executor:
+        results = list(executor.map(lambda_function.resolve, [uri] * WAITERS))
+
+    assert results == [(200, {"name": "one"})] * WAITERS
+    assert upstream.hits("/token/1") == 1
+
+
+def test_concurrent_stale_reads_revalidate_once(upstream, monkeypatch):
+    """ Test concurrent stale hits for one URI make one conditional request """
+    cache = MetadataCache(ttl=100, stale_grace=10)
+    monkeypatch.setattr(lambda_function, "CACHE", cache)
+    monkeypatch.setattr(
+        lambda_function, "REVALIDATOR", ThreadPoolExecutor(max_workers=2)
+    )
+
+    def conditional(handler):
+        time.sleep(0.2)
+        if handler.headers.get("If-None-Match") == '"v1"':
+            return 304, {}, b""
+        return (
+            200,
+            {"Content-Type": "application/json", "ETag": '"v1"'},
+            b'{"name": "one"}',
+        )
+
+    upstream.routes["/token/1"] = conditional
+    uri = upstream.url("/token/1")
+    assert lambda_function.resolve(uri) == (200, {"name": "one"})
+
+    key = normalize_uri(uri)
+    entry = cache.memory.get(key)
+    cache.memory.set(key, entry._replace(expires_at=time.time() - 1))
+    assert cache.lookup(uri)[1] == STALE
+
+    barrier = threading.Barrier(WAITERS)
+
+    def stale_read(_):
+        barrier.wait(5)
+        return lambda_function.resolve(uri)
+
+    with ThreadPoolExecutor(max_workers=WAITERS) as executor:
+        results = list(executor.map(stale_read, range(WAITERS)))
+    lambda_function.REVALIDATOR.shutdown(wait=True)
+
+    assert results == [(200, {"name": "one"})] * WAITERS
+    assert upstream.hits("/token/1") == 2
+    _, headers = upstream.requests[-1]
+    assert headers["If-None-Match"] == '"v1"'
+    assert cache.stats["revalidated"] == 1
+    assert cache.lookup(uri)[1] == FRESH
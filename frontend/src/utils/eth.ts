@@ -449,9 +449,11 @@ async function localNodeAvailable(): Promise<boolean> {
 }
 
 async function loadArtifacts(chainId: number): Promise<Artifacts> {
+  // One manifest per chain of address, ABI and deploy block per contract
+  const { contracts } = await import(`../artifacts/${chainId}.json`)
   const facts: Artifacts = {}
   for (const name of CONTRACT_NAMES[chainId.toString()]) {
-    facts[name] = await import(`../artifacts/${chainId}/${name}.json`)
+    facts[name] = contracts[name]
   }
   return facts
 }
@@ -535,7 +537,7 @@ export async function getProvider(
   }
 
   // Contracts
-  const lmgAddress: string = artifacts?.LetMeGet_v2?.deployment?.address
+  const lmgAddress: string = artifacts?.LetMeGet_v2?.address
   const lmgABI: ContractInterface = artifacts?.LetMeGet_v2?.abi
   const letMeGetv2: Contract = lmgAddress
     ? new Contract(lmgAddress, lmgABI, signer)